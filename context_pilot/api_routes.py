@@ -1,42 +1,192 @@
 import os
 import json
+import time
+import base64
+import asyncio
+import html
+import hashlib
 from fastapi import APIRouter, Request
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, JSONResponse, Response, StreamingResponse
 from context_pilot.scripts.rag_config import RagConfig
 try:
-    from context_pilot.utils.db_manager import default_db_manager
+    from context_pilot.utils.db_manager import get_db_manager
+    from context_pilot.utils.change_feed import latest_change_seq
+    from context_pilot.utils.knowledge_store import (
+        HIGHLIGHT_END, HIGHLIGHT_START, contributor_facets, count_entries, list_entries, search_entries,
+        tag_facets
+    )
 except ImportError:
     import sys
     sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../../")))
-    from context_pilot.utils.db_manager import default_db_manager
+    from context_pilot.utils.db_manager import get_db_manager
+    from context_pilot.utils.change_feed import latest_change_seq
+    from context_pilot.utils.knowledge_store import (
+        HIGHLIGHT_END, HIGHLIGHT_START, contributor_facets, count_entries, list_entries, search_entries,
+        tag_facets
+    )
 
 router = APIRouter()
 
+# Static page: all data comes from /admin/api/stats and /admin/api/entries
 HTML_TEMPLATE = """
 <!DOCTYPE html>
 <html>
 <head>
     <title>Context Pilot - Knowledge Base Dashboard</title>
     <style>
-        body {{ font-family: Arial, sans-serif; margin: 40px; }}
-        table {{ border-collapse: collapse; width: 100%; margin-top: 20px; }}
-        th, td {{ border: 1px solid #ddd; padding: 8px; text-align: left; }}
-        th {{ background-color: #f2f2f2; }}
-        .btn {{ background-color: #4CAF50; color: white; padding: 10px 15px; border: none; cursor: pointer; border-radius: 4px; }}
-        .btn:hover {{ background-color: #45a049; }}
-        .header {{ display: flex; justify-content: space-between; align-items: center; }}
-        .danger {{ background-color: #f44336; }}
-        .danger:hover {{ background-color: #da190b; }}
+        body { font-family: Arial, sans-serif; margin: 40px; }
+        table { border-collapse: collapse; width: 100%; margin-top: 20px; }
+        th, td { border: 1px solid #ddd; padding: 8px; text-align: left; }
+        th { background-color: #f2f2f2; }
+        .btn { background-color: #4CAF50; color: white; padding: 10px 15px; border: none; cursor: pointer; border-radius: 4px; }
+        .btn:hover { background-color: #45a049; }
+        .header { display: flex; justify-content: space-between; align-items: center; }
+        .danger { background-color: #f44336; }
+        .danger:hover { background-color: #da190b; }
     </style>
     <script>
-        function triggerIndex(mode) {{
-            if (confirm("Are you sure you want to trigger a " + mode + " index build?")) {{
-                fetch("/admin/api/build_index?mode=" + mode, {{ method: "POST" }})
+        const tag = new URLSearchParams(location.search).get("tag") || "";
+        let nextCursor = null;
+        // Full-text search mode: the query and the next page to load
+        let searchQuery = "";
+        let searchPage = 1;
+
+        function esc(value) {
+            const div = document.createElement("div");
+            div.textContent = value == null ? "" : String(value);
+            return div.innerHTML;
+        }
+
+        function truncate(value, size) {
+            value = value || "";
+            return value.length > size ? value.slice(0, size) + "..." : value;
+        }
+
+        function setText(id, value) {
+            document.getElementById(id).textContent = value;
+        }
+
+        // Responses carry ETags; with "no-cache" the browser revalidates and reuses its copy on 304
+        async function loadStats() {
+            const { stats } = await (await fetch("/admin/api/stats")).json();
+            setText("total-count", stats.total_count);
+            setText("rag-last-build", stats.rag.build_time);
+            setText("rag-doc-count", stats.rag.doc_count);
+            setText("rag-model", stats.rag.embedding_model);
+            setText("rag-strategy", stats.rag.strategy);
+            const bs = stats.rag.build_stats;
+            setText("rag-build-stats", bs
+                ? bs.total_seconds.toFixed(2) + "s (" + Object.entries(bs.phases).map(([k, v]) => k + " " + v.toFixed(2) + "s").join(", ") + ")"
+                : "-");
+            const task = stats.task;
+            const status = document.getElementById("task-status");
+            status.textContent = task.status;
+            status.style.color = task.status === "Running" ? "blue"
+                : task.status === "Idle" ? (task.result === "Success" ? "green" : "red") : "orange";
+            setText("task-message", task.message);
+            setText("next-run", task.next_run);
+            setText("last-check", task.last_check);
+        }
+
+        function clearEntries() {
+            const table = document.getElementById("entries");
+            while (table.rows.length > 1) table.deleteRow(1);
+        }
+
+        async function search(event) {
+            if (event) event.preventDefault();
+            searchQuery = document.getElementById("search-query").value.trim();
+            searchPage = 1;
+            nextCursor = null;
+            clearEntries();
+            setText("entries-title", searchQuery ? "Search Results" : "Recent Experiences");
+            searchQuery ? loadSearchResults() : loadEntries();
+        }
+
+        async function loadSearchResults() {
+            const url = "/admin/api/entries/search?limit=20&page=" + searchPage + "&q=" + encodeURIComponent(searchQuery);
+            const data = await (await fetch(url)).json();
+            const table = document.getElementById("entries");
+            if (data.status !== "success") {
+                table.insertAdjacentHTML("beforeend", "<tr><td colspan='5'>" + esc(data.message) + "</td></tr>");
+                return;
+            }
+            for (const r of data.results) {
+                // snippet_html is escaped server-side; only <mark> tags are markup
+                table.insertAdjacentHTML("beforeend",
+                    "<tr><td>" + esc(r.id.slice(0, 8)) + "...</td><td>" + esc(truncate(r.intent, 50)) + "</td><td>"
+                    + r.snippet_html + "</td><td>" + esc(r.tags || "-") + "</td><td>" + esc(r.created_at) + "</td></tr>");
+            }
+            if (searchPage === 1 && !data.results.length) {
+                table.insertAdjacentHTML("beforeend", "<tr><td colspan='5'>No matching experiences.</td></tr>");
+            }
+            searchPage += 1;
+            document.getElementById("load-more").style.display = data.has_more ? "" : "none";
+        }
+
+        function loadMore() {
+            searchQuery ? loadSearchResults() : loadEntries();
+        }
+
+        async function loadFacets() {
+            const data = await (await fetch("/admin/api/facets?limit=20")).json();
+            document.getElementById("tag-facets").innerHTML = data.tags.map(
+                f => '<a href="/dashboard?tag=' + encodeURIComponent(f.tag) + '">' + esc(f.tag) + "</a> (" + f.count + ")"
+            ).join(", ") || "-";
+            setText("contributor-facets", data.contributors.map(f => (f.contributor || "unknown") + " (" + f.count + ")").join(", ") || "-");
+        }
+
+        async function loadEntries() {
+            let url = "/admin/api/entries?limit=50";
+            if (tag) url += "&tag=" + encodeURIComponent(tag);
+            if (nextCursor) url += "&cursor=" + encodeURIComponent(nextCursor);
+            const data = await (await fetch(url)).json();
+            const table = document.getElementById("entries");
+            if (data.status !== "success") {
+                table.insertAdjacentHTML("beforeend", "<tr><td colspan='5'>" + esc(data.message) + "</td></tr>");
+                return;
+            }
+            for (const e of data.entries) {
+                table.insertAdjacentHTML("beforeend",
+                    "<tr><td>" + esc(e.id.slice(0, 8)) + "...</td><td>" + esc(truncate(e.intent, 50)) + "</td><td>"
+                    + esc(truncate(e.root_cause, 50)) + "</td><td>" + esc(e.tags || "-") + "</td><td>" + esc(e.created_at) + "</td></tr>");
+            }
+            if (!nextCursor && !data.entries.length) {
+                table.insertAdjacentHTML("beforeend", "<tr><td colspan='5'>No entries found in knowledge base.</td></tr>");
+            }
+            nextCursor = data.next_cursor;
+            document.getElementById("load-more").style.display = nextCursor ? "" : "none";
+        }
+
+        // Live build progress (Server-Sent Events, see /admin/api/build_progress/stream)
+        const progressSource = new EventSource("/admin/api/build_progress/stream");
+        progressSource.onmessage = (event) => {
+            const p = JSON.parse(event.data);
+            const phases = Object.entries(p.phases).map(([k, v]) => k + " " + v.toFixed(2) + "s").join(", ");
+            const counters = Object.entries(p.counters).map(([k, v]) => k + " " + v + (p.totals[k] ? "/" + p.totals[k] : "")).join(", ");
+            setText("build-progress",
+                p.state + (p.phase ? " (" + p.phase + ")" : "") + " - " + p.total_seconds.toFixed(1) + "s"
+                + (phases ? " | " + phases : "") + (counters ? " | " + counters : ""));
+            if (p.state !== "running") {
+                loadStats();
+                loadFacets();
+            }
+        };
+
+        function triggerIndex(mode) {
+            if (confirm("Are you sure you want to trigger a " + mode + " index build?")) {
+                fetch("/admin/api/build_index?mode=" + mode, { method: "POST" })
                     .then(response => response.json())
                     .then(data => alert(data.message))
                     .catch(err => alert("Error triggering build"));
-            }}
-        }}
+            }
+        }
+
+        window.addEventListener("DOMContentLoaded", () => {
+            loadStats();
+            loadFacets();
+            loadEntries();
+        });
     </script>
 </head>
 <body>
@@ -51,129 +201,341 @@ HTML_TEMPLATE = """
     <div style="display: flex; gap: 40px;">
         <div style="flex: 1; background: #f9f9f9; padding: 20px; border-radius: 8px;">
             <h2>SQLite Stats</h2>
-            <p><strong>Total Entries:</strong> {total_count}</p>
+            <p><strong>Total Entries:</strong> <span id="total-count">-</span></p>
+            <p><strong>Top Tags:</strong> <span id="tag-facets">-</span></p>
+            <p><strong>Contributors:</strong> <span id="contributor-facets">-</span></p>
         </div>
         <div style="flex: 1; background: #eef7ff; padding: 20px; border-radius: 8px;">
             <h2>RAG Index Stats</h2>
-            <p><strong>Last Build:</strong> {rag_last_build}</p>
-            <p><strong>Vector Count:</strong> {rag_doc_count}</p>
-            <p><strong>Embedding Model:</strong> {rag_model}</p>
-            <p><strong>Last Strategy:</strong> {rag_strategy}</p>
+            <p><strong>Last Build:</strong> <span id="rag-last-build">-</span></p>
+            <p><strong>Vector Count:</strong> <span id="rag-doc-count">-</span></p>
+            <p><strong>Embedding Model:</strong> <span id="rag-model">-</span></p>
+            <p><strong>Last Strategy:</strong> <span id="rag-strategy">-</span></p>
+            <p><strong>Last Build Timings:</strong> <span id="rag-build-stats">-</span></p>
         </div>
         <div style="flex: 1; background: #fff4e5; padding: 20px; border-radius: 8px;">
             <h2>Background Task</h2>
-            <p><strong>Status:</strong> <span style="color: {status_color}; font-weight: bold;">{task_status}</span></p>
-            <p><strong>Message:</strong> {task_message}</p>
-            <p><strong>Next Run:</strong> {next_run}</p>
-            <p><strong>Last Check:</strong> {last_check}</p>
+            <p><strong>Status:</strong> <span id="task-status" style="font-weight: bold;">-</span></p>
+            <p><strong>Message:</strong> <span id="task-message">-</span></p>
+            <p><strong>Next Run:</strong> <span id="next-run">-</span></p>
+            <p><strong>Last Check:</strong> <span id="last-check">-</span></p>
+            <p><strong>Build Progress:</strong> <span id="build-progress">-</span></p>
         </div>
     </div>
     
-    <h2>Recent Experiences</h2>
-    <table>
+    <h2 id="entries-title">Recent Experiences</h2>
+    <form onsubmit="search(event)">
+        <input id="search-query" type="search" placeholder="Search intent, root cause, solution, tags..." style="width: 400px; padding: 8px;">
+        <button class="btn" type="submit">Search</button>
+    </form>
+    <table id="entries">
         <tr>
             <th>ID</th>
             <th>Intent</th>
-            <th>Root Cause</th>
+            <th>Root Cause / Match</th>
             <th>Tags</th>
             <th>Created At</th>
         </tr>
-        {rows_html}
     </table>
+    <p><button id="load-more" class="btn" style="display: none;" onclick="loadMore()">Load more</button></p>
 </body>
 </html>
 """
 
+MAX_PAGE_SIZE = 200
+
+def _mtime(path: str) -> int:
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return 0
+
+def _read_json(path: str) -> dict:
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _etag(*parts) -> str:
+    return '"' + hashlib.sha1(repr(parts).encode("utf-8")).hexdigest()[:20] + '"'
+
+def _not_modified(request: Request, etag: str) -> bool:
+    """True if the client's copy (If-None-Match) is still current."""
+    candidates = [t.strip().removeprefix("W/") for t in request.headers.get("if-none-match", "").split(",")]
+    return etag in candidates or "*" in candidates
+
+def _etag_response(etag: str, body: dict = None):
+    # "no-cache": browsers keep the copy but revalidate it on every request
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if body is None:
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(body, headers=headers)
+
+def _kb_error(kb: str):
+    """
+    The error response for a `kb` parameter that is not a valid name (400) or names no
+    existing knowledge base (404), else None. Checked before get_db_manager, which
+    would create the KB.
+    """
+    try:
+        exists = RagConfig.kb_exists(kb)
+    except ValueError as e:
+        return JSONResponse({"status": "error", "message": str(e)}, status_code=400)
+    if not exists:
+        return JSONResponse({"status": "error", "message": f"Unknown knowledge base '{kb}'."}, status_code=404)
+    return None
+
+def _encode_cursor(row) -> str:
+    return base64.urlsafe_b64encode(json.dumps([row['created_at'], row['id']]).encode("utf-8")).decode("ascii")
+
+def _decode_cursor(cursor: str) -> tuple:
+    created_at, entry_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    return created_at, entry_id
+
+# Per-KB (version, stats); the version changes with every write (change log sequence),
+# every index build (manifest) and every indexer status update
+_stats_cache: dict = {}
+
+def _stats_version(kb: str, change_seq: int) -> tuple:
+    manifest_path = os.path.join(RagConfig.kb_storage_dir(kb), RagConfig.MANIFEST_FILE)
+    status_path = os.path.join(RagConfig.STORAGE_DIR, "index_status.json")
+    return (RagConfig.normalize_kb_name(kb), change_seq, _mtime(manifest_path), _mtime(status_path))
+
+async def _dashboard_stats(kb: str, version: tuple) -> dict:
+    cached = _stats_cache.get(version[0])
+    if cached and cached[0] == version:
+        return cached[1]
+
+    rag = {"build_time": "Never", "doc_count": 0, "embedding_model": RagConfig.EMBEDDING_MODEL, "strategy": "-", "build_stats": None}
+    manifest = _read_json(os.path.join(RagConfig.kb_storage_dir(kb), RagConfig.MANIFEST_FILE))
+    rag.update({k: v for k, v in manifest.items() if k in rag})
+    task = {"status": "Unknown", "message": "N/A", "result": "N/A", "last_check": "-", "next_run": "-"}
+    task.update(_read_json(os.path.join(RagConfig.STORAGE_DIR, "index_status.json")))
+
+    stats = {
+        "knowledge_base": version[0],
+        # COUNT(*) is a full scan: it only runs when the change log moved
+        "total_count": await get_db_manager(kb).run(count_entries),
+        "rag": rag,
+        "task": task,
+    }
+    _stats_cache[version[0]] = (version, stats)
+    return stats
+
+def _snippet_html(snippet: str) -> str:
+    return html.escape(snippet or "").replace(HIGHLIGHT_START, "<mark>").replace(HIGHLIGHT_END, "</mark>")
+
 @router.get("/dashboard", response_class=HTMLResponse)
-async def get_dashboard(request: Request):
-    default_db_manager.init_db()
-    
-    # RAG Stats
-    manifest_path = os.path.join(RagConfig.STORAGE_DIR, RagConfig.MANIFEST_FILE)
-    rag_meta = {
-        "build_time": "Never",
-        "doc_count": 0,
-        "embedding_model": RagConfig.EMBEDDING_MODEL,
-        "strategy": "-"
+async def get_dashboard():
+    return HTML_TEMPLATE
+
+@router.get("/admin/api/stats")
+async def get_stats(request: Request, kb: str = ""):
+    """Entry count, index manifest and indexer status; cached until the next write or build."""
+    error = _kb_error(kb)
+    if error:
+        return error
+    version = _stats_version(kb, await get_db_manager(kb).run(latest_change_seq))
+    etag = _etag("stats", version)
+    if _not_modified(request, etag):
+        return _etag_response(etag)
+    return _etag_response(etag, {"status": "success", "stats": await _dashboard_stats(kb, version)})
+
+def _facets(conn, limit: int = None) -> dict:
+    return {
+        "tags": [{"tag": r["tag"], "count": r["entry_count"]} for r in tag_facets(conn, limit)],
+        "contributors": [{"contributor": r["contributor"], "count": r["entry_count"]} for r in contributor_facets(conn, limit)],
     }
-    
-    if os.path.exists(manifest_path):
-        try:
-            with open(manifest_path, 'r') as f:
-                rag_meta.update(json.load(f))
-        except:
-            pass
 
+@router.get("/admin/api/facets")
+async def get_facets(request: Request, kb: str = "", limit: int = None):
+    """Entry counts per tag and per contributor, from the materialized facet tables."""
+    error = _kb_error(kb)
+    if error:
+        return error
+    db = get_db_manager(kb)
+    etag = _etag("facets", RagConfig.normalize_kb_name(kb), await db.run(latest_change_seq), limit)
+    if _not_modified(request, etag):
+        return _etag_response(etag)
+    return _etag_response(etag, {"status": "success", **await db.run(_facets, limit)})
+
+@router.get("/admin/api/entries")
+async def get_entries(request: Request, kb: str = "", tag: str = None, cursor: str = None, limit: int = 50):
+    """
+    Newest entries first, `limit` per page. Pass the returned `next_cursor` as `cursor`
+    for the next page (keyset pagination on (created_at, id): every page is an index seek).
+    """
+    error = _kb_error(kb)
+    if error:
+        return error
     try:
-        with default_db_manager.get_connection() as conn:
-            # Get total count
-            count_result = conn.execute("SELECT COUNT(*) FROM knowledge_entries").fetchone()
-            total_count = count_result[0] if count_result else 0
-            
-            # Get latest 50 entries
-            rows = conn.execute("SELECT id, intent, root_cause, tags, created_at FROM knowledge_entries ORDER BY created_at DESC LIMIT 50").fetchall()
-            
-            rows_html = ""
-            for row in rows:
-                tags = row['tags'] if row['tags'] else '-'
-                # truncate long text
-                intent = row['intent'][:50] + '...' if len(row['intent']) > 50 else row['intent']
-                rc = row['root_cause'][:50] + '...' if len(row['root_cause']) > 50 else row['root_cause']
-                
-                rows_html += f"<tr><td>{row['id'][:8]}...</td><td>{intent}</td><td>{rc}</td><td>{tags}</td><td>{row['created_at']}</td></tr>"
-                
-            if not rows_html:
-                rows_html = "<tr><td colspan='5'>No entries found in knowledge base.</td></tr>"
-                
-    except Exception as e:
-        total_count = "Error"
-        rows_html = f"<tr><td colspan='5'>Error connecting to DB: {e}</td></tr>"
-        
-    # Task Status
-    status_path = os.path.join(RagConfig.STORAGE_DIR, "index_status.json")
-    task_info = {
-        "status": "Unknown",
-        "message": "N/A",
-        "result": "N/A",
-        "last_check": "-",
-        "next_run": "-"
+        before = _decode_cursor(cursor) if cursor else None
+    except (ValueError, TypeError):
+        return {"status": "error", "message": "Invalid cursor."}
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    db = get_db_manager(kb)
+
+    change_seq = await db.run(latest_change_seq)
+    etag = _etag("entries", RagConfig.normalize_kb_name(kb), change_seq, tag, cursor, limit)
+    if _not_modified(request, etag):
+        return _etag_response(etag)
+
+    # One extra row tells whether there is a next page
+    rows = await db.run(list_entries, limit + 1, tag, before)
+    page = rows[:limit]
+    body = {
+        "status": "success",
+        "entries": [dict(row) for row in page],
+        "next_cursor": _encode_cursor(page[-1]) if len(rows) > limit else None,
     }
-    if os.path.exists(status_path):
-        try:
-            with open(status_path, 'r') as f:
-                task_info.update(json.load(f))
-        except:
-            pass
-            
-    status_color = "orange"
-    if task_info['status'] == "Running": status_color = "blue"
-    elif task_info['status'] == "Idle":
-        status_color = "green" if task_info.get('result') == "Success" else "red"
-
-    return HTML_TEMPLATE.format(
-        total_count=total_count, 
-        rows_html=rows_html,
-        rag_last_build=rag_meta['build_time'],
-        rag_doc_count=rag_meta['doc_count'],
-        rag_model=rag_meta['embedding_model'],
-        rag_strategy=rag_meta['strategy'],
-        task_status=task_info['status'],
-        task_message=task_info['message'],
-        next_run=task_info['next_run'],
-        last_check=task_info['last_check'],
-        status_color=status_color
-    )
+    return _etag_response(etag, body)
 
 @router.post("/admin/api/build_index")
-async def trigger_build_index(mode: str = "incremental"):
-    # Note: Because filelock is used in build_index.py, running this concurrently is safe.
-    import subprocess
-    import threading
-    
-    script_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts", "build_index.py")
-    
-    def run_build():
-        subprocess.run(["python", script_path, f"--mode={mode}"])
-        
-    threading.Thread(target=run_build, daemon=True).start()
-    return {"status": "success", "message": f"Background {mode} index build triggered. Check logs for details."}
+async def trigger_build_index(mode: str = "incremental", kb: str = "", force: bool = False):
+    # Builds run on the resident worker; repeated clicks join the pending job
+    from context_pilot.scripts.build_worker import get_build_worker
+
+    error = _kb_error(kb)
+    if error:
+        return error
+    if mode not in ("incremental", "full"):
+        return {"status": "error", "message": f"Unknown build mode '{mode}'."}
+    job = get_build_worker().submit(kb, mode, force)
+    if job.requests > 1:
+        message = f"A {job.mode} build of '{job.kb}' is already queued (job {job.id})."
+    else:
+        message = f"Background {mode} index build queued (job {job.id})."
+    return {"status": "success", "message": message, "job": job.to_dict()}
+
+@router.get("/admin/api/build_jobs")
+async def list_build_jobs():
+    from context_pilot.scripts.build_worker import get_build_worker
+
+    return {"status": "success", "jobs": [job.to_dict() for job in get_build_worker().jobs()]}
+
+@router.get("/admin/api/build_jobs/{job_id}")
+async def get_build_job(job_id: str):
+    from context_pilot.scripts.build_worker import get_build_worker
+
+    job = get_build_worker().get(job_id)
+    if job is None:
+        return {"status": "error", "message": f"Unknown build job '{job_id}'."}
+    return {"status": "success", "job": job.to_dict()}
+
+@router.post("/admin/api/snapshot")
+async def trigger_snapshot(kb: str = ""):
+    """Snapshots the knowledge DB and index (online; see utils/snapshot.py)."""
+    from context_pilot.utils.snapshot import create_snapshot
+
+    error = _kb_error(kb)
+    if error:
+        return error
+    try:
+        meta = await asyncio.to_thread(create_snapshot, kb)
+    except Exception as e:
+        return {"status": "error", "message": f"Snapshot failed: {e}"}
+    return {"status": "success", "path": meta["path"], "size_bytes": meta["size_bytes"], "snapshot": meta}
+
+@router.get("/admin/api/build_progress")
+async def get_build_progress(kb: str = ""):
+    """Progress and per-phase timings of the running (or last) build."""
+    from context_pilot.scripts.build_progress import read_progress
+
+    error = _kb_error(kb)
+    if error:
+        return error
+    progress = read_progress(kb)
+    if progress is None:
+        return {"status": "error", "message": "No build has been recorded yet."}
+    return {"status": "success", "progress": progress}
+
+PROGRESS_POLL_SECONDS = 0.5
+PROGRESS_KEEPALIVE_SECONDS = 15
+
+@router.get("/admin/api/build_progress/stream")
+async def stream_build_progress(request: Request, kb: str = ""):
+    """
+    Server-Sent Events: one `data:` message per progress update. The build may run in
+    another process, so this follows the progress file (a stat per poll).
+    """
+    from context_pilot.scripts.build_progress import read_progress
+
+    error = _kb_error(kb)
+    if error:
+        return error
+    path = RagConfig.kb_progress_path(kb)
+
+    async def events():
+        last_mtime, last_sent = None, time.monotonic()
+        while not await request.is_disconnected():
+            try:
+                mtime = os.stat(path).st_mtime_ns
+            except OSError:
+                mtime = None
+            progress = read_progress(kb) if mtime is not None and mtime != last_mtime else None
+            if progress is not None:
+                last_mtime, last_sent = mtime, time.monotonic()
+                yield f"data: {json.dumps(progress)}\n\n"
+            elif time.monotonic() - last_sent > PROGRESS_KEEPALIVE_SECONDS:
+                last_sent = time.monotonic()
+                yield ": keep-alive\n\n"
+            await asyncio.sleep(PROGRESS_POLL_SECONDS)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+MAX_SEARCH_K = 50
+
+@router.get("/admin/api/search")
+async def search_knowledge(q: str, k: int = 5, kb: str = ""):
+    """
+    Top-k experiences for `q` as JSON, straight from the retrieval core used by the
+    knowledge agent's RAG tool (shared index and embedding caches, no LLM turn).
+    """
+    from context_pilot.context_pilot_app.tools.llama_rag_tool import asearch_knowledge
+
+    error = _kb_error(kb)
+    if error:
+        return error
+    if not q.strip():
+        return {"status": "error", "message": "Query must not be empty."}
+    start = time.perf_counter()
+    try:
+        nodes = await asearch_knowledge(q, kb, max(1, min(k, MAX_SEARCH_K)))
+    except Exception as e:
+        return {"status": "error", "message": f"Search failed: {e}"}
+    return {
+        "status": "success",
+        "query": q,
+        "knowledge_base": RagConfig.normalize_kb_name(kb),
+        "nodes": nodes,
+        "took_ms": round((time.perf_counter() - start) * 1000, 2),
+    }
+
+@router.get("/admin/api/entries/search")
+async def search_entries_api(request: Request, q: str, kb: str = "", page: int = 1, limit: int = 20):
+    """
+    Full-text search (FTS5, see knowledge_store.search_entries), best matches first.
+    `snippet_html` is HTML-escaped with the matches wrapped in <mark>.
+    """
+    error = _kb_error(kb)
+    if error:
+        return error
+    if not q.strip():
+        return {"status": "error", "message": "Query must not be empty."}
+    page = max(1, page)
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    db = get_db_manager(kb)
+
+    change_seq = await db.run(latest_change_seq)
+    etag = _etag("search", RagConfig.normalize_kb_name(kb), change_seq, q, page, limit)
+    if _not_modified(request, etag):
+        return _etag_response(etag)
+
+    rows = await db.run(search_entries, q, limit + 1, (page - 1) * limit)
+    results = []
+    for row in rows[:limit]:
+        result = {k: row[k] for k in ("id", "intent", "root_cause", "tags", "created_at", "score")}
+        result["snippet_html"] = _snippet_html(row["snippet"])
+        results.append(result)
+    return _etag_response(etag, {"status": "success", "page": page, "results": results, "has_more": len(rows) > limit})
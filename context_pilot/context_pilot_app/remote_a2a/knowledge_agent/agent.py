@@ -8,10 +8,11 @@ from . import prompt
 
 # Tools
 from context_pilot.context_pilot_app.tools import (
-    retrieve_rag_documentation_tool,
+    aretrieve_rag_documentation_tool,
     initialize_rag_tool,
     extract_experience_tool,
     save_experience_tool,
+    get_related_experiences_tool,
 )
 
 # Skill Registries
@@ -47,9 +48,10 @@ knowledge_agent = LlmAgent(
     description="Agent responsible for searching the knowledge base (RAG), tracking experiences, and managing knowledge.",
     instruction=prompt.get_prompt(),
     tools=[
-        FunctionTool(retrieve_rag_documentation_tool),
+        FunctionTool(aretrieve_rag_documentation_tool),
         extract_experience_tool,
         save_experience_tool,
+        get_related_experiences_tool,
         root_skill_registry,
         report_skill_registry,
         analyze_skill_registry,
@@ -24,9 +24,10 @@ KNOWLEDGE_EXPERT_PROMPT = """
 
 ### 阶段 1: 检索知识
 当收到计划监督专家（Planning Expert）的请求时：
-1. **检索知识**: 优先使用 `retrieve_rag_documentation_tool` 搜索相似案例
+1. **检索知识**: 优先使用 `aretrieve_rag_documentation_tool` 搜索相似案例
    - 思考："知识库里有类似的问题吗？"
    - 提供匹配度最高的经验信息给主代理。
+2. **关联经验**: 需要查找与某条经验相关的其他经验时，使用 `get_related_experiences_tool`（传入检索结果中的 ID），不要再发起新的检索。
 
 ### 阶段 2: 自动记录经验 (Auto Experience Recording)
 在收到主代理的要求或发现有价值的报错/流程信息时，**必须主动、自动地提取并保存为经验，无需等待确认**：
@@ -47,6 +48,7 @@ KNOWLEDGE_EXPERT_PROMPT = """
 
 2. **自动保存**: 
    ⚠️ **重要**: 提取完成后，**立即调用 `save_experience_tool` 将其保存到知识库。**
+   如果工具提示已存在相似经验，默认使用返回的 `entry_id` 再次调用以更新该经验；仅当两者确实是不同经验时才使用 `force_new=True`。
    保存完成后，只需回复主代理："我已经自动将这部分（分析/流程/原因）归纳进经验库中了。"
 
 ---
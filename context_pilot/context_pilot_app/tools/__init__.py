@@ -1,13 +1,15 @@
 # Export all tools for easy access from context_pilot_app.tools
 from .tools import update_strategic_plan, refine_bug_state
-from .llama_rag_tool import retrieve_rag_documentation_tool, initialize_rag_tool
-from .knowledge_tool import extract_experience_tool, save_experience_tool
+from .llama_rag_tool import retrieve_rag_documentation_tool, aretrieve_rag_documentation_tool, initialize_rag_tool
+from .knowledge_tool import extract_experience_tool, save_experience_tool, get_related_experiences_tool
 
 __all__ = [
     "update_strategic_plan",
     "refine_bug_state",
     "retrieve_rag_documentation_tool",
+    "aretrieve_rag_documentation_tool",
     "initialize_rag_tool",
     "extract_experience_tool",
-    "save_experience_tool"
+    "save_experience_tool",
+    "get_related_experiences_tool"
 ]
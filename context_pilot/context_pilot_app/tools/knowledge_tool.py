@@ -1,19 +1,27 @@
 import json
 import os
-import uuid
+import logging
 from datetime import datetime
 from google.adk.tools import FunctionTool, ToolContext
 from context_pilot.shared_libraries.state_keys import StateKeys
+from context_pilot.scripts.rag_config import RagConfig
 
 data_dir = os.getenv("RAG_DATA_DIR", os.path.join(os.getcwd(), "data"))
 
 # Import DB Manager
 try:
-    from context_pilot.utils.db_manager import default_db_manager
+    from context_pilot.utils.db_manager import get_db_manager
+    from context_pilot.utils.knowledge_store import get_entry, related_entries, save_entry
+    from context_pilot.utils.change_events import publish_change
 except ImportError:
     import sys
     sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../../../")))
-    from context_pilot.utils.db_manager import default_db_manager
+    from context_pilot.utils.db_manager import get_db_manager
+    from context_pilot.utils.knowledge_store import get_entry, related_entries, save_entry
+    from context_pilot.utils.change_events import publish_change
+from context_pilot.context_pilot_app.tools.llama_rag_tool import afind_closest_entry
+
+logger = logging.getLogger(__name__)
 
 def extract_experience(
     tool_context: ToolContext,
@@ -53,14 +61,35 @@ def extract_experience(
         f"Please proceed to call save_experience_tool immediately to persist this experience."
     )
 
-def save_experience(tool_context: ToolContext, entry_id: str = "") -> str:
+async def _find_similar_entry(intent: str, kb: str):
+    """The existing entry of `kb` whose indexed content best matches `intent`, if above the threshold."""
+    if RagConfig.SEMANTIC_MATCH_THRESHOLD <= 0:
+        return None
+    try:
+        match = await afind_closest_entry(intent, kb)
+    except Exception as e:
+        # No index yet, embedding failure, ...: never block a save on the suggestion
+        logger.warning(f"Semantic match lookup skipped: {e}")
+        return None
+    if not match or match[1] < RagConfig.SEMANTIC_MATCH_THRESHOLD:
+        return None
+    # The index may lag behind the DB: only offer entries that still exist
+    row = await get_db_manager(kb).run(get_entry, match[0])
+    return (row, match[1]) if row is not None else None
+
+async def save_experience(tool_context: ToolContext, entry_id: str = "", force_new: bool = False,
+                          knowledge_base: str = "") -> str:
     """
     Commits the staged experience data to the permanent Knowledge Base.
     Must be called AFTER extract_experience.
     
     Args:
         entry_id: Optional. If provided and exists in DB, update that entry.
-                  If not provided or not found, create a new entry.
+                  If not provided or not found, create a new entry, unless a
+                  similar or near-duplicate entry exists, which is then suggested.
+        force_new: Optional. Set to True to create a new entry even though a
+                  similar existing experience was suggested.
+        knowledge_base: Optional name of the knowledge base to save to. Leave empty for the default one.
     """
     # Retrieve from individual state keys
     intent = tool_context.state.get(StateKeys.EXP_INTENT)
@@ -74,62 +103,50 @@ def save_experience(tool_context: ToolContext, entry_id: str = "") -> str:
     if not intent or not root_cause:
         return "❌ No pending experience found (Intent or Root Cause missing). Please extract experience first."
     
+    kb = RagConfig.normalize_kb_name(knowledge_base)
+    db_manager = get_db_manager(kb)
+    if not entry_id and not force_new:
+        similar = await _find_similar_entry(intent, kb)
+        if similar:
+            row, score = similar
+            # Keep the staged experience so the follow-up call can save it
+            return (
+                f"⚠️ A similar experience already exists (ID: {row['id']}, similarity: {score:.2f}).\n"
+                f"Existing intent: {row['intent']}\n\n"
+                f"Call save_experience_tool again with entry_id=\"{row['id']}\" to update it, "
+                f"or with force_new=True to save this as a new experience."
+            )
+    
     now = datetime.now().isoformat()
     
-    # Ensure DB is ready
-    default_db_manager.init_db()
+    fields = {
+        "intent": intent,
+        "problem_context": problem_context,
+        "root_cause": root_cause,
+        "solution_steps": solution_steps,
+        "evidence": evidence,
+        "tags": tags,
+        "contributor": contributor,
+    }
     
     try:
-        with default_db_manager.get_connection() as conn:
-            # Check if entry_id exists (for update)
-            is_update = False
-            if entry_id:
-                existing = conn.execute(
-                    "SELECT id FROM knowledge_entries WHERE id = ?", 
-                    (entry_id,)
-                ).fetchone()
-                is_update = existing is not None
-            
-            if is_update:
-                # UPDATE existing entry
-                conn.execute("""
-                    UPDATE knowledge_entries 
-                    SET intent=?, problem_context=?, root_cause=?, solution_steps=?, 
-                        evidence=?, tags=?, contributor=?, updated_at=?
-                    WHERE id=?
-                """, (
-                    intent, 
-                    problem_context, 
-                    root_cause, 
-                    solution_steps, 
-                    evidence, 
-                    tags, 
-                    contributor, 
-                    now,
-                    entry_id
-                ))
-                result_id = entry_id
-                action = "updated"
-            else:
-                # INSERT new entry
-                result_id = str(uuid.uuid4())
-                conn.execute("""
-                    INSERT INTO knowledge_entries 
-                    (id, intent, problem_context, root_cause, solution_steps, evidence, tags, contributor, created_at, updated_at)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """, (
-                    result_id, 
-                    intent, 
-                    problem_context, 
-                    root_cause, 
-                    solution_steps, 
-                    evidence, 
-                    tags, 
-                    contributor, 
-                    now, 
-                    now
-                ))
-                action = "created"
+        # Updates entry_id if it exists; otherwise inserts, unless the content nearly
+        # duplicates an existing entry (nothing is written then).
+        # Goes through the single writer, which batches concurrent saves.
+        result_id, action = await db_manager.write(
+            save_entry, fields, entry_id, now, None if force_new else RagConfig.NEAR_DUP_THRESHOLD
+        )
+        if action == "duplicate":
+            row = await db_manager.run(get_entry, result_id)
+            # Keep the staged experience so the follow-up call can save it
+            return (
+                f"⚠️ A near-duplicate experience already exists (ID: {result_id}).\n"
+                f"Existing intent: {row['intent'] if row else '-'}\n\n"
+                f"Call save_experience_tool again with entry_id=\"{result_id}\" to update it, "
+                f"or with force_new=True to save this as a new experience."
+            )
+        # Committed: let the indexer pick it up within seconds
+        publish_change(kb)
             
         # Clear state after successful save
         tool_context.state[StateKeys.EXP_INTENT] = None
@@ -144,7 +161,36 @@ def save_experience(tool_context: ToolContext, entry_id: str = "") -> str:
     except Exception as e:
         return f"❌ Failed to save experience to DB: {e}"
 
+async def get_related_experiences(entry_id: str, limit: int = 5, knowledge_base: str = "") -> str:
+    """
+    Returns experiences related to a known entry, using the neighbour table
+    precomputed at index build time (no embedding call needed).
+    
+    Args:
+        entry_id: The ID of an experience, e.g. from a knowledge retrieval result.
+        limit: Maximum number of related experiences to return.
+        knowledge_base: Optional name of the knowledge base the entry belongs to. Leave empty for the default one.
+    """
+    try:
+        rows = await get_db_manager(knowledge_base).run(related_entries, entry_id, limit)
+    except Exception as e:
+        return f"❌ Failed to load related experiences: {e}"
+    
+    if not rows:
+        return f"No related experiences found for ID {entry_id} (the index may not have been rebuilt yet)."
+    
+    results = []
+    for row in rows:
+        results.append(
+            f"--- [Similarity: {row['score']:.4f}] (ID: {row['neighbor_id']}) ---\n"
+            f"Intent: {row['intent']}\n"
+            f"Root Cause: {row['root_cause']}\n"
+            f"Tags: {row['tags'] or '-'}\n"
+        )
+    return "\n".join(results)
+
 
 extract_experience_tool = FunctionTool(extract_experience)
 save_experience_tool = FunctionTool(save_experience)
+get_related_experiences_tool = FunctionTool(get_related_experiences)
 
@@ -1,130 +1,364 @@
 import os
 import logging
 import json
+import time
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict
 from typing import Any, List, Optional
 import httpx
 from llama_index.core import VectorStoreIndex, Settings, StorageContext, load_index_from_storage
+from llama_index.core.schema import QueryBundle
 from llama_index.core.readers import SimpleDirectoryReader
 from llama_index.llms.gemini import Gemini
-from llama_index.embeddings.gemini import GeminiEmbedding
 from google.adk.tools import FunctionTool, ToolContext
 from context_pilot.shared_libraries.state_keys import StateKeys
+from context_pilot.scripts.rag_config import RagConfig
+from context_pilot.scripts.quantized_index import QuantizedIndex, has_quantized_vectors
+from context_pilot.scripts.embeddings import make_embed_model
 
 logger = logging.getLogger(__name__)
 
+# Number of chunks returned per query
+SIMILARITY_TOP_K = 5
+
+# Query embeddings kept for reuse (e.g. a save_experience match after a retrieval of the same intent)
+EMBEDDING_CACHE_SIZE = 256
+
 # Global state
-_INDEX = None
 _STORAGE_DIR = None
-_LAST_BUILD_TIME = None
+# Guards the index cache and _LOAD_LOCKS; only held for lookups, never during a load
+_CACHE_LOCK = threading.Lock()
+# One lock per KB serializes its (re)loads, so a slow load never blocks other KBs
+_LOAD_LOCKS: dict[str, threading.Lock] = {}
+_SETTINGS_LOCK = threading.Lock()
+_SETTINGS_CONFIGURED = False
+
+
+class IndexLRUCache:
+    """
+    Keeps loaded indexes keyed by knowledge base name, evicting the least recently
+    used ones once their estimated size exceeds the memory budget.
+    The most recently inserted index is always kept, even if it alone exceeds the budget.
+    """
+
+    def __init__(self, budget_bytes: int):
+        self.budget_bytes = budget_bytes
+        self._entries: "OrderedDict[str, dict]" = OrderedDict()
+
+    def get(self, kb: str) -> Optional[dict]:
+        entry = self._entries.get(kb)
+        if entry is not None:
+            self._entries.move_to_end(kb)
+        return entry
+
+    def put(self, kb: str, index: Any, build_time: Optional[str], size_bytes: int):
+        self._entries[kb] = {"index": index, "build_time": build_time, "size_bytes": size_bytes}
+        self._entries.move_to_end(kb)
+        while len(self._entries) > 1 and self.total_bytes() > self.budget_bytes:
+            evicted, entry = self._entries.popitem(last=False)
+            logger.info(f"Evicting index '{evicted}' from memory ({entry['size_bytes'] / 1e6:.1f} MB)")
+
+    def pop(self, kb: str):
+        self._entries.pop(kb, None)
+
+    def clear(self):
+        self._entries.clear()
+
+    def total_bytes(self) -> int:
+        return sum(e["size_bytes"] for e in self._entries.values())
+
+    def keys(self) -> list[str]:
+        return list(self._entries.keys())
+
+
+_INDEX_CACHE = IndexLRUCache(RagConfig.INDEX_CACHE_MB * 1024 * 1024)
+_EMBEDDING_CACHE: "OrderedDict[str, list[float]]" = OrderedDict()
 
 def initialize_rag_tool(storage_path: str):
-    global _STORAGE_DIR, _INDEX, _LAST_BUILD_TIME
+    global _STORAGE_DIR
     _STORAGE_DIR = storage_path
-    _INDEX = None
-    _LAST_BUILD_TIME = None
+    with _CACHE_LOCK:
+        _INDEX_CACHE.clear()
     logger.info(f"RAG Tool initialized with storage path: {_STORAGE_DIR}")
 
-def _get_current_build_time(storage_dir: str) -> Optional[str]:
-    """Reads the build_time from the manifest file."""
-    manifest_path = os.path.join(storage_dir, "index_meta.json")
+def _read_manifest(storage_dir: str) -> dict:
+    """Reads the index manifest written by build_index.py."""
+    manifest_path = os.path.join(storage_dir, RagConfig.MANIFEST_FILE)
     if os.path.exists(manifest_path):
         try:
             with open(manifest_path, 'r') as f:
-                data = json.load(f)
-                return data.get("build_time")
+                return json.load(f)
         except:
             pass
-    return None
+    return {}
 
-def _get_index():
-    global _INDEX, _STORAGE_DIR, _LAST_BUILD_TIME
+def _get_current_build_time(storage_dir: str) -> Optional[str]:
+    """Reads the build_time from the manifest file."""
+    return _read_manifest(storage_dir).get("build_time")
+
+# Resident size of a float in the JSON-loaded vector lists: a 24-byte float object
+# plus its 8-byte list slot (several times its JSON text)
+_FLOAT_BYTES = 32
+# The docstore/index store as Python dicts and strings, relative to their JSON size (measured)
+_DOCSTORE_EXPANSION = 3
+
+def _estimate_index_bytes(storage_dir: str, index) -> int:
+    """
+    Estimates the resident size of a loaded index (nothing is measured at load time):
+    the docstore and index store from their JSON size times _DOCSTORE_EXPANSION, plus
+    the vectors, as the quantized matrix or as Python float lists (vectors x dim x _FLOAT_BYTES).
+    """
+    json_bytes = 0
+    for name in ("docstore.json", "index_store.json"):
+        path = os.path.join(storage_dir, name)
+        if os.path.exists(path):
+            json_bytes += os.path.getsize(path)
+    if isinstance(index, QuantizedIndex):
+        return json_bytes * _DOCSTORE_EXPANSION + index.memory_bytes()
+
+    embeddings = index.vector_store.data.embedding_dict
+    dim = len(next(iter(embeddings.values()))) if embeddings else 0
+    return json_bytes * _DOCSTORE_EXPANSION + len(embeddings) * dim * _FLOAT_BYTES
+
+def _storage_dir_for(kb: str) -> str:
+    # Processes that never call initialize_rag_tool (CLI, admin API) use the configured default
+    if kb == RagConfig.DEFAULT_KB and _STORAGE_DIR:
+        return _STORAGE_DIR
+    return RagConfig.kb_storage_dir(kb)
+
+def _configure_settings():
+    """Configures the LLM & embedding clients once per process; they are shared by all KBs."""
+    global _SETTINGS_CONFIGURED
+    with _SETTINGS_LOCK:
+        if _SETTINGS_CONFIGURED:
+            return
+
+        api_key = os.getenv("GOOGLE_API_KEY")
+        if not api_key:
+            logger.warning("GOOGLE_API_KEY not found. RAG might fail.")
+
+        Settings.llm = Gemini(
+            model="models/gemini-3-flash-preview", 
+            api_key=api_key
+        )
     
-    if not _STORAGE_DIR:
-        error_msg = "RAG Tool not initialized. Call `initialize_rag_tool(path)` first."
-        logger.error(error_msg)
-        raise RuntimeError(error_msg)
+        Settings.embed_model = make_embed_model(api_key)
+        _SETTINGS_CONFIGURED = True
+
+def _get_index(knowledge_base: str = ""):
+    kb = RagConfig.normalize_kb_name(knowledge_base)
+    index = _cached_index(kb)
+    if index is not None:
+        return index
+    with _CACHE_LOCK:
+        load_lock = _LOAD_LOCKS.setdefault(kb, threading.Lock())
+    with load_lock:
+        # Another thread may have loaded it while this one waited
+        index = _cached_index(kb)
+        return index if index is not None else _load_index(kb)
 
-    # Check/Setup Storage
-    storage_dir = _STORAGE_DIR
+def _check_storage(kb: str) -> tuple[str, dict]:
+    """Storage dir and manifest of `kb`'s index."""
+    storage_dir = _storage_dir_for(kb)
     if not os.path.exists(storage_dir):
         error_msg = f"RAG Storage not found at {storage_dir}. Please run 'python scripts/build_index.py' to generate it."
         logger.error(error_msg)
         raise FileNotFoundError(error_msg)
+    return storage_dir, _read_manifest(storage_dir)
 
-    # Auto-reload logic
-    current_build_time = _get_current_build_time(storage_dir)
-    if _INDEX is not None:
+def _cached_index(kb: str):
+    """The cached index of `kb`, or None if it is not loaded or was rebuilt since."""
+    _, manifest = _check_storage(kb)
+    current_build_time = manifest.get("build_time")
+    with _CACHE_LOCK:
+        cached = _INDEX_CACHE.get(kb)
+        if cached is None:
+            return None
         # If build time has changed, force reload
-        if current_build_time != _LAST_BUILD_TIME:
-            logger.info(f"Index update detected (Old: {_LAST_BUILD_TIME}, New: {current_build_time}). Reloading...")
-            _INDEX = None
-        else:
-            return _INDEX
+        if current_build_time != cached["build_time"]:
+            logger.info(f"Index update detected for '{kb}' (Old: {cached['build_time']}, New: {current_build_time}). Reloading...")
+            _INDEX_CACHE.pop(kb)
+            return None
+        return cached["index"]
+
+def _load_index(kb: str):
+    storage_dir, manifest = _check_storage(kb)
+    current_build_time = manifest.get("build_time")
+
+    # Query vectors must have the width the index was built with
+    built_dim = manifest.get("embedding_dim", 0)
+    if built_dim != RagConfig.EMBEDDING_DIM:
+        raise RuntimeError(
+            f"Index '{kb}' was built with embedding_dim={built_dim} but queries use "
+            f"embedding_dim={RagConfig.EMBEDDING_DIM}. Run build_index.py to rebuild it."
+        )
 
     # 1. Configure Settings (LLM & Embeddings)
-    api_key = os.getenv("GOOGLE_API_KEY")
-    if not api_key:
-        logger.warning("GOOGLE_API_KEY not found. RAG might fail.")
-
-    Settings.llm = Gemini(
-        model="models/gemini-3-flash-preview", 
-        api_key=api_key
-    )
-    
-    Settings.embed_model = GeminiEmbedding(
-        model_name="models/gemini-embedding-001",
-        api_key=api_key
-    )
+    _configure_settings()
 
-    logger.info(f"Loading persistent index from: {storage_dir}")
+    logger.info(f"Loading persistent index '{kb}' from: {storage_dir}")
     try:
-        storage_context = StorageContext.from_defaults(persist_dir=storage_dir)
-        _INDEX = load_index_from_storage(storage_context)
-        _LAST_BUILD_TIME = current_build_time
-        return _INDEX
+        if manifest.get("vector_storage", "float32") != "float32" and has_quantized_vectors(storage_dir):
+            # Skips the JSON vector store entirely: docstore + quantized matrix only
+            index = QuantizedIndex.load(storage_dir, rescore_candidates=RagConfig.RESCORE_CANDIDATES)
+            logger.info(f"Using {index.mode} quantized vectors for '{kb}'.")
+        else:
+            storage_context = StorageContext.from_defaults(persist_dir=storage_dir)
+            index = load_index_from_storage(storage_context)
+        size_bytes = _estimate_index_bytes(storage_dir, index)
+        with _CACHE_LOCK:
+            _INDEX_CACHE.put(kb, index, current_build_time, size_bytes)
+        return index
     except Exception as e:
         logger.error(f"Failed to load index from storage: {e}")
         raise
 
 
-def retrieve_rag_documentation_tool(query: str, tool_context: ToolContext) -> str:
+def serialize_nodes(nodes) -> list[dict]:
+    """JSON-friendly view of retrieved nodes (UI state and the search API)."""
+    return [{
+        # Source documents are keyed by knowledge entry id (see build_index.py)
+        "entry_id": node.node.ref_doc_id,
+        "text": node.text,
+        "score": node.score if node.score else 0.0,
+        "metadata": node.metadata or {}
+    } for node in nodes]
+
+
+def _format_nodes(nodes, tool_context: ToolContext) -> str:
+    """Formats retrieved nodes for the LLM and mirrors them into state for the UI."""
+    if not nodes:
+        tool_context.state[StateKeys.RAG_CONTEXT_NODES] = []
+        return "No relevant documentation found."
+
+    ui_nodes = serialize_nodes(nodes)
+    # Format for LLM: [Score] (ID) Text
+    results = [
+        f"--- [Relevance: {node.score:.4f}] (ID: {ui['entry_id']}) ---\n{node.text}\n"
+        for node, ui in zip(nodes, ui_nodes)
+    ]
+
+    # Update State for Frontend
+    tool_context.state[StateKeys.RAG_CONTEXT_NODES] = ui_nodes
+
+    return "\n".join(results)
+
+
+def retrieve_rag_documentation_tool(query: str, tool_context: ToolContext, knowledge_base: str = "") -> str:
     """
     Retreives information from the local knowledge base (RAG) using LlamaIndex.
     
     Args:
         query: The question or search term.
+        knowledge_base: Optional name of the knowledge base to search. Leave empty for the default one.
     """
     try:
         # [NEW] Capture Query for Insight
         tool_context.state[StateKeys.LAST_RAG_QUERY] = query
         
-        index = _get_index()
+        index = _get_index(knowledge_base)
         # Use retriever to get raw chunks instead of synthesized answer
-        retriever = index.as_retriever(similarity_top_k=5)
+        retriever = index.as_retriever(similarity_top_k=SIMILARITY_TOP_K)
         nodes = retriever.retrieve(query)
         
-        if not nodes:
-            tool_context.state[StateKeys.RAG_CONTEXT_NODES] = []
-            return "No relevant documentation found."
-            
-        # Serialize nodes for UI
-        ui_nodes = []
-        results = []
-        for node in nodes:
-            # Format for LLM: [Score] Text
-            results.append(f"--- [Relevance: {node.score:.4f}] ---\n{node.text}\n")
-            
-            # Format for UI
-            ui_nodes.append({
-                "text": node.text,
-                "score": node.score if node.score else 0.0,
-                "metadata": node.metadata or {}
-            })
-            
-        # Update State for Frontend
-        tool_context.state[StateKeys.RAG_CONTEXT_NODES] = ui_nodes
-            
-        return "\n".join(results)
+        return _format_nodes(nodes, tool_context)
     except Exception as e:
         logger.error(f"LlamaIndex retrieval failed: {e}")
         return f"Error retrieving documentation: {str(e)}"
+
+
+async def _aquery_embedding(text: str) -> list[float]:
+    """Query embedding of `text`, served from a small LRU cache when possible."""
+    embedding = _EMBEDDING_CACHE.get(text)
+    if embedding is not None:
+        _EMBEDDING_CACHE.move_to_end(text)
+        return embedding
+    embedding = await Settings.embed_model.aget_query_embedding(text)
+    _EMBEDDING_CACHE[text] = embedding
+    while len(_EMBEDDING_CACHE) > EMBEDDING_CACHE_SIZE:
+        _EMBEDDING_CACHE.popitem(last=False)
+    return embedding
+
+
+async def _aretrieve_nodes(query: str, knowledge_base: str = "", top_k: int = SIMILARITY_TOP_K):
+    # Index (re)loading reads and parses the persisted JSON stores
+    index = await asyncio.to_thread(_get_index, knowledge_base)
+
+    # The embedding call is network-bound: await it instead of blocking the loop
+    embedding = await _aquery_embedding(query)
+
+    # With the embedding precomputed the retriever only runs the similarity
+    # scan, which is CPU-bound and therefore pushed to the thread pool.
+    # (`retriever.aretrieve` would run that scan on the event loop.)
+    retriever = index.as_retriever(similarity_top_k=top_k)
+    query_bundle = QueryBundle(query_str=query, embedding=embedding)
+    return await asyncio.to_thread(retriever.retrieve, query_bundle)
+
+
+async def asearch_knowledge(query: str, knowledge_base: str = "", top_k: int = SIMILARITY_TOP_K) -> list[dict]:
+    """Top `top_k` nodes for `query` as dicts, without an LLM turn (same indexes and caches as the tools)."""
+    return serialize_nodes(await _aretrieve_nodes(query, knowledge_base, top_k))
+
+
+async def abatch_retrieve(queries: list[str], knowledge_base: str = "", top_k: int = SIMILARITY_TOP_K,
+                          batch_size: int = 32, workers: int = 4):
+    """
+    Retrieves many queries against one loaded index, yielding
+    (query, nodes, embed_ms, search_ms) in input order.
+
+    Each batch's query embeddings are requested concurrently (and land in the
+    embedding cache), then the similarity scans run on `workers` threads.
+    """
+    index = await asyncio.to_thread(_get_index, knowledge_base)
+    retriever = index.as_retriever(similarity_top_k=top_k)
+    loop = asyncio.get_running_loop()
+
+    async def embed(query):
+        start = time.perf_counter()
+        embedding = await _aquery_embedding(query)
+        return embedding, (time.perf_counter() - start) * 1000
+
+    def search(query, embedding):
+        start = time.perf_counter()
+        nodes = retriever.retrieve(QueryBundle(query_str=query, embedding=embedding))
+        return nodes, (time.perf_counter() - start) * 1000
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="kb-query") as pool:
+        for start in range(0, len(queries), batch_size):
+            batch = queries[start:start + batch_size]
+            embedded = await asyncio.gather(*(embed(query) for query in batch))
+            searched = await asyncio.gather(*(
+                loop.run_in_executor(pool, search, query, embedding)
+                for query, (embedding, _) in zip(batch, embedded)
+            ))
+            for query, (_, embed_ms), (nodes, search_ms) in zip(batch, embedded, searched):
+                yield query, nodes, embed_ms, search_ms
+
+
+async def afind_closest_entry(text: str, knowledge_base: str = "") -> Optional[tuple[str, float]]:
+    """(entry_id, score) of the indexed entry closest to `text`, or None if the index is empty."""
+    nodes = await _aretrieve_nodes(text, knowledge_base, top_k=1)
+    if not nodes:
+        return None
+    return nodes[0].node.ref_doc_id, nodes[0].score or 0.0
+
+
+async def aretrieve_rag_documentation_tool(query: str, tool_context: ToolContext, knowledge_base: str = "") -> str:
+    """
+    Retreives information from the local knowledge base (RAG) using LlamaIndex.
+    
+    Args:
+        query: The question or search term.
+        knowledge_base: Optional name of the knowledge base to search. Leave empty for the default one.
+    """
+    try:
+        tool_context.state[StateKeys.LAST_RAG_QUERY] = query
+
+        nodes = await _aretrieve_nodes(query, knowledge_base)
+
+        return _format_nodes(nodes, tool_context)
+    except Exception as e:
+        logger.error(f"LlamaIndex async retrieval failed: {e}")
+        return f"Error retrieving documentation: {str(e)}"
@@ -123,5 +123,121 @@ def serve(port, host, skills_dir, config, env_file, data_dir, knowledge_base_dir
         logger.exception(f"Failed to start server: {e}")
         sys.exit(1)
 
+@main.group()
+def kb():
+    """Knowledge base maintenance commands."""
+    pass
+
+def _transfer_progress(verb: str):
+    def report(stats):
+        click.echo(
+            f"{verb} {stats['rows']} rows ({stats['rows_per_sec']:.0f} rows/s), "
+            f"resume with --offset {stats['next_offset']}",
+            err=True
+        )
+    return report
+
+@kb.command("import")
+@click.argument("path")
+@click.option("--kb", "kb_name", default="", help="Knowledge base name (default KB if empty).")
+@click.option("--offset", default=0, help="Number of input lines to skip (resume point).")
+@click.option("--batch-size", default=5000, help="Rows per transaction.")
+def kb_import(path, kb_name, offset, batch_size):
+    """
+    Import experiences from a JSONL file (use - for stdin). Existing IDs are updated.
+    """
+    from context_pilot.utils.db_manager import get_db_manager
+    from context_pilot.utils.kb_transfer import import_jsonl
+    from context_pilot.utils.change_events import publish_change
+
+    stats = import_jsonl(get_db_manager(kb_name), path, offset, batch_size, _transfer_progress("Imported"))
+    if stats["rows"]:
+        publish_change(kb_name)
+    click.echo(
+        f"✅ Imported {stats['rows']} rows in {stats['seconds']:.2f}s "
+        f"({stats['rows_per_sec']:.0f} rows/s, {stats['skipped']} skipped).",
+        err=True
+    )
+
+@kb.command("export")
+@click.argument("path")
+@click.option("--kb", "kb_name", default="", help="Knowledge base name (default KB if empty).")
+@click.option("--offset", default=0, help="Number of rows to skip; appends to PATH when set.")
+@click.option("--batch-size", default=5000, help="Rows fetched per round trip.")
+def kb_export(path, kb_name, offset, batch_size):
+    """
+    Export experiences as JSONL to PATH (use - for stdout).
+    """
+    from context_pilot.utils.db_manager import get_db_manager
+    from context_pilot.utils.kb_transfer import export_jsonl
+
+    stats = export_jsonl(get_db_manager(kb_name), path, offset, batch_size, _transfer_progress("Exported"))
+    click.echo(
+        f"✅ Exported {stats['rows']} rows in {stats['seconds']:.2f}s ({stats['rows_per_sec']:.0f} rows/s).",
+        err=True
+    )
+
+@kb.command("query")
+@click.argument("path", default="-")
+@click.option("--kb", "kb_name", default="", help="Knowledge base name (default KB if empty).")
+@click.option("-k", "--top-k", default=5, help="Nodes returned per query.")
+@click.option("--output", "-o", default="-", help="Where to write the JSONL results (default: stdout).")
+@click.option("--batch-size", default=32, help="Query embeddings requested concurrently.")
+@click.option("--workers", default=4, help="Threads running the similarity search.")
+@click.option("--with-text", is_flag=True, help="Include the node texts in the results.")
+def kb_query(path, kb_name, top_k, output, batch_size, workers, with_text):
+    """
+    Run the queries in PATH (one per line or JSONL with a "query" field, - for stdin)
+    against the index and write JSONL results with per-query latency.
+    """
+    from context_pilot.utils.batch_query import run_queries
+
+    stats = run_queries(path, output, knowledge_base=kb_name, top_k=top_k,
+                        batch_size=batch_size, workers=workers, with_text=with_text)
+    click.echo(
+        f"✅ Ran {stats['queries']} queries in {stats['seconds']:.2f}s "
+        f"({stats['queries_per_sec']:.1f} queries/s, p50 {stats['p50_ms']:.1f}ms, p99 {stats['p99_ms']:.1f}ms).",
+        err=True
+    )
+
+@kb.command("snapshot")
+@click.option("--kb", "kb_name", default="", help="Knowledge base name (default KB if empty).")
+@click.option("--output-dir", default=None, help="Where to write the archive (default: KB_SNAPSHOT_DIR).")
+def kb_snapshot(kb_name, output_dir):
+    """
+    Snapshot the knowledge DB and its index into a .tar.gz while the server keeps running.
+    """
+    from context_pilot.utils.snapshot import create_snapshot
+
+    meta = create_snapshot(kb_name, output_dir)
+    click.echo(meta["path"])
+
+@kb.command("restore")
+@click.argument("archive")
+@click.option("--kb", "kb_name", default="", help="Target knowledge base (default: the one in the snapshot).")
+@click.option("--force", is_flag=True, help="Overwrite an existing knowledge DB.")
+@click.option("--if-missing", is_flag=True, help="Do nothing if the knowledge DB already exists (cold start).")
+def kb_restore(archive, kb_name, force, if_missing):
+    """
+    Restore a snapshot created by `kb snapshot` (DB and index, no re-embedding).
+
+    Cold start only: the server and any other process using the knowledge base
+    must be stopped; an open DB is never replaced.
+    """
+    from context_pilot.utils.snapshot import KnowledgeBaseInUseError, restore_snapshot
+
+    try:
+        meta = restore_snapshot(archive, kb_name or None, force=force)
+    except FileExistsError as e:
+        if if_missing:
+            click.echo(f"Skipping restore: {e}", err=True)
+            return
+        raise click.ClickException(str(e))
+    except KnowledgeBaseInUseError as e:
+        raise click.ClickException(str(e))
+    click.echo(f"✅ Restored '{meta['knowledge_base']}' from {archive}.", err=True)
+    if not meta["has_index"]:
+        click.echo("⚠️ The snapshot has no index: run a full build before querying.", err=True)
+
 if __name__ == "__main__":
     main()
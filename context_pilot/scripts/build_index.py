@@ -3,28 +3,39 @@ import json
 import logging
 import shutil
 from datetime import datetime
+import numpy as np
 from dotenv import load_dotenv
 
 # LlamaIndex Imports
 from llama_index.core import VectorStoreIndex, Settings, StorageContext, Document, load_index_from_storage
-from llama_index.llms.gemini import Gemini
-from llama_index.embeddings.gemini import GeminiEmbedding
 
 # Load configuration
 try:
     from .rag_config import RagConfig
+    from .quantized_index import save_quantized_vectors, remove_quantized_vectors
+    from .embeddings import make_embed_model
+    from .build_progress import BuildProgress, build_callback_manager, index_update_timer
 except ImportError:
     import sys
     sys.path.append(os.path.dirname(os.path.abspath(__file__)))
     from rag_config import RagConfig
+    from quantized_index import save_quantized_vectors, remove_quantized_vectors
+    from embeddings import make_embed_model
+    from build_progress import BuildProgress, build_callback_manager, index_update_timer
 
 # Import DB Manager
 try:
-    from context_pilot.utils.db_manager import default_db_manager
+    from context_pilot.utils.db_manager import default_db_manager, get_db_manager
+    from context_pilot.utils.vector_ops import blocked_top_k_neighbors, blocked_max_similarity
+    from context_pilot.utils.change_feed import ChangeSet, latest_change_seq, read_changes, truncate_changes
+    from context_pilot.utils.knowledge_store import count_entries, reconstruct_markdown
 except ImportError:
     import sys
     sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../../")))
-    from context_pilot.utils.db_manager import default_db_manager
+    from context_pilot.utils.db_manager import default_db_manager, get_db_manager
+    from context_pilot.utils.vector_ops import blocked_top_k_neighbors, blocked_max_similarity
+    from context_pilot.utils.change_feed import ChangeSet, latest_change_seq, read_changes, truncate_changes
+    from context_pilot.utils.knowledge_store import count_entries, reconstruct_markdown
 
 # Load Env
 load_dotenv()
@@ -33,89 +44,220 @@ load_dotenv()
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-def reconstruct_markdown(row) -> str:
-    """Reconstructs the markdown content from DB columns."""
-    return f"""# Intent
-{row['intent']}
+def _select_entries(conn, entry_ids: list[str] = None) -> list:
+    if entry_ids is None:
+        return conn.execute("SELECT * FROM knowledge_entries").fetchall()
+    rows = []
+    # Stay well below SQLite's bound-parameter limit
+    for start in range(0, len(entry_ids), 500):
+        chunk = entry_ids[start:start + 500]
+        rows.extend(conn.execute(
+            f"SELECT * FROM knowledge_entries WHERE id IN ({', '.join('?' for _ in chunk)})", chunk
+        ).fetchall())
+    return rows
 
-# 1. Problem Context
-{row['problem_context']}
-
-# 2. Root Cause Analysis
-{row['root_cause']}
-
-# 3. Solution / SOP
-{row['solution_steps']}
-
-# 4. Evidence
-{row['evidence']}
-"""
-
-def load_documents_from_db() -> list[Document]:
-    """Loads all entries from SQLite and converts them to LlamaIndex Documents."""
+def load_documents_from_db(db_manager=None, entry_ids: list[str] = None, progress=None) -> list[Document]:
+    """
+    Loads entries (all of them, or only `entry_ids`) from SQLite and converts them to LlamaIndex Documents.
+    `progress` (a BuildProgress) times the query and the markdown reconstruction separately.
+    """
     documents = []
+    db_manager = db_manager or default_db_manager
+    progress = progress or BuildProgress.disabled()
     
     # Ensure DB exists/is initialized before reading
-    default_db_manager.init_db()
+    db_manager.init_db()
     
     try:
-        with default_db_manager.get_connection() as conn:
-            rows = conn.execute("SELECT * FROM knowledge_entries").fetchall()
+        with db_manager.get_connection() as conn:
+            with progress.phase_timer("db_load"):
+                rows = _select_entries(conn, entry_ids)
             
-            for row in rows:
-                text = reconstruct_markdown(row)
+            with progress.phase_timer("reconstruct", total=len(rows)):
+                for row in rows:
+                    text = reconstruct_markdown(row)
                 
-                # Construct metadata
-                tags = [t.strip() for t in (row['tags'] or "").split(",") if t.strip()]
-                metadata = {
-                    "tags": tags,
-                    "contributor": row['contributor'],
-                    "timestamp": row['created_at'],
-                    "type": "cookbook_record",
-                    "intent": row['intent']
-                }
+                    # Construct metadata
+                    tags = [t.strip() for t in (row['tags'] or "").split(",") if t.strip()]
+                    metadata = {
+                        "tags": tags,
+                        "contributor": row['contributor'],
+                        "timestamp": row['created_at'],
+                        "type": "cookbook_record",
+                        "intent": row['intent']
+                    }
                 
-                # Create Document with explicit ID from DB
-                doc = Document(
-                    text=text, 
-                    id_=row['id'], 
-                    metadata=metadata
-                )
-                documents.append(doc)
+                    # Create Document with explicit ID from DB
+                    doc = Document(
+                        text=text, 
+                        id_=row['id'], 
+                        metadata=metadata
+                    )
+                    documents.append(doc)
+                    progress.advance("reconstruct")
     except Exception as e:
         logger.error(f"Failed to load documents from DB: {e}")
         
     return documents
 
-def build_index(mode: str = "auto", force: bool = False):
+def entry_embeddings(index) -> tuple[list[str], np.ndarray]:
+    """
+    Collects one embedding per knowledge entry from the index's vector store.
+    Entries split into several chunks are represented by the mean of their chunks.
+    """
+    data = index.vector_store.data
+    grouped = {}
+    for node_id, embedding in data.embedding_dict.items():
+        entry_id = data.text_id_to_ref_doc_id.get(node_id)
+        grouped.setdefault(entry_id, []).append(embedding)
+
+    entry_ids = list(grouped.keys())
+    if not entry_ids:
+        return [], np.empty((0, 0), dtype=np.float32)
+    matrix = np.stack([np.mean(np.asarray(v, dtype=np.float32), axis=0) for v in grouped.values()])
+    return entry_ids, matrix
+
+def _stale_neighbor_rows(conn, entry_ids: list[str], matrix: np.ndarray, changes: ChangeSet) -> list[int]:
+    """
+    Rows whose stored top-N `changes` can affect: the changed entries themselves,
+    entries listing a changed or deleted entry, and entries whose N-th score a
+    changed vector now beats. Returns None if nothing is stored yet (full recompute).
+    """
+    stored = conn.execute("SELECT entry_id, neighbor_id, score FROM knowledge_neighbors").fetchall()
+    if not stored:
+        return None
+
+    position = {entry_id: i for i, entry_id in enumerate(entry_ids)}
+    touched = set(changes.upserts) | set(changes.deletes)
+    changed = [position[entry_id] for entry_id in changes.upserts if entry_id in position]
+    stale = set(changed)
+    counts, weakest = {}, {}
+    for entry_id, neighbor_id, score in stored:
+        if neighbor_id in touched and entry_id in position:
+            stale.add(position[entry_id])
+        counts[entry_id] = counts.get(entry_id, 0) + 1
+        weakest[entry_id] = min(score, weakest.get(entry_id, score))
+
+    if changed:
+        k = min(RagConfig.RELATED_TOP_N, len(entry_ids) - 1)
+        # Entries with fewer than k stored neighbours take any newcomer
+        thresholds = np.array([
+            weakest[entry_id] if counts.get(entry_id, 0) >= k else -np.inf for entry_id in entry_ids
+        ], dtype=np.float32)
+        best = blocked_max_similarity(matrix, changed, RagConfig.NEIGHBOR_BLOCK_SIZE)
+        stale.update(np.nonzero(best > thresholds)[0].tolist())
+    return sorted(stale)
+
+def _write_neighbors(conn, cleared: set, rows: list[tuple]):
+    """Replaces the neighbour rows of the `cleared` entries (None: of every entry) with `rows`."""
+    if cleared is None:
+        conn.execute("DELETE FROM knowledge_neighbors")
+    else:
+        conn.executemany("DELETE FROM knowledge_neighbors WHERE entry_id = ?", [(e,) for e in cleared])
+    conn.executemany(
+        "INSERT INTO knowledge_neighbors (entry_id, rank, neighbor_id, score) VALUES (?, ?, ?, ?)",
+        rows
+    )
+
+def update_neighbor_table(index, db_manager=None, changes: ChangeSet = None):
+    """
+    Precomputes the top-N related entries for every entry into `knowledge_neighbors`.
+    With `changes` (an incremental build) only the rows they can affect are rewritten.
+    """
+    db_manager = db_manager or default_db_manager
+    entry_ids, matrix = entry_embeddings(index)
+    stale = None
+    if changes is not None:
+        with db_manager.get_connection() as conn:
+            stale = _stale_neighbor_rows(conn, entry_ids, matrix, changes)
+
+    rows = []
+    if entry_ids and stale != []:
+        indices, scores = blocked_top_k_neighbors(
+            matrix, RagConfig.RELATED_TOP_N, RagConfig.NEIGHBOR_BLOCK_SIZE, rows=stale
+        )
+        for i, row in enumerate(range(len(entry_ids)) if stale is None else stale):
+            for rank, (j, score) in enumerate(zip(indices[i], scores[i])):
+                rows.append((entry_ids[row], rank, entry_ids[j], float(score)))
+
+    cleared = None if stale is None else {entry_ids[row] for row in stale} | set(changes.deletes)
+    # Through the single writer, like every other write (see db_writer.py)
+    db_manager.writer.submit(_write_neighbors, cleared, rows).result()
+    updated = len(entry_ids) if stale is None else len(stale)
+    logger.info(f"Neighbour table updated: {updated} of {len(entry_ids)} entries, {len(rows)} links.")
+
+# Embedding client reused across builds of a long-running process (see build_worker.py).
+# Builds own this instance: it is never installed in the global Settings, which the
+# retrieval tool of the same process uses for query embeddings.
+_MODEL_CACHE: dict = {}
+
+def _embed_model(api_key: str):
+    key = (api_key, RagConfig.EMBEDDING_MODEL, RagConfig.EMBEDDING_DIM, RagConfig.EMBEDDING_DIM_MODE)
+    if key not in _MODEL_CACHE:
+        _MODEL_CACHE.clear()
+        _MODEL_CACHE[key] = make_embed_model(api_key)
+    return _MODEL_CACHE[key]
+
+def _index_components(api_key: str, progress: BuildProgress) -> dict:
+    """Index constructor arguments of one build: its embed model, callbacks and node parsing."""
+    callback_manager = build_callback_manager(progress)
+    # Copies of the configured transformations (chunk size, ...) that report to this build
+    transformations = [
+        t.model_copy(update={"callback_manager": callback_manager}) if "callback_manager" in type(t).model_fields else t
+        for t in Settings.transformations
+    ]
+    return {
+        "embed_model": _embed_model(api_key),
+        "callback_manager": callback_manager,
+        "transformations": transformations,
+    }
+
+def build_index(mode: str = "auto", force: bool = False, kb: str = None):
     """
     Builds/Updates the vector index from SQLite DB.
     Safeguarded by a file lock to prevent concurrent build corruption.
+    
+    `kb` selects a named knowledge base; None builds the default one.
+    Returns False if the build was skipped because another one held the lock.
     """
     import os
     from filelock import FileLock, Timeout
     
-    os.makedirs(RagConfig.STORAGE_DIR, exist_ok=True)
+    storage_dir = RagConfig.kb_storage_dir(kb)
+    os.makedirs(storage_dir, exist_ok=True)
     # Use parent directory for lock file so it's not deleted during full rebuild
-    lock_path = os.path.join(os.path.dirname(RagConfig.STORAGE_DIR), "index_build.lock")
+    lock_path = RagConfig.kb_lock_path(kb)
     lock = FileLock(lock_path, timeout=30)
     
     try:
         with lock:
-            _do_build_index(mode, force)
+            progress = BuildProgress(kb, mode)
+            try:
+                _do_build_index(mode, force, kb, progress)
+            except Exception as e:
+                progress.finish("failed", str(e))
+                raise
+            if progress.state == "running":
+                progress.finish()
     except Timeout:
         logger.warning(f"Another index build is currently holding the lock ({lock_path}). Skipping this update.")
+        return False
+    return True
 
-def _do_build_index(mode: str = "auto", force: bool = False):
+def _do_build_index(mode: str = "auto", force: bool = False, kb: str = None, progress: BuildProgress = None):
     """Inner core logic for building the index."""
+    progress = progress or BuildProgress.disabled()
     RagConfig.validate()
     
     # DB path check is handled by db_manager or implicit in load
+    storage_dir = RagConfig.kb_storage_dir(kb)
+    db_manager = get_db_manager(kb)
     
-    manifest_path = os.path.join(RagConfig.STORAGE_DIR, RagConfig.MANIFEST_FILE)
+    manifest_path = os.path.join(storage_dir, RagConfig.MANIFEST_FILE)
     current_model = RagConfig.EMBEDDING_MODEL
+    current_dim = RagConfig.EMBEDDING_DIM
     
-    storage_exists = os.path.exists(RagConfig.STORAGE_DIR)
+    storage_exists = os.path.exists(storage_dir)
     manifest_exists = os.path.exists(manifest_path)
     
     meta = {}
@@ -127,6 +269,8 @@ def _do_build_index(mode: str = "auto", force: bool = False):
             pass
 
     cached_model = meta.get("embedding_model")
+    # Manifests written before dimension support were always full width (0)
+    cached_dim = meta.get("embedding_dim", 0)
     
     # Logic Decision
     if force:
@@ -142,80 +286,170 @@ def _do_build_index(mode: str = "auto", force: bool = False):
         elif cached_model != current_model:
             logger.warning(f"Embedding model changed ({cached_model} -> {current_model}). Triggering FULL rebuild.")
             strategy = "full"
+        elif cached_dim != current_dim:
+            logger.warning(f"Embedding dimension changed ({cached_dim} -> {current_dim}). Triggering FULL rebuild.")
+            strategy = "full"
         else:
             strategy = "incremental"
 
-    logger.info(f"=== Starting Build (Strategy: {strategy.upper()}) ===")
+    logger.info(f"=== Starting Build (KB: {RagConfig.normalize_kb_name(kb)}, Strategy: {strategy.upper()}) ===")
+
+    # Everything up to `target_seq` in the change log is covered by this build;
+    # later changes are picked up (again) by the next one.
+    db_manager.init_db()
+    with db_manager.get_connection() as conn:
+        target_seq = latest_change_seq(conn)
+        last_seq = meta.get("change_seq")
+        changes = None
+        if strategy == "incremental" and last_seq is not None:
+            changes = read_changes(conn, last_seq, target_seq)
+
+    if changes is not None and not changes:
+        logger.info(f"No changes since sequence {last_seq}. Index is up to date.")
+        progress.finish("up_to_date")
+        return
 
     api_key = os.getenv("GOOGLE_API_KEY")
     if not api_key:
         raise ValueError("GOOGLE_API_KEY environment variable is not set.")
     
-    Settings.llm = Gemini(model="models/gemini-3-flash-preview", api_key=api_key)
-    Settings.embed_model = GeminiEmbedding(
-        model_name=current_model, 
-        api_key=api_key
-    )
+    components = _index_components(api_key, progress)
 
-    logger.info(f"Loading data from SQLite DB: {RagConfig.DB_PATH}")
-    documents = load_documents_from_db()
-    logger.info(f"Loaded {len(documents)} documents.")
+    logger.info(f"Loading data from SQLite DB: {db_manager.db_path}")
+    if changes is not None:
+        # Only the entries named in the change log
+        documents = load_documents_from_db(db_manager, changes.upserts, progress)
+        logger.info(f"Loaded {len(documents)} changed documents ({len(changes.deletes)} deleted).")
+    else:
+        documents = load_documents_from_db(db_manager, progress=progress)
+        logger.info(f"Loaded {len(documents)} documents.")
     
     if not documents and strategy == "full":
         logger.warning("No documents found in DB. Nothing to build.")
+        progress.finish("empty")
         return
 
     index = None
     
     if strategy == "full":
-        if os.path.exists(RagConfig.STORAGE_DIR):
-            shutil.rmtree(RagConfig.STORAGE_DIR)
-        os.makedirs(RagConfig.STORAGE_DIR, exist_ok=True)
+        if os.path.exists(storage_dir):
+            shutil.rmtree(storage_dir)
+        os.makedirs(storage_dir, exist_ok=True)
         
         logger.info("Building fresh VectorStoreIndex...")
-        index = VectorStoreIndex.from_documents(documents)
+        with index_update_timer(progress, len(documents)):
+            index = VectorStoreIndex.from_documents(documents, **components)
         
     elif strategy == "incremental":
         try:
-            logger.info(f"Loading existing index from: {RagConfig.STORAGE_DIR}")
-            storage_context = StorageContext.from_defaults(persist_dir=RagConfig.STORAGE_DIR)
-            index = load_index_from_storage(storage_context)
+            logger.info(f"Loading existing index from: {storage_dir}")
+            with progress.phase_timer("index_load"):
+                storage_context = StorageContext.from_defaults(persist_dir=storage_dir)
+                index = load_index_from_storage(storage_context, **components)
             
-            logger.info("Refreshing index (Incremental Update)...")
-            # refresh() updates docs with matching IDs if hash is different, and adds new docs
-            result = index.refresh(documents) 
-            changes = sum(result)
-            logger.info(f"Incremental update applied. {changes} documents updated/added.")
+            with index_update_timer(progress, len(documents)):
+                if changes is not None:
+                    logger.info("Applying change log (Incremental Update)...")
+                    _apply_changes(index, documents, changes)
+                else:
+                    # Index predates the change log: diff against every entry once
+                    logger.info("Refreshing index (Incremental Update)...")
+                    # refresh() updates docs with matching IDs if hash is different, and adds new docs
+                    result = index.refresh(documents) 
+                    logger.info(f"Incremental update applied. {sum(result)} documents updated/added.")
             
         except Exception as e:
             logger.error(f"Incremental update failed ({e}). Falling back to FULL rebuild.")
-            if os.path.exists(RagConfig.STORAGE_DIR):
-                shutil.rmtree(RagConfig.STORAGE_DIR)
-            os.makedirs(RagConfig.STORAGE_DIR, exist_ok=True)
-            index = VectorStoreIndex.from_documents(documents)
+            changes = None
+            if os.path.exists(storage_dir):
+                shutil.rmtree(storage_dir)
+            os.makedirs(storage_dir, exist_ok=True)
+            documents = load_documents_from_db(db_manager, progress=progress)
+            with index_update_timer(progress, len(documents)):
+                index = VectorStoreIndex.from_documents(documents, **components)
 
     if index:
-        logger.info(f"Persisting index to: {RagConfig.STORAGE_DIR}")
-        index.storage_context.persist(persist_dir=RagConfig.STORAGE_DIR)
+        logger.info(f"Persisting index to: {storage_dir}")
+        vector_storage = RagConfig.VECTOR_STORAGE
+        with progress.phase_timer("persist"):
+            index.storage_context.persist(persist_dir=storage_dir)
+            if vector_storage == "float32":
+                remove_quantized_vectors(storage_dir)
+            else:
+                save_quantized_vectors(storage_dir, index, vector_storage)
+
+        try:
+            with progress.phase_timer("neighbors"):
+                update_neighbor_table(index, db_manager, changes)
+        except Exception as e:
+            # Related-entry lookups are an optimisation; never fail the build over them
+            logger.error(f"Failed to update neighbour table: {e}")
+
+        with db_manager.get_connection() as conn:
+            doc_count = count_entries(conn)
 
         manifest = {
             "source": "sqlite",
+            "knowledge_base": RagConfig.normalize_kb_name(kb),
             "build_time": datetime.now().isoformat(),
             "embedding_model": current_model,
+            "embedding_dim": current_dim,
+            "vector_storage": vector_storage,
             "strategy": strategy,
-            "doc_count": len(documents)
+            "doc_count": doc_count,
+            # Where the time went, to spot bottlenecks as the KB grows
+            "build_stats": progress.summary()
         }
-        with open(manifest_path, 'w') as f:
-            json.dump(manifest, f, indent=2)
+        _apply_change_log(db_manager, manifest_path, manifest, target_seq)
     
     logger.info("✅ Build Complete.")
 
+def has_pending_changes(kb: str = None) -> bool:
+    """Cheap staleness check (no model setup): False only if the index covers the whole change log."""
+    manifest_path = os.path.join(RagConfig.kb_storage_dir(kb), RagConfig.MANIFEST_FILE)
+    try:
+        with open(manifest_path, 'r') as f:
+            last_seq = json.load(f).get("change_seq")
+    except (OSError, ValueError):
+        return True
+    if last_seq is None:
+        return True
+    db_manager = get_db_manager(kb)
+    db_manager.init_db()
+    with db_manager.get_connection() as conn:
+        return latest_change_seq(conn) > last_seq
+
+def _apply_changes(index, documents: list[Document], changes: ChangeSet):
+    """Applies a collapsed change set to a loaded index: deletions first, then upserts."""
+    deleted = 0
+    for entry_id in changes.deletes:
+        # Entries created and deleted between two builds were never indexed
+        if index.docstore.get_ref_doc_info(entry_id) is not None:
+            index.delete_ref_doc(entry_id, delete_from_docstore=True)
+            deleted += 1
+    result = index.refresh_ref_docs(documents)
+    logger.info(f"Incremental update applied. {sum(result)} documents updated/added, {deleted} deleted.")
+
+def _apply_change_log(db_manager, manifest_path: str, manifest: dict, target_seq: int):
+    """
+    Records `target_seq` as applied, then truncates the log up to it.
+    The manifest is written first: a crash in between only leaves entries the next
+    build skips, never a gap.
+    """
+    manifest["change_seq"] = target_seq
+    with open(manifest_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    removed = db_manager.writer.submit(truncate_changes, target_seq).result()
+    if removed:
+        logger.info(f"Change log truncated through sequence {target_seq} ({removed} entries).")
+
 if __name__ == "__main__":
     import argparse
     parser = argparse.ArgumentParser(description="Build/Update RAG Index form SQLite")
     parser.add_argument("--mode", choices=["incremental", "full"], default="incremental", 
                       help="Build mode: incremental (default), full (wipe & rebuild)")
     parser.add_argument("--force", "-f", action="store_true", help="Force rebuild")
+    parser.add_argument("--kb", default=None, help="Named knowledge base to build (default: the default KB)")
     args = parser.parse_args()
     
-    build_index(mode=args.mode, force=args.force)
+    build_index(mode=args.mode, force=args.force, kb=args.kb)
@@ -0,0 +1,194 @@
+"""
+Per-phase timings and progress counters of an index build.
+
+BuildProgress times the phases of build_index.py and mirrors its state to a small
+JSON file next to the index (`RagConfig.kb_progress_path`), which the admin API
+streams to the dashboard. The summary ends up in the manifest as well.
+
+Chunking and embedding happen inside llama_index calls; they are timed through
+the callback events of the build's own callback manager (`build_callback_manager`,
+passed to the index explicitly, never through the global Settings, so queries served
+by the same process are not counted), and the rest of those calls is reported as
+`vector_insert`.
+"""
+import os
+import json
+import time
+import logging
+from contextlib import contextmanager
+from datetime import datetime
+
+from llama_index.core.callbacks import CallbackManager, CBEventType, EventPayload
+from llama_index.core.callbacks.base_handler import BaseCallbackHandler
+
+try:
+    from .rag_config import RagConfig
+except ImportError:
+    from rag_config import RagConfig
+
+logger = logging.getLogger(__name__)
+
+
+class BuildProgress:
+    # Minimum delay between two progress file writes for counter updates
+    WRITE_INTERVAL = 0.25
+
+    def __init__(self, kb: str = None, mode: str = "", persist: bool = True):
+        self.kb = RagConfig.normalize_kb_name(kb)
+        self.mode = mode
+        self.path = RagConfig.kb_progress_path(kb) if persist else None
+        self.state = "running"
+        self.phase = None
+        self.error = None
+        self.timings: dict[str, float] = {}
+        self.counters: dict[str, int] = {}
+        self.totals: dict[str, int] = {}
+        self.started_at = datetime.now().isoformat()
+        self._start = time.perf_counter()
+        self._last_write = 0.0
+        self._write(force=True)
+
+    @contextmanager
+    def phase_timer(self, name: str, total: int = None):
+        """Times a phase; `total` is the expected value of the counter of the same name."""
+        previous, self.phase = self.phase, name
+        if total is not None:
+            self.totals[name] = total
+        start = time.perf_counter()
+        self._write(force=True)
+        try:
+            yield self
+        finally:
+            self.add_time(name, time.perf_counter() - start)
+            self.phase = previous
+            self._write(force=True)
+
+    def add_time(self, name: str, seconds: float):
+        self.timings[name] = self.timings.get(name, 0.0) + seconds
+
+    def advance(self, name: str, n: int = 1):
+        self.counters[name] = self.counters.get(name, 0) + n
+        self._write()
+
+    def finish(self, state: str = "done", error: str = None):
+        self.state, self.error, self.phase = state, error, None
+        self._write(force=True)
+        timings = ", ".join(f"{k} {v:.2f}s" for k, v in self.timings.items())
+        logger.info(f"Build {state} in {self.elapsed():.2f}s ({timings or 'no phases'}).")
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self._start
+
+    def summary(self) -> dict:
+        """Timings and counters as recorded in the manifest."""
+        return {
+            "total_seconds": round(self.elapsed(), 3),
+            "phases": {k: round(v, 3) for k, v in self.timings.items()},
+            "counters": dict(self.counters),
+        }
+
+    def to_dict(self) -> dict:
+        return {
+            "knowledge_base": self.kb,
+            "mode": self.mode,
+            "state": self.state,
+            "phase": self.phase,
+            "error": self.error,
+            "started_at": self.started_at,
+            "updated_at": datetime.now().isoformat(),
+            "totals": dict(self.totals),
+            **self.summary(),
+        }
+
+    @classmethod
+    def disabled(cls) -> "BuildProgress":
+        """Records timings without writing a progress file."""
+        return cls(persist=False)
+
+    def _write(self, force: bool = False):
+        if self.path is None:
+            return
+        now = time.perf_counter()
+        if not force and now - self._last_write < self.WRITE_INTERVAL:
+            return
+        self._last_write = now
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            # Readers poll the file: replace it atomically so they never see half a write
+            tmp = self.path + ".tmp"
+            with open(tmp, 'w') as f:
+                json.dump(self.to_dict(), f)
+            os.replace(tmp, self.path)
+        except OSError as e:
+            logger.debug(f"Could not write build progress: {e}")
+
+
+def read_progress(kb: str = None) -> dict:
+    """The last progress written for `kb`, or None if it was never built."""
+    try:
+        with open(RagConfig.kb_progress_path(kb), 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+class _ProgressCallbackHandler(BaseCallbackHandler):
+    """Times llama_index's node parsing and embedding events."""
+
+    _PHASES = {CBEventType.NODE_PARSING: "chunking", CBEventType.EMBEDDING: "embedding"}
+
+    def __init__(self, progress: BuildProgress):
+        super().__init__(event_starts_to_ignore=[], event_ends_to_ignore=[])
+        self._progress = progress
+        self._starts = {}
+        self._phase_before = None
+
+    def on_event_start(self, event_type, payload=None, event_id="", parent_id="", **kwargs) -> str:
+        if event_type in self._PHASES:
+            self._starts[event_id] = time.perf_counter()
+            self._phase_before = self._progress.phase
+            self._progress.phase = self._PHASES[event_type]
+        return event_id
+
+    def on_event_end(self, event_type, payload=None, event_id="", **kwargs) -> None:
+        start = self._starts.pop(event_id, None)
+        if start is None:
+            return
+        self._progress.phase = self._phase_before
+        self._progress.add_time(self._PHASES[event_type], time.perf_counter() - start)
+        payload = payload or {}
+        if event_type == CBEventType.EMBEDDING:
+            self._progress.advance("chunks_embedded", len(payload.get(EventPayload.CHUNKS, [])))
+        else:
+            self._progress.advance("nodes", len(payload.get(EventPayload.NODES, [])))
+
+    def start_trace(self, trace_id=None) -> None:
+        pass
+
+    def end_trace(self, trace_id=None, trace_map=None) -> None:
+        pass
+
+
+def build_callback_manager(progress: BuildProgress) -> CallbackManager:
+    """Callback manager timing one build's node parsing and embedding into `progress`."""
+    return CallbackManager([_ProgressCallbackHandler(progress)])
+
+
+@contextmanager
+def index_update_timer(progress: BuildProgress, documents: int):
+    """
+    Times an index update (from_documents / refresh / change log), splitting it into
+    chunking, embedding and vector_insert. The index must report to
+    `build_callback_manager(progress)`.
+    """
+    def nested_time():
+        return progress.timings.get("chunking", 0.0) + progress.timings.get("embedding", 0.0)
+
+    before = nested_time()
+    progress.totals["documents"] = documents
+    try:
+        with progress.phase_timer("vector_insert"):
+            yield
+    finally:
+        # The phase timer counted the whole call; keep only what was not chunking or embedding
+        progress.timings["vector_insert"] = max(0.0, progress.timings["vector_insert"] - (nested_time() - before))
@@ -0,0 +1,267 @@
+"""
+Resident index build worker.
+
+Builds run on one background thread, so llama_index and the model clients are
+imported/created once instead of per build. Requests are queued as jobs; a request
+for a KB that already has a pending job of the same mode (or a pending full
+rebuild) joins that job instead of queueing another one.
+
+There is one resident worker per storage root (`RagConfig.build_worker_dir`): the
+first process to take its file lock runs the builds. Workers of other processes
+(e.g. the server next to run_auto_index.py) forward their requests through request
+files in that directory and follow the job state the owner writes back; they take
+over the builds if the owner exits.
+"""
+import os
+import json
+import uuid
+import logging
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime
+
+from filelock import FileLock, Timeout
+
+try:
+    from .rag_config import RagConfig
+except ImportError:
+    import sys
+    sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+    from rag_config import RagConfig
+
+logger = logging.getLogger(__name__)
+
+QUEUED, RUNNING, SUCCEEDED, SKIPPED, FAILED = "queued", "running", "succeeded", "skipped", "failed"
+
+
+@dataclass
+class BuildJob:
+    kb: str
+    mode: str
+    force: bool = False
+    id: str = field(default_factory=lambda: uuid.uuid4().hex[:12])
+    state: str = QUEUED
+    # Number of triggers served by this job (1 + coalesced duplicates)
+    requests: int = 1
+    created_at: str = field(default_factory=lambda: datetime.now().isoformat())
+    started_at: str = None
+    finished_at: str = None
+    error: str = None
+    _done: threading.Event = field(default_factory=threading.Event, repr=False)
+
+    @property
+    def finished(self) -> bool:
+        return self.state in (SUCCEEDED, SKIPPED, FAILED)
+
+    def wait(self, timeout: float = None) -> bool:
+        return self._done.wait(timeout)
+
+    def to_dict(self) -> dict:
+        return {k: v for k, v in self.__dict__.items() if not k.startswith("_")}
+
+
+class BuildWorker:
+    # Finished jobs kept for the job API
+    HISTORY = int(os.getenv("KB_BUILD_JOB_HISTORY", "50"))
+    # How often forwarded requests and job states are exchanged with the owner
+    POLL_SECONDS = float(os.getenv("KB_BUILD_WORKER_POLL_SECONDS", "0.5"))
+
+    def __init__(self, build_fn=None, worker_dir: str = None):
+        # `build_fn(mode=, force=, kb=)` returns False when the build was skipped
+        self._build_fn = build_fn
+        self._dir = worker_dir or RagConfig.build_worker_dir()
+        os.makedirs(self._dir, exist_ok=True)
+        # Not thread-local: a takeover acquires it on the worker thread, close() releases it
+        self._file_lock = FileLock(os.path.join(self._dir, "worker.lock"), thread_local=False)
+        self._cond = threading.Condition()
+        self._pending: list[BuildJob] = []
+        self._jobs: dict[str, BuildJob] = {}
+        # Owner: ids of the forwarded requests each local job serves
+        self._forwarded: dict[str, list[str]] = {}
+        # Non-owner: jobs handed over to the owner and not finished yet
+        self._remote: list[BuildJob] = []
+        self._closed = False
+        self.owner = self._try_own()
+        self._thread = threading.Thread(target=self._loop, name="kb-build-worker", daemon=True)
+        self._thread.start()
+
+    def _try_own(self) -> bool:
+        try:
+            self._file_lock.acquire(timeout=0)
+        except Timeout:
+            return False
+        logger.info(f"Resident build worker running in this process (pid {os.getpid()}).")
+        return True
+
+    def submit(self, kb: str = None, mode: str = "incremental", force: bool = False) -> BuildJob:
+        """Queues a build, or returns the pending job that already covers it."""
+        kb = RagConfig.normalize_kb_name(kb)
+        with self._cond:
+            if not self.owner:
+                # Another process runs the builds (it coalesces duplicates itself)
+                job = BuildJob(kb=kb, mode=mode, force=force)
+                self._jobs[job.id] = job
+                self._remote.append(job)
+                self._trim_history()
+                self._write_json(f"{job.id}.request", {"kb": kb, "mode": mode, "force": force})
+                logger.info(f"Build request for '{kb}' ({mode}) forwarded to the resident worker (job {job.id}).")
+                return job
+            for job in self._pending:
+                if job.kb == kb and (job.mode == mode or job.mode == "full"):
+                    job.requests += 1
+                    job.force = job.force or force
+                    logger.info(f"Build request for '{kb}' ({mode}) merged into pending job {job.id}.")
+                    return job
+            job = BuildJob(kb=kb, mode=mode, force=force)
+            self._pending.append(job)
+            self._jobs[job.id] = job
+            self._trim_history()
+            self._cond.notify()
+        return job
+
+    def get(self, job_id: str) -> BuildJob:
+        with self._cond:
+            return self._jobs.get(job_id)
+
+    def jobs(self) -> list[BuildJob]:
+        """All known jobs, newest first."""
+        with self._cond:
+            return list(reversed(self._jobs.values()))
+
+    def close(self, timeout: float = None):
+        """Stops after the queued jobs have run, and hands the builds over to another process."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._thread.join(timeout)
+        with self._cond:
+            owner, self.owner = self.owner, False
+        if owner:
+            self._file_lock.release()
+
+    def _trim_history(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished]
+        for job_id in finished[:max(0, len(finished) - self.HISTORY)]:
+            del self._jobs[job_id]
+
+    def _build(self, job: BuildJob):
+        if self._build_fn is None:
+            # Imported here, once per process, on the worker thread
+            from context_pilot.scripts.build_index import build_index
+            self._build_fn = build_index
+        return self._build_fn(mode=job.mode, force=job.force, kb=job.kb)
+
+    def _write_json(self, name: str, data: dict):
+        # Written aside and renamed, so readers never see a partial file
+        path = os.path.join(self._dir, name)
+        with open(path + ".tmp", 'w') as f:
+            json.dump(data, f)
+        os.replace(path + ".tmp", path)
+
+    def _adopt_requests(self):
+        """Owner: queues the requests forwarded by other processes."""
+        for name in sorted(os.listdir(self._dir)):
+            if not name.endswith(".request"):
+                continue
+            path = os.path.join(self._dir, name)
+            try:
+                with open(path, 'r') as f:
+                    request = json.load(f)
+                os.remove(path)
+            except (OSError, ValueError):
+                continue
+            job = self.submit(request.get("kb"), request.get("mode", "incremental"), request.get("force", False))
+            with self._cond:
+                self._forwarded.setdefault(job.id, []).append(name[:-len(".request")])
+            self._publish(job)
+
+    def _publish(self, job: BuildJob):
+        """Owner: writes the state of `job` for the processes whose requests it serves."""
+        with self._cond:
+            request_ids = list(self._forwarded.get(job.id, []))
+            state = job.to_dict()
+        for request_id in request_ids:
+            self._write_json(f"{request_id}.json", {**state, "id": request_id})
+
+    def _follow_remote(self):
+        """Updates the jobs forwarded to the owner from the states it wrote back."""
+        for job in list(self._remote):
+            path = os.path.join(self._dir, f"{job.id}.json")
+            try:
+                with open(path, 'r') as f:
+                    state = json.load(f)
+            except (OSError, ValueError):
+                continue
+            with self._cond:
+                for key in ("state", "requests", "started_at", "finished_at", "error"):
+                    setattr(job, key, state.get(key))
+                if not job.finished:
+                    continue
+                self._remote.remove(job)
+            os.remove(path)
+            job._done.set()
+
+    def _orphan_remote(self):
+        """Fails the forwarded jobs an exited owner had taken but not finished."""
+        for job in list(self._remote):
+            if os.path.exists(os.path.join(self._dir, f"{job.id}.request")):
+                continue  # never taken: adopted again below
+            with self._cond:
+                job.state, job.finished_at = FAILED, datetime.now().isoformat()
+                job.error = "The build worker running this job exited."
+                self._remote.remove(job)
+            job._done.set()
+
+    def _sync(self):
+        if not self.owner and not self._closed and self._try_own():
+            # The owner exited: take over its role and the requests it had not taken yet
+            self._follow_remote()
+            self._orphan_remote()
+            with self._cond:
+                self.owner = True
+        if self.owner and not self._closed:
+            self._adopt_requests()
+        self._follow_remote()
+
+    def _run(self, job: BuildJob):
+        self._publish(job)
+        logger.info(f"Build job {job.id} started (KB: {job.kb}, mode: {job.mode}, requests: {job.requests}).")
+        try:
+            state, error = (SKIPPED if self._build(job) is False else SUCCEEDED), None
+        except Exception as e:
+            logger.error(f"❌ Build job {job.id} failed: {e}")
+            state, error = FAILED, str(e)
+
+        with self._cond:
+            job.state, job.error, job.finished_at = state, error, datetime.now().isoformat()
+        self._publish(job)
+        with self._cond:
+            self._forwarded.pop(job.id, None)
+        job._done.set()
+        logger.info(f"Build job {job.id} {state}.")
+
+    def _loop(self):
+        while True:
+            self._sync()
+            with self._cond:
+                if not (self.owner and self._pending):
+                    if self._closed:
+                        return
+                    self._cond.wait(self.POLL_SECONDS)
+                    continue
+                job = self._pending.pop(0)
+                job.state, job.started_at = RUNNING, datetime.now().isoformat()
+            self._run(job)
+
+
+_worker: BuildWorker = None
+_worker_lock = threading.Lock()
+
+
+def get_build_worker() -> BuildWorker:
+    """The process-wide build worker (started on first use)."""
+    global _worker
+    with _worker_lock:
+        if _worker is None:
+            _worker = BuildWorker()
+        return _worker
@@ -0,0 +1,110 @@
+"""
+Embedding model factory shared by build_index.py and the retrieval tool, so both
+sides always embed with the same model and output dimensionality.
+"""
+import os
+from typing import Any, List
+
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from llama_index.core.bridge.pydantic import PrivateAttr
+from llama_index.embeddings.gemini import GeminiEmbedding
+
+try:
+    from .rag_config import RagConfig
+except ImportError:
+    from rag_config import RagConfig
+
+try:
+    from context_pilot.utils.vector_ops import truncate_and_normalize
+except ImportError:
+    import sys
+    sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+    from context_pilot.utils.vector_ops import truncate_and_normalize
+
+
+class _OutputDimensionality:
+    """Proxy for the `google.generativeai` module that requests a reduced output size."""
+
+    def __init__(self, module: Any, dim: int):
+        self._module = module
+        self._dim = dim
+
+    def embed_content(self, **kwargs):
+        return self._module.embed_content(output_dimensionality=self._dim, **kwargs)
+
+    async def embed_content_async(self, **kwargs):
+        return await self._module.embed_content_async(output_dimensionality=self._dim, **kwargs)
+
+
+class ReducedGeminiEmbedding(GeminiEmbedding):
+    """GeminiEmbedding that asks the API for `output_dimensionality` dimensions."""
+
+    def __init__(self, output_dimensionality: int, **kwargs: Any):
+        super().__init__(**kwargs)
+        self._model = _OutputDimensionality(self._model, output_dimensionality)
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "ReducedGeminiEmbedding"
+
+
+class TruncatedEmbedding(BaseEmbedding):
+    """
+    Wraps another embedding model, truncating its vectors to `dim` components and
+    renormalizing them (reduced Gemini outputs are not unit length either).
+    """
+
+    dim: int
+    _inner: BaseEmbedding = PrivateAttr()
+
+    def __init__(self, inner: BaseEmbedding, dim: int, **kwargs: Any):
+        super().__init__(
+            model_name=inner.model_name,
+            embed_batch_size=inner.embed_batch_size,
+            dim=dim,
+            **kwargs,
+        )
+        self._inner = inner
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "TruncatedEmbedding"
+
+    def _get_query_embedding(self, query: str) -> List[float]:
+        return truncate_and_normalize(self._inner.get_query_embedding(query), self.dim)
+
+    def _get_text_embedding(self, text: str) -> List[float]:
+        return truncate_and_normalize(self._inner.get_text_embedding(text), self.dim)
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        return [truncate_and_normalize(e, self.dim) for e in self._inner.get_text_embedding_batch(texts)]
+
+    async def _aget_query_embedding(self, query: str) -> List[float]:
+        return truncate_and_normalize(await self._inner.aget_query_embedding(query), self.dim)
+
+    async def _aget_text_embedding(self, text: str) -> List[float]:
+        return truncate_and_normalize(await self._inner.aget_text_embedding(text), self.dim)
+
+    async def _aget_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        embeddings = await self._inner.aget_text_embedding_batch(texts)
+        return [truncate_and_normalize(e, self.dim) for e in embeddings]
+
+
+def make_embed_model(api_key: str = None) -> BaseEmbedding:
+    """
+    Builds the embedding model described by RagConfig.
+    
+    With RagConfig.EMBEDDING_DIM set, vectors are reduced to that size either by the
+    API ("request" mode) or by truncating full-width vectors locally ("truncate" mode).
+    """
+    api_key = api_key or os.getenv("GOOGLE_API_KEY")
+    dim = RagConfig.EMBEDDING_DIM
+
+    if dim and RagConfig.EMBEDDING_DIM_MODE == "request":
+        base = ReducedGeminiEmbedding(output_dimensionality=dim, model_name=RagConfig.EMBEDDING_MODEL, api_key=api_key)
+    else:
+        base = GeminiEmbedding(model_name=RagConfig.EMBEDDING_MODEL, api_key=api_key)
+
+    if dim:
+        return TruncatedEmbedding(base, dim)
+    return base
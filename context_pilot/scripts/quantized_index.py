@@ -0,0 +1,154 @@
+"""
+Quantized (float16 / int8) vector storage for the knowledge index.
+
+build_index.py writes a sidecar next to the LlamaIndex stores; the retrieval tool
+then loads only the docstore plus the quantized matrix instead of the JSON vector
+store, and rescores a small candidate set against memory-mapped float32 vectors.
+"""
+import os
+import json
+import logging
+from typing import List
+
+import numpy as np
+from llama_index.core import Settings
+from llama_index.core.retrievers import BaseRetriever
+from llama_index.core.schema import NodeWithScore, QueryBundle
+from llama_index.core.storage.docstore import SimpleDocumentStore
+
+try:
+    from context_pilot.utils.vector_ops import (
+        QUANTIZATION_MODES, normalize_rows, quantize_rows, quantized_scores, top_k_indices
+    )
+except ImportError:
+    import sys
+    sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+    from context_pilot.utils.vector_ops import (
+        QUANTIZATION_MODES, normalize_rows, quantize_rows, quantized_scores, top_k_indices
+    )
+
+logger = logging.getLogger(__name__)
+
+META_FILE = "vectors_meta.json"
+IDS_FILE = "vectors_ids.json"
+QUANTIZED_FILE = "vectors_quantized.npy"
+SCALES_FILE = "vectors_scales.npy"
+FULL_FILE = "vectors_f32.npy"
+
+
+def save_quantized_vectors(storage_dir: str, index, mode: str) -> dict:
+    """Writes the quantized sidecar for every node embedding held by `index`."""
+    if mode not in QUANTIZATION_MODES:
+        raise ValueError(f"Unknown quantization mode: {mode}")
+
+    embedding_dict = index.vector_store.data.embedding_dict
+    node_ids = list(embedding_dict.keys())
+    if node_ids:
+        full = normalize_rows(np.asarray([embedding_dict[n] for n in node_ids], dtype=np.float32))
+    else:
+        full = np.empty((0, 0), dtype=np.float32)
+    quantized, scales = quantize_rows(full, mode)
+
+    remove_quantized_vectors(storage_dir)
+    np.save(os.path.join(storage_dir, FULL_FILE), full)
+    np.save(os.path.join(storage_dir, QUANTIZED_FILE), quantized)
+    if scales is not None:
+        np.save(os.path.join(storage_dir, SCALES_FILE), scales)
+    with open(os.path.join(storage_dir, IDS_FILE), 'w') as f:
+        json.dump(node_ids, f)
+
+    meta = {"mode": mode, "count": len(node_ids), "dim": int(full.shape[1]) if node_ids else 0}
+    with open(os.path.join(storage_dir, META_FILE), 'w') as f:
+        json.dump(meta, f, indent=2)
+    logger.info(f"Quantized vectors written ({mode}, {meta['count']} x {meta['dim']}).")
+    return meta
+
+
+def remove_quantized_vectors(storage_dir: str):
+    """Drops a stale sidecar, e.g. after switching back to float32 storage."""
+    for name in (META_FILE, IDS_FILE, QUANTIZED_FILE, SCALES_FILE, FULL_FILE):
+        path = os.path.join(storage_dir, name)
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def has_quantized_vectors(storage_dir: str) -> bool:
+    return os.path.exists(os.path.join(storage_dir, META_FILE))
+
+
+class QuantizedIndex:
+    """Read-only index over a docstore plus a quantized embedding matrix."""
+
+    def __init__(self, docstore, node_ids: list[str], quantized: np.ndarray, scales, full: np.ndarray,
+                 mode: str, rescore_candidates: int = 50):
+        self.docstore = docstore
+        self.node_ids = node_ids
+        self.quantized = quantized
+        self.scales = scales
+        self.full = full
+        self.mode = mode
+        self.rescore_candidates = rescore_candidates
+
+    @classmethod
+    def load(cls, storage_dir: str, rescore_candidates: int = 50) -> "QuantizedIndex":
+        with open(os.path.join(storage_dir, META_FILE), 'r') as f:
+            meta = json.load(f)
+        with open(os.path.join(storage_dir, IDS_FILE), 'r') as f:
+            node_ids = json.load(f)
+
+        scales = None
+        if meta["mode"] == "int8":
+            scales = np.load(os.path.join(storage_dir, SCALES_FILE))
+        return cls(
+            docstore=SimpleDocumentStore.from_persist_dir(storage_dir),
+            node_ids=node_ids,
+            quantized=np.load(os.path.join(storage_dir, QUANTIZED_FILE)),
+            scales=scales,
+            # Only the rescored candidate rows are ever paged in
+            full=np.load(os.path.join(storage_dir, FULL_FILE), mmap_mode="r"),
+            mode=meta["mode"],
+            rescore_candidates=rescore_candidates,
+        )
+
+    def memory_bytes(self) -> int:
+        """Resident size of the vectors (the float32 copy is memory-mapped)."""
+        total = self.quantized.nbytes
+        if self.scales is not None:
+            total += self.scales.nbytes
+        return total
+
+    def search(self, query_embedding, top_k: int) -> list[tuple[str, float]]:
+        """First pass on the quantized matrix, then exact cosine rescoring of the best candidates."""
+        if not self.node_ids:
+            return []
+        query = normalize_rows(np.asarray(query_embedding, dtype=np.float32)[None, :])[0]
+
+        approx = quantized_scores(self.quantized, self.scales, query)
+        candidates = top_k_indices(approx, max(top_k, self.rescore_candidates))
+
+        # Sorted row access keeps the memory-mapped reads sequential
+        candidates = np.sort(candidates)
+        exact = np.asarray(self.full[candidates], dtype=np.float32) @ query
+        best = top_k_indices(exact, top_k)
+        return [(self.node_ids[candidates[i]], float(exact[i])) for i in best]
+
+    def as_retriever(self, similarity_top_k: int = 5, **kwargs) -> "QuantizedRetriever":
+        return QuantizedRetriever(self, similarity_top_k)
+
+
+class QuantizedRetriever(BaseRetriever):
+    """LlamaIndex retriever over a QuantizedIndex, so tools can use it like a VectorStoreIndex."""
+
+    def __init__(self, index: QuantizedIndex, similarity_top_k: int):
+        super().__init__()
+        self._index = index
+        self._similarity_top_k = similarity_top_k
+
+    def _retrieve(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        embedding = query_bundle.embedding
+        if embedding is None:
+            embedding = Settings.embed_model.get_query_embedding(query_bundle.query_str)
+
+        hits = self._index.search(embedding, self._similarity_top_k)
+        nodes = self._index.docstore.get_nodes([node_id for node_id, _ in hits])
+        return [NodeWithScore(node=node, score=score) for node, (_, score) in zip(nodes, hits)]
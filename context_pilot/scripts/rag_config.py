@@ -1,4 +1,5 @@
 import os
+import re
 from dataclasses import dataclass
 from dotenv import load_dotenv
 
@@ -13,6 +14,16 @@ class RagConfig:
     # Using adk_data/rag_storage to keep it separate from raw data
     STORAGE_DIR = os.getenv("RAG_STORAGE_DIR", os.path.abspath(os.path.join(os.path.dirname(__file__), "../../adk_data/rag_storage")))
     
+    # Named Knowledge Bases
+    # Each named KB lives in KB_ROOT_DIR/<name>/ with its own SQLite DB, index and manifest.
+    # The "default" KB keeps using LOCAL_DATA_DIR / STORAGE_DIR above.
+    KB_ROOT_DIR = os.getenv("RAG_KB_ROOT_DIR", os.path.abspath(os.path.join(os.path.dirname(__file__), "../../adk_data/knowledge_bases")))
+    DEFAULT_KB = "default"
+    
+    # Memory budget for indexes kept loaded by the retrieval tool (LRU eviction), against
+    # their estimated resident size (see llama_rag_tool._estimate_index_bytes)
+    INDEX_CACHE_MB = int(os.getenv("RAG_INDEX_CACHE_MB", "1024"))
+    
     # Manifest File (scheme C versioning)
     MANIFEST_FILE = "index_meta.json"
     DB_FILENAME = "knowledge_base.sqlite"
@@ -23,6 +34,93 @@ class RagConfig:
     
     # Model Config
     EMBEDDING_MODEL = "models/gemini-embedding-001"
+    # Reduced embedding size (0 = native width). "request" asks the API for fewer
+    # dimensions; "truncate" cuts full-width vectors locally. Both renormalize.
+    # Changing the size triggers a full rebuild, like changing EMBEDDING_MODEL.
+    EMBEDDING_DIM = int(os.getenv("RAG_EMBEDDING_DIM", "0"))
+    EMBEDDING_DIM_MODE = os.getenv("RAG_EMBEDDING_DIM_MODE", "request")
+    
+    # Vector Storage: "float32" (LlamaIndex JSON store only), "float16" or "int8".
+    # Quantized modes add a sidecar that the retrieval tool searches instead of the
+    # JSON store, rescoring the best RESCORE_CANDIDATES hits with exact float32 vectors.
+    # int8 is the recommended quantized mode: 4x smaller than float32 at about the same
+    # search latency. float16 only halves memory and searches several times slower.
+    VECTOR_STORAGE = os.getenv("RAG_VECTOR_STORAGE", "float32")
+    RESCORE_CANDIDATES = int(os.getenv("RAG_RESCORE_CANDIDATES", "50"))
+    
+    # Related Experiences (precomputed neighbour table)
+    RELATED_TOP_N = int(os.getenv("RAG_RELATED_TOP_N", "5"))
+    NEIGHBOR_BLOCK_SIZE = int(os.getenv("RAG_NEIGHBOR_BLOCK_SIZE", "1024"))
+    
+    # save_experience asks for confirmation before saving an entry whose content is this
+    # similar (MinHash estimate, 0..1, about ±0.05 at 64 values) to an existing one
+    NEAR_DUP_THRESHOLD = float(os.getenv("KB_NEAR_DUP_THRESHOLD", "0.8"))
+    # save_experience offers to update the indexed entry closest to the new intent when
+    # their retrieval score reaches this threshold (0 disables the check)
+    SEMANTIC_MATCH_THRESHOLD = float(os.getenv("KB_SEMANTIC_MATCH_THRESHOLD", "0.85"))
+    
+    # Snapshots (DB + index archives, see utils/snapshot.py)
+    SNAPSHOT_DIR = os.getenv("KB_SNAPSHOT_DIR", os.path.abspath(os.path.join(os.path.dirname(__file__), "../../adk_data/snapshots")))
+    SNAPSHOT_PAGES_PER_STEP = int(os.getenv("KB_SNAPSHOT_PAGES_PER_STEP", "1024"))
+    
+    @staticmethod
+    def normalize_kb_name(kb: str = None) -> str:
+        """Returns the canonical KB name, rejecting names that could escape KB_ROOT_DIR."""
+        if not kb:
+            return RagConfig.DEFAULT_KB
+        if not re.fullmatch(r"[A-Za-z0-9_-]+", kb):
+            raise ValueError(f"Invalid knowledge base name: {kb!r}")
+        return kb
+    
+    @staticmethod
+    def kb_storage_dir(kb: str = None) -> str:
+        kb = RagConfig.normalize_kb_name(kb)
+        if kb == RagConfig.DEFAULT_KB:
+            return RagConfig.STORAGE_DIR
+        return os.path.join(RagConfig.KB_ROOT_DIR, kb, "rag_storage")
+    
+    @staticmethod
+    def kb_db_path(kb: str = None) -> str:
+        kb = RagConfig.normalize_kb_name(kb)
+        if kb == RagConfig.DEFAULT_KB:
+            return os.path.join(RagConfig.LOCAL_DATA_DIR, RagConfig.DB_FILENAME)
+        return os.path.join(RagConfig.KB_ROOT_DIR, kb, RagConfig.DB_FILENAME)
+    
+    @staticmethod
+    def kb_lock_path(kb: str = None) -> str:
+        """Build lock of a KB; kept next to (not in) the storage dir so full rebuilds don't delete it."""
+        return os.path.join(os.path.dirname(RagConfig.kb_storage_dir(kb)), "index_build.lock")
+    
+    @staticmethod
+    def kb_notify_path(kb: str = None) -> str:
+        """Touched by writers after a commit; run_auto_index.py watches it (see utils/change_events.py)."""
+        return os.path.join(os.path.dirname(RagConfig.kb_storage_dir(kb)), "changes.notify")
+    
+    @staticmethod
+    def kb_progress_path(kb: str = None) -> str:
+        """Progress/timings of the running or last build (see scripts/build_progress.py)."""
+        return os.path.join(os.path.dirname(RagConfig.kb_storage_dir(kb)), "build_progress.json")
+    
+    @staticmethod
+    def build_worker_dir() -> str:
+        """Lock and request files of the resident build worker, one per storage root (see scripts/build_worker.py)."""
+        return os.path.join(os.path.dirname(RagConfig.STORAGE_DIR), "build_worker")
+    
+    @staticmethod
+    def kb_exists(kb: str = None) -> bool:
+        """True for the default KB and for named KBs with a directory under KB_ROOT_DIR."""
+        kb = RagConfig.normalize_kb_name(kb)
+        return kb == RagConfig.DEFAULT_KB or os.path.isdir(os.path.join(RagConfig.KB_ROOT_DIR, kb))
+    
+    @staticmethod
+    def list_knowledge_bases() -> list[str]:
+        names = [RagConfig.DEFAULT_KB]
+        if os.path.isdir(RagConfig.KB_ROOT_DIR):
+            names += sorted(
+                d for d in os.listdir(RagConfig.KB_ROOT_DIR)
+                if os.path.isdir(os.path.join(RagConfig.KB_ROOT_DIR, d)) and d != RagConfig.DEFAULT_KB
+            )
+        return names
     
     @staticmethod
     def validate():
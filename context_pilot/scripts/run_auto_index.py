@@ -1,26 +1,36 @@
 import os
+import sys
+import json
 import time
-import subprocess
 import logging
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger("AutoIndex")
 
+# Safety-net sweep for writes that published no change event (e.g. manual SQL)
 INTERVAL = int(os.getenv("RAG_AUTO_INDEX_INTERVAL", "300"))
+# Debounce of change events: build after QUIET seconds without events, at most MAX_WAIT after the first
+QUIET = float(os.getenv("RAG_REINDEX_QUIET_SECONDS", "2"))
+MAX_WAIT = float(os.getenv("RAG_REINDEX_MAX_WAIT_SECONDS", "30"))
+POLL = float(os.getenv("RAG_REINDEX_POLL_SECONDS", "0.5"))
 
 def main():
-    logger.info(f"Starting Auto RAG Indexer... (Interval: {INTERVAL} seconds)")
-    
-    # Path to build script
-    project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    script_path = os.path.join(project_root, "scripts", "build_index.py")
-    
+    logger.info(f"Starting Auto RAG Indexer... (debounce {QUIET}s/{MAX_WAIT}s, sweep every {INTERVAL} seconds)")
+
+    # Builds run on the resident worker (imports and clients stay warm): in this process,
+    # unless another one (e.g. the server) already hosts it, which then gets our requests
+    sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
+    from context_pilot.scripts.build_worker import get_build_worker, FAILED
+    from context_pilot.scripts.build_index import has_pending_changes
+    from context_pilot.utils.change_events import ChangeWatcher, Debouncer
+    worker = get_build_worker()
+
     # Status file path (in the same storage dir as the index)
     from context_pilot.scripts.rag_config import RagConfig
     status_file = os.path.join(RagConfig.STORAGE_DIR, "index_status.json")
     os.makedirs(RagConfig.STORAGE_DIR, exist_ok=True)
 
-    def update_status(status, message="", result=""):
+    def update_status(status, message="", result="", next_sweep=None):
         try:
             with open(status_file, 'w') as f:
                 json.dump({
@@ -28,36 +38,61 @@ def main():
                     "message": message,
                     "result": result,
                     "last_check": time.strftime('%Y-%m-%d %H:%M:%S'),
-                    "next_run": time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(time.time() + INTERVAL)) if status == "Idle" else "Now"
+                    "next_run": time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(next_sweep)) if status == "Idle" else "Now"
                 }, f, indent=2)
         except Exception as e:
             logger.error(f"Failed to update status file: {e}")
 
-    import json
-    
+    def run_builds(kbs, reason):
+        update_status("Running", f"Incremental RAG index build ({reason})...")
+        jobs = []
+        for kb in kbs:
+            logger.info(f"Triggering incremental RAG index build (KB: {kb}, {reason})...")
+            jobs.append(worker.submit(kb, "incremental"))
+
+        failed = []
+        for job in jobs:
+            job.wait()
+            if job.state == FAILED:
+                logger.error(f"Build index for '{job.kb}' failed: {job.error}")
+                failed.append(job.kb)
+
+        if failed:
+            update_status("Idle", f"Last build failed ({', '.join(failed)})", "Error", next_sweep)
+        else:
+            logger.info("Background RAG index build completed.")
+            update_status("Idle", "Success", "Success", next_sweep)
+
+    kbs = RagConfig.list_knowledge_bases()
+    watcher = ChangeWatcher(kbs)
+    debouncers = {}
+    next_sweep = time.time() + INTERVAL
+    # Catch up on whatever changed while the indexer was down
+    run_builds(kbs, "startup")
+
     while True:
         try:
-            update_status("Running", "Triggering incremental RAG index build...")
-            logger.info("Triggering background incremental RAG index build...")
-            result = subprocess.run(
-                ["python", script_path, "--mode=incremental"], 
-                capture_output=True, 
-                text=True
-            )
-            
-            if result.returncode != 0:
-                logger.error(f"Build index failed with code {result.returncode}:\n{result.stderr}")
-                update_status("Idle", "Last build failed", "Error")
-            else:
-                logger.info("Background RAG index check completed.")
-                update_status("Idle", "Success", "Success")
-                
+            kbs = RagConfig.list_knowledge_bases()
+            for kb in watcher.poll(kbs):
+                debouncers.setdefault(kb, Debouncer(QUIET, MAX_WAIT)).event()
+
+            due = [kb for kb, debouncer in debouncers.items() if debouncer.due()]
+            if due:
+                for kb in due:
+                    debouncers[kb].reset()
+                run_builds(due, "change event")
+
+            if time.time() >= next_sweep:
+                next_sweep = time.time() + INTERVAL
+                stale = [kb for kb in kbs if has_pending_changes(kb)]
+                if stale:
+                    run_builds(stale, "sweep")
+
         except Exception as e:
             logger.error(f"Error during auto index trigger: {e}")
-            update_status("Idle", f"Error: {str(e)}", "Error")
-            
-        logger.info(f"Sleeping for {INTERVAL} seconds...")
-        time.sleep(INTERVAL)
+            update_status("Idle", f"Error: {str(e)}", "Error", next_sweep)
+
+        time.sleep(POLL)
 
 if __name__ == "__main__":
     main()
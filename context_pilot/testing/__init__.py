@@ -29,5 +29,6 @@ Usage (in your test file):
 
 from .api_client import AdkApiTestClient
 from .mock_llm import MockLlm
+from .hash_embedding import HashEmbedding
 
-__all__ = ["AdkApiTestClient", "MockLlm"]
+__all__ = ["AdkApiTestClient", "MockLlm", "HashEmbedding"]
@@ -0,0 +1,46 @@
+# Offline embedding model for benchmarks and tests.
+# Feature hashing of lowercase words: deterministic across processes and runs,
+# no network, and texts sharing words score higher (unlike MockEmbedding).
+
+import re
+import hashlib
+from typing import List
+
+import numpy as np
+from llama_index.core.base.embeddings.base import BaseEmbedding
+
+_WORD = re.compile(r"\w+")
+
+
+class HashEmbedding(BaseEmbedding):
+    """Unit-length bag-of-words vectors of `dim` signed hash buckets."""
+
+    dim: int = 256
+
+    def __init__(self, dim: int = 256, **kwargs):
+        super().__init__(model_name="local-hash", dim=dim, **kwargs)
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "HashEmbedding"
+
+    def embed(self, text: str) -> List[float]:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for word in _WORD.findall(text.lower()):
+            digest = hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest()
+            bucket = int.from_bytes(digest[:4], "little") % self.dim
+            vector[bucket] += 1.0 if digest[4] & 1 else -1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def _get_query_embedding(self, query: str) -> List[float]:
+        return self.embed(query)
+
+    def _get_text_embedding(self, text: str) -> List[float]:
+        return self.embed(text)
+
+    async def _aget_query_embedding(self, query: str) -> List[float]:
+        return self.embed(query)
+
+    async def _aget_text_embedding(self, text: str) -> List[float]:
+        return self.embed(text)
@@ -0,0 +1,93 @@
+# Synthetic, labeled knowledge bases for benchmarks.
+# Entries are troubleshooting records built from a fixed vocabulary; each query
+# paraphrases one entry (its component/symptom, one of its details and noise words),
+# so that entry is the relevant answer. Everything is seeded and reproducible.
+
+import os
+import json
+import random
+from contextlib import contextmanager
+from unittest.mock import patch
+
+from context_pilot.scripts.rag_config import RagConfig
+from context_pilot.utils.db_manager import get_db_manager
+from context_pilot.utils.kb_transfer import import_jsonl
+from .hash_embedding import HashEmbedding
+
+COMPONENTS = [
+    "redis", "kafka", "nginx", "postgres", "mysql", "elasticsearch", "grpc", "envoy",
+    "zookeeper", "rabbitmq", "memcached", "etcd", "consul", "jvm", "kubelet", "coredns",
+]
+SYMPTOMS = [
+    "timeout", "deadlock", "oom", "crashloop", "latency spike", "connection reset",
+    "disk full", "certificate expired", "leader election", "replication lag", "thread starvation",
+    "high cpu",
+]
+SERVICES = [
+    "login", "checkout", "search", "payments", "inventory", "notifications", "reporting",
+    "billing", "gateway", "recommendations", "media upload", "scheduler",
+]
+_SYLLABLES = ["ka", "lo", "mi", "ne", "ru", "sa", "to", "vi", "ze", "po", "da", "fe", "gu", "ri", "yo", "bel"]
+DETAILS_PER_ENTRY = 4
+
+
+def _vocabulary(rng: random.Random, size: int) -> list[str]:
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choice(_SYLLABLES) for _ in range(rng.randint(2, 4))))
+    return sorted(words)
+
+
+def make_dataset(entries: int, queries: int, seed: int = 7) -> tuple[list[dict], list[dict]]:
+    """(entries, queries): entries in import format, queries as {"query", "relevant": [entry ids]}."""
+    rng = random.Random(seed)
+    vocabulary = _vocabulary(rng, 2000)
+
+    records, details = [], []
+    for i in range(entries):
+        component, symptom, service = rng.choice(COMPONENTS), rng.choice(SYMPTOMS), rng.choice(SERVICES)
+        words = rng.sample(vocabulary, DETAILS_PER_ENTRY)
+        details.append((component, symptom, service, words))
+        records.append({
+            "id": f"bench-{i:06d}",
+            "intent": f"{component} {symptom} in {service}",
+            "problem_context": f"The {service} service reports {symptom} from {component} ({words[0]}, {words[1]}).",
+            "root_cause": f"{component} misconfigured: {words[2]} {words[3]}",
+            "solution_steps": f"1. Inspect {words[0]}\n2. Tune {component} {words[2]}\n3. Restart {service}",
+            "tags": f"{component},{service}",
+            "contributor": f"user{i % 50}",
+        })
+
+    labeled = []
+    for _ in range(queries):
+        i = rng.randrange(entries)
+        component, symptom, service, words = details[i]
+        # One detail word, two distractors, and the service only half of the time
+        terms = [component, symptom, rng.choice(words)] + rng.sample(vocabulary, 2)
+        if rng.random() < 0.5:
+            terms.append(service)
+        rng.shuffle(terms)
+        labeled.append({"query": " ".join(terms), "relevant": [records[i]["id"]]})
+    return records, labeled
+
+
+def seed_kb(kb: str, entries: list[dict]) -> dict:
+    """Bulk-imports `entries` into the KB's `knowledge_entries` table (under RagConfig.KB_ROOT_DIR)."""
+    path = os.path.join(RagConfig.KB_ROOT_DIR, RagConfig.normalize_kb_name(kb), "seed.jsonl")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding="utf-8") as f:
+        f.writelines(json.dumps(entry) + "\n" for entry in entries)
+    try:
+        return import_jsonl(get_db_manager(kb), path)
+    finally:
+        os.remove(path)
+
+
+@contextmanager
+def offline_build(dim: int = 256):
+    """Makes build_index.py embed with HashEmbedding (no API key or network)."""
+    from context_pilot.scripts import build_index as build_module
+    with patch.dict(build_module._MODEL_CACHE, clear=True), \
+         patch.dict(os.environ, {"GOOGLE_API_KEY": os.getenv("GOOGLE_API_KEY") or "offline"}), \
+         patch.object(build_module, "make_embed_model", lambda api_key: HashEmbedding(dim=dim)):
+        yield build_module
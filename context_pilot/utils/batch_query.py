@@ -0,0 +1,95 @@
+"""
+Batch retrieval against a knowledge base index (used by `context-pilot kb query`).
+
+Input has one query per line, either plain text or a JSON object with a "query"
+field (and optionally an "id", echoed back). Output is one JSON object per query
+with the retrieved nodes and its embedding/search latency, in input order.
+"""
+import sys
+import json
+import time
+import asyncio
+import logging
+
+try:
+    from context_pilot.utils.kb_transfer import open_stream
+    from context_pilot.context_pilot_app.tools.llama_rag_tool import (
+        SIMILARITY_TOP_K, abatch_retrieve, serialize_nodes
+    )
+except ImportError:
+    import os
+    sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
+    from context_pilot.utils.kb_transfer import open_stream
+    from context_pilot.context_pilot_app.tools.llama_rag_tool import (
+        SIMILARITY_TOP_K, abatch_retrieve, serialize_nodes
+    )
+
+logger = logging.getLogger(__name__)
+
+
+def read_queries(lines) -> list[dict]:
+    """{"id", "query"} records from plain or JSONL lines; blank lines are skipped."""
+    queries = []
+    for number, line in enumerate(lines, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        record = None
+        if line.startswith("{"):
+            try:
+                record = json.loads(line)
+            except ValueError:
+                pass
+        if isinstance(record, dict) and record.get("query"):
+            queries.append({"id": record.get("id", number), "query": str(record["query"])})
+        else:
+            queries.append({"id": number, "query": line})
+    return queries
+
+
+def _percentile(values: list[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+async def arun_queries(queries: list[dict], out, knowledge_base: str = "", top_k: int = SIMILARITY_TOP_K,
+                       batch_size: int = 32, workers: int = 4, with_text: bool = False) -> dict:
+    """Writes one JSONL result per query to `out` and returns throughput/latency stats."""
+    start = time.perf_counter()
+    latencies = []
+    records = iter(queries)
+    async for query, nodes, embed_ms, search_ms in abatch_retrieve(
+            [q["query"] for q in queries], knowledge_base, top_k, batch_size, workers):
+        record = next(records)
+        results = serialize_nodes(nodes)
+        if not with_text:
+            for node in results:
+                del node["text"]
+        latencies.append(embed_ms + search_ms)
+        out.write(json.dumps({
+            "id": record["id"],
+            "query": query,
+            "nodes": results,
+            "embed_ms": round(embed_ms, 3),
+            "search_ms": round(search_ms, 3),
+            "latency_ms": round(embed_ms + search_ms, 3),
+        }, ensure_ascii=False) + "\n")
+
+    seconds = time.perf_counter() - start
+    return {
+        "queries": len(latencies),
+        "seconds": seconds,
+        "queries_per_sec": len(latencies) / seconds if seconds else 0.0,
+        "p50_ms": _percentile(latencies, 50),
+        "p99_ms": _percentile(latencies, 99),
+    }
+
+
+def run_queries(path: str, output: str = "-", **kwargs) -> dict:
+    """Reads queries from `path` and writes results to `output` (`-` for stdin/stdout)."""
+    with open_stream(path, "r") as f:
+        queries = read_queries(f)
+    with open_stream(output, "w") as out:
+        return asyncio.run(arun_queries(queries, out, **kwargs))
@@ -0,0 +1,88 @@
+"""
+Change events between the processes that write a KB and the indexer.
+
+After committing, a writer touches the KB's notify file (`RagConfig.kb_notify_path`).
+run_auto_index.py polls the files' mtimes (one stat per KB, no DB or API access)
+and debounces the events per KB before queueing an incremental build, which then
+only embeds the entries named in the change log.
+"""
+import os
+import time
+import logging
+
+try:
+    from context_pilot.scripts.rag_config import RagConfig
+except ImportError:
+    import sys
+    sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
+    from context_pilot.scripts.rag_config import RagConfig
+
+logger = logging.getLogger(__name__)
+
+
+def publish_change(kb: str = None):
+    """Signals the indexer that `kb` changed. Best effort: the periodic sweep catches missed events."""
+    path = RagConfig.kb_notify_path(kb)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'a'):
+            pass
+        os.utime(path)
+    except OSError as e:
+        logger.warning(f"⚠️ Could not publish change event for '{RagConfig.normalize_kb_name(kb)}': {e}")
+
+
+class ChangeWatcher:
+    """Reports the KBs whose notify file was touched since the previous poll."""
+
+    def __init__(self, kbs: list[str]):
+        self._seen = {kb: self._mtime(kb) for kb in kbs}
+
+    @staticmethod
+    def _mtime(kb: str):
+        try:
+            return os.stat(RagConfig.kb_notify_path(kb)).st_mtime_ns
+        except OSError:
+            return None
+
+    def poll(self, kbs: list[str]) -> list[str]:
+        changed = []
+        for kb in kbs:
+            mtime = self._mtime(kb)
+            if mtime is not None and mtime != self._seen.get(kb):
+                changed.append(kb)
+            self._seen[kb] = mtime
+        return changed
+
+
+class Debouncer:
+    """
+    Fires once events stop for `quiet` seconds, or `max_wait` seconds after the
+    first pending event at the latest (so a steady stream still gets indexed).
+    """
+
+    def __init__(self, quiet: float = 2.0, max_wait: float = 30.0, clock=time.monotonic):
+        self.quiet = quiet
+        self.max_wait = max_wait
+        self._clock = clock
+        self._first = None
+        self._last = None
+
+    @property
+    def pending(self) -> bool:
+        return self._first is not None
+
+    def event(self):
+        now = self._clock()
+        if self._first is None:
+            self._first = now
+        self._last = now
+
+    def due(self) -> bool:
+        if self._first is None:
+            return False
+        now = self._clock()
+        return now - self._last >= self.quiet or now - self._first >= self.max_wait
+
+    def reset(self):
+        self._first = self._last = None
@@ -0,0 +1,46 @@
+"""
+Helpers for the `kb_changes` log, which triggers on `knowledge_entries` append to
+(see migration 3). build_index.py consumes it from the sequence number recorded
+in its manifest, so incremental builds only touch the entries that changed.
+"""
+import sqlite3
+from dataclasses import dataclass, field
+
+
+@dataclass
+class ChangeSet:
+    """Net effect of a run of the change log: the last operation per entry wins."""
+    upserts: list[str] = field(default_factory=list)
+    deletes: list[str] = field(default_factory=list)
+    max_seq: int = 0
+
+    def __bool__(self):
+        return bool(self.upserts or self.deletes)
+
+
+def latest_change_seq(conn: sqlite3.Connection) -> int:
+    """Highest sequence number ever assigned (AUTOINCREMENT keeps it after truncation)."""
+    row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'kb_changes'").fetchone()
+    return row[0] if row else 0
+
+
+def read_changes(conn: sqlite3.Connection, after_seq: int, up_to_seq: int = None) -> ChangeSet:
+    """Collapses the log entries in (after_seq, up_to_seq] into per-entry upserts/deletes."""
+    if up_to_seq is None:
+        up_to_seq = latest_change_seq(conn)
+    last_op = {}
+    for entry_id, op in conn.execute(
+        "SELECT entry_id, op FROM kb_changes WHERE seq > ? AND seq <= ? ORDER BY seq",
+        (after_seq, up_to_seq)
+    ):
+        last_op[entry_id] = op
+
+    changes = ChangeSet(max_seq=max(after_seq, up_to_seq))
+    for entry_id, op in last_op.items():
+        (changes.deletes if op == "D" else changes.upserts).append(entry_id)
+    return changes
+
+
+def truncate_changes(conn: sqlite3.Connection, up_to_seq: int) -> int:
+    """Drops the log entries that have been applied; returns how many were removed."""
+    return conn.execute("DELETE FROM kb_changes WHERE seq <= ?", (up_to_seq,)).rowcount
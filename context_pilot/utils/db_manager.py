@@ -1,6 +1,11 @@
 import sqlite3
 import os
+import time
+import asyncio
 import logging
+import threading
+import functools
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import contextmanager
 from datetime import datetime
 
@@ -8,64 +13,322 @@ from datetime import datetime
 # Try relative import first, fallback to absolute path trick if needed (common in this codebase's scripts)
 try:
     from context_pilot.scripts.rag_config import RagConfig
+    from context_pilot.utils.migrations import apply_migrations
+    from context_pilot.utils.db_writer import DBWriter
+    from context_pilot.utils.knowledge_store import resume_bulk_load_triggers
 except ImportError:
     import sys
     # Add project root to path
     sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
     from context_pilot.scripts.rag_config import RagConfig
+    from context_pilot.utils.migrations import apply_migrations
+    from context_pilot.utils.db_writer import DBWriter
+    from context_pilot.utils.knowledge_store import resume_bulk_load_triggers
 
 logger = logging.getLogger(__name__)
 
+class _PooledConnection:
+    """A connection plus the bookkeeping needed to reuse and reap it."""
+
+    def __init__(self, conn: sqlite3.Connection, generation: int):
+        self.conn = conn
+        self.generation = generation
+        self.last_used = time.monotonic()
+        self.in_use = False
+        self.depth = 0
+        self.closed = False
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            try:
+                self.conn.close()
+            except Exception:
+                pass
+
+
 class DBManager:
-    def __init__(self, db_path: str = None):
-        self.db_path = db_path or os.path.join(RagConfig.LOCAL_DATA_DIR, RagConfig.DB_FILENAME)
+    """
+    Hands out long-lived SQLite connections.
+
+    - `get_connection()` reuses one connection per thread (nested use shares it).
+    - `pooled_connection()` borrows from a bounded pool; meant for short jobs on
+      executor threads.
+    - `await run(fn, *args)` is the async API: it calls `fn(conn, *args)` on the
+      DB executor with a pooled connection, so the event loop never waits on SQLite.
+    - `await write(fn, *args)` queues a write to the single writer (see db_writer.py),
+      which batches concurrent writes into one transaction instead of having
+      connections compete for the write lock.
+    
+    Pragmas are applied once when a connection is created, and connections left
+    idle for longer than `idle_timeout` seconds are closed: on the next release, or
+    by a timer armed while idle connections exist (so an idle process closes them too).
+    """
+
+    BUSY_TIMEOUT_MS = int(os.getenv("KB_SQLITE_BUSY_TIMEOUT_MS", "5000"))
+    CACHE_SIZE_KB = int(os.getenv("KB_SQLITE_CACHE_SIZE_KB", "16384"))
+    MMAP_SIZE = int(os.getenv("KB_SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+    POOL_SIZE = int(os.getenv("KB_SQLITE_POOL_SIZE", "4"))
+    IDLE_TIMEOUT = float(os.getenv("KB_SQLITE_IDLE_TIMEOUT", "300"))
+
+    def __init__(self, db_path: str = None, pool_size: int = None, idle_timeout: float = None):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._slots: list[_PooledConnection] = []
+        self._pool: list[_PooledConnection] = []
+        self._pool_size = pool_size or self.POOL_SIZE
+        self._pool_sem = threading.BoundedSemaphore(self._pool_size)
+        self.idle_timeout = self.IDLE_TIMEOUT if idle_timeout is None else idle_timeout
+        self._last_reap = time.monotonic()
+        self._reap_timer: threading.Timer = None
+        self._generation = 0
+        self._init_lock = threading.Lock()
+        self._schema_ready = False
+        self._executor: ThreadPoolExecutor = None
+        self._writer: DBWriter = None
+        self._db_path = db_path or os.path.join(RagConfig.LOCAL_DATA_DIR, RagConfig.DB_FILENAME)
         self._ensure_dir()
 
+    @property
+    def db_path(self) -> str:
+        return self._db_path
+
+    @db_path.setter
+    def db_path(self, value: str):
+        # Pooled connections point at the old file; drop them all
+        self._db_path = value
+        self.reset()
+
+    @property
+    def generation(self) -> int:
+        """
+        Bumped whenever the manager drops its connections (close_all, new db_path).
+        Holders of their own connection (see new_connection) reconnect when it changes.
+        """
+        return self._generation
+
+    def new_connection(self) -> sqlite3.Connection:
+        """An unpooled connection with the per-connection pragmas; the caller owns and closes it."""
+        return self._connect()
+
     def _ensure_dir(self):
         dirname = os.path.dirname(self.db_path)
         if dirname:
             os.makedirs(dirname, exist_ok=True)
 
-    def init_db(self):
-        """Initializes the database using WAL mode and creates tables if they don't exist."""
-        try:
-            with self.get_connection() as conn:
-                # Enable Write-Ahead Logging for better concurrency
-                conn.execute("PRAGMA journal_mode=WAL;")
-                
-                # Create table with structured columns
-                conn.execute("""
-                CREATE TABLE IF NOT EXISTS knowledge_entries (
-                    id TEXT PRIMARY KEY,
-                    intent TEXT,
-                    problem_context TEXT,
-                    root_cause TEXT,
-                    solution_steps TEXT,
-                    evidence TEXT,
-                    tags TEXT,
-                    contributor TEXT,
-                    created_at TIMESTAMP,
-                    updated_at TIMESTAMP
-                );
-                """)
-                logger.info(f"Database initialized at {self.db_path}")
-        except Exception as e:
-            logger.error(f"Failed to initialize database: {e}")
-            raise
+    def _connect(self) -> sqlite3.Connection:
+        """Opens a new connection and applies the per-connection pragmas."""
+        # check_same_thread=False: pooled connections move between threads,
+        # but each is only ever used by one thread at a time.
+        conn = sqlite3.connect(self.db_path, timeout=self.BUSY_TIMEOUT_MS / 1000, check_same_thread=False)
+        conn.row_factory = sqlite3.Row  # Access columns by name
+        # Write-Ahead Logging for better concurrency; NORMAL sync is safe under WAL
+        conn.execute("PRAGMA journal_mode=WAL;")
+        conn.execute("PRAGMA synchronous=NORMAL;")
+        conn.execute(f"PRAGMA busy_timeout={self.BUSY_TIMEOUT_MS};")
+        conn.execute(f"PRAGMA mmap_size={self.MMAP_SIZE};")
+        conn.execute(f"PRAGMA cache_size=-{self.CACHE_SIZE_KB};")
+        return conn
+
+    def _new_slot(self) -> _PooledConnection:
+        slot = _PooledConnection(self._connect(), self._generation)
+        with self._lock:
+            self._slots.append(slot)
+        return slot
+
+    def _is_stale(self, slot: _PooledConnection) -> bool:
+        return slot.closed or slot.generation != self._generation
+
+    def _release(self, slot: _PooledConnection):
+        with self._lock:
+            slot.in_use = False
+            slot.last_used = time.monotonic()
+            if slot.generation != self._generation:
+                slot.close()
+                if slot in self._slots:
+                    self._slots.remove(slot)
+        self._reap_idle()
+        self._schedule_reap()
+
+    def _schedule_reap(self):
+        """Arms the reap timer for when the oldest idle connection times out, unless it is armed already."""
+        with self._lock:
+            idle_since = [slot.last_used for slot in self._slots if not slot.in_use]
+            if self._reap_timer is not None or not idle_since:
+                return
+            delay = max(0.0, min(idle_since) + self.idle_timeout - time.monotonic())
+            self._reap_timer = threading.Timer(delay, self._reap_on_timer)
+            self._reap_timer.daemon = True
+            self._reap_timer.start()
+
+    def _reap_on_timer(self):
+        with self._lock:
+            self._reap_timer = None
+        self._reap_idle(force=True)
+        self._schedule_reap()
+
+    def _reap_idle(self, force: bool = False):
+        """Closes connections idle for longer than `idle_timeout` (checked at most every few seconds unless `force`)."""
+        now = time.monotonic()
+        if not force and now - self._last_reap < min(self.idle_timeout, 5.0):
+            return
+        with self._lock:
+            self._last_reap = now
+            for slot in list(self._slots):
+                if not slot.in_use and now - slot.last_used >= self.idle_timeout:
+                    slot.close()
+                    self._slots.remove(slot)
+                    if slot in self._pool:
+                        self._pool.remove(slot)
+
+    def reset(self):
+        """
+        Drops all connections, stops the writer (after its queued jobs) and re-checks
+        the schema on next use (e.g. after the DB file was replaced).
+        """
+        self._schema_ready = False
+        with self._lock:
+            writer, self._writer = self._writer, None
+        if writer is not None:
+            writer.close()
+        self.close_all()
+
+    def close_all(self):
+        """Closes every idle connection; connections in use are closed when released."""
+        with self._lock:
+            self._generation += 1
+            for slot in list(self._slots):
+                if not slot.in_use:
+                    slot.close()
+                    self._slots.remove(slot)
+            self._pool.clear()
 
     @contextmanager
     def get_connection(self):
-        """Yields a SQLite connection context manager."""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row  # Access columns by name
+        """Yields this thread's reusable SQLite connection, committing when the outermost block exits."""
+        slot = getattr(self._local, "slot", None)
+        with self._lock:
+            reuse = slot is not None and (slot.depth > 0 or not self._is_stale(slot))
+            if reuse:
+                slot.in_use = True
+        if not reuse:
+            slot = self._new_slot()
+            slot.in_use = True
+            self._local.slot = slot
+
+        slot.depth += 1
         try:
-            yield conn
-            conn.commit()
+            yield slot.conn
+            if slot.depth == 1:
+                slot.conn.commit()
         except Exception:
-            conn.rollback()
+            if slot.depth == 1:
+                slot.conn.rollback()
             raise
         finally:
-            conn.close()
+            slot.depth -= 1
+            if slot.depth == 0:
+                self._release(slot)
+
+    @contextmanager
+    def pooled_connection(self):
+        """Borrows a connection from the bounded pool, blocking while all of them are busy."""
+        self._pool_sem.acquire()
+        try:
+            slot = None
+            with self._lock:
+                while self._pool and slot is None:
+                    candidate = self._pool.pop()
+                    if not self._is_stale(candidate):
+                        slot = candidate
+                if slot is not None:
+                    slot.in_use = True
+            if slot is None:
+                slot = self._new_slot()
+                slot.in_use = True
+
+            try:
+                yield slot.conn
+                slot.conn.commit()
+            except Exception:
+                slot.conn.rollback()
+                raise
+            finally:
+                self._release(slot)
+                with self._lock:
+                    if not slot.closed:
+                        self._pool.append(slot)
+        finally:
+            self._pool_sem.release()
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        # One worker per pooled connection, kept apart from the loop's default executor
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self._pool_size, thread_name_prefix="kb-db")
+            return self._executor
+
+    def _run_pooled(self, fn, *args):
+        self.init_db()
+        with self.pooled_connection() as conn:
+            return fn(conn, *args)
+
+    async def run(self, fn, *args):
+        """
+        Runs `fn(conn, *args)` in one transaction on a DB worker thread and returns its result.
+        Use this from async code (tools, routes) instead of `get_connection()`.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._get_executor(), functools.partial(self._run_pooled, fn, *args))
+
+    @property
+    def writer(self) -> DBWriter:
+        with self._lock:
+            if self._writer is None:
+                self._writer = DBWriter(self)
+            return self._writer
+
+    async def write(self, fn, *args):
+        """Queues `fn(conn, *args)` to the single writer and returns its result once committed."""
+        return await asyncio.wrap_future(self.writer.submit(fn, *args))
+
+    def init_db(self):
+        """
+        Brings the schema up to date with the versioned migrations.
+        Runs at most once per process for a given DB path, so hot paths can call it freely.
+        """
+        if self._schema_ready:
+            return
+        with self._init_lock:
+            if self._schema_ready:
+                return
+            try:
+                # Dedicated connection: migrations manage their own transaction
+                conn = self._connect()
+                try:
+                    version = apply_migrations(conn)
+                    # A bulk import killed before it finished left triggers suspended
+                    with conn:
+                        if resume_bulk_load_triggers(conn):
+                            logger.warning("⚠️ Restored the search/facet triggers of an interrupted bulk import.")
+                finally:
+                    conn.close()
+                self._schema_ready = True
+                logger.info(f"Database initialized at {self.db_path} (schema v{version})")
+            except Exception as e:
+                logger.error(f"Failed to initialize database: {e}")
+                raise
 
 # Singleton-ish usage for convenience, assuming standard config usually
 default_db_manager = DBManager()
+
+_kb_db_managers: dict[str, DBManager] = {}
+
+def get_db_manager(kb: str = None) -> DBManager:
+    """Returns the DBManager of a named knowledge base (the default KB uses `default_db_manager`)."""
+    kb = RagConfig.normalize_kb_name(kb)
+    if kb == RagConfig.DEFAULT_KB:
+        return default_db_manager
+    if kb not in _kb_db_managers:
+        _kb_db_managers[kb] = DBManager(RagConfig.kb_db_path(kb))
+    return _kb_db_managers[kb]
@@ -0,0 +1,157 @@
+"""
+Single writer for a knowledge-base SQLite file.
+
+Every write job is queued to one thread that owns the only write connection.
+Jobs queued close together are grouped into one transaction (one fsync, one
+lock acquisition); each job runs inside its own SAVEPOINT so a failing job is
+rolled back alone. Callers are acknowledged only after the batch has committed.
+If that rollback fails too, every job of the batch is failed and the writer
+carries on with a new connection.
+"""
+import os
+import queue
+import sqlite3
+import logging
+import threading
+from concurrent.futures import Future
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class DBWriter:
+    MAX_BATCH = int(os.getenv("KB_WRITE_MAX_BATCH", "64"))
+    # How long the writer waits for more jobs before committing a partial batch
+    BATCH_WAIT_MS = float(os.getenv("KB_WRITE_BATCH_WAIT_MS", "2"))
+
+    def __init__(self, db_manager, max_batch: int = None, batch_wait_ms: float = None):
+        self._db = db_manager
+        self.max_batch = max_batch or self.MAX_BATCH
+        self.batch_wait = (self.BATCH_WAIT_MS if batch_wait_ms is None else batch_wait_ms) / 1000
+        self._queue: "queue.Queue" = queue.Queue()
+        self._conn: sqlite3.Connection = None
+        self._conn_generation: int = None
+        self._thread = threading.Thread(target=self._loop, name="kb-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, fn, *args) -> Future:
+        """Queues `fn(conn, *args)`; the future resolves with its result once the batch is committed."""
+        future = Future()
+        self._queue.put((fn, args, future))
+        return future
+
+    def close(self):
+        """Finishes the queued jobs and stops the writer thread."""
+        self._queue.put(_STOP)
+        self._thread.join()
+
+    def _connection(self) -> sqlite3.Connection:
+        # Reconnect after the manager dropped its connections (close_all / new db_path)
+        if self._conn is None or self._conn_generation != self._db.generation:
+            if self._conn is not None:
+                self._conn.close()
+            self._db.init_db()
+            self._conn_generation = self._db.generation
+            self._conn = self._db.new_connection()
+            # Transactions are managed explicitly below
+            self._conn.isolation_level = None
+        return self._conn
+
+    def _next_batch(self, first) -> tuple[list, bool]:
+        batch, stop = [first], False
+        while len(batch) < self.max_batch:
+            try:
+                job = self._queue.get(timeout=self.batch_wait) if self.batch_wait > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if job is _STOP:
+                stop = True
+                break
+            batch.append(job)
+        return batch, stop
+
+    def _loop(self):
+        while True:
+            first = self._queue.get()
+            if first is _STOP:
+                break
+            batch, stop = self._next_batch(first)
+            try:
+                self._run_batch(batch)
+            except Exception as e:
+                # Never let one batch kill the only writer: fail it and start over on a new connection
+                logger.exception(f"❌ Write batch of {len(batch)} job(s) failed: {e}")
+                self._discard_connection()
+                self._fail(batch, e)
+            if stop:
+                break
+        self._discard_connection()
+
+    def _discard_connection(self):
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            except Exception:
+                pass
+        self._conn = None
+
+    @staticmethod
+    def _fail(batch: list, error: Exception):
+        """Fails every job of the batch that has not been acknowledged yet."""
+        for _, _, future in batch:
+            if not future.done():
+                future.set_exception(error)
+
+    def _run_batch(self, batch: list):
+        try:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+        except Exception as e:
+            self._discard_connection()
+            self._fail(batch, e)
+            return
+
+        results = []
+        for fn, args, future in batch:
+            if not future.set_running_or_notify_cancel():
+                continue
+            conn.execute("SAVEPOINT job")
+            try:
+                result = fn(conn, *args)
+                conn.execute("RELEASE SAVEPOINT job")
+                results.append((future, result, None))
+            except Exception as e:
+                try:
+                    conn.execute("ROLLBACK TO SAVEPOINT job")
+                    conn.execute("RELEASE SAVEPOINT job")
+                except Exception as rollback_error:
+                    # The transaction state is unknown: nothing of this batch may be committed
+                    logger.error(f"❌ Could not roll back a failed write job ({rollback_error}); dropping the batch.")
+                    try:
+                        conn.execute("ROLLBACK")
+                    except Exception:
+                        pass
+                    self._discard_connection()
+                    future.set_exception(e)
+                    self._fail(batch, rollback_error)
+                    return
+                results.append((future, None, e))
+
+        try:
+            conn.execute("COMMIT")
+        except Exception as e:
+            logger.error(f"Write batch of {len(batch)} job(s) failed to commit: {e}")
+            try:
+                conn.execute("ROLLBACK")
+            except Exception:
+                pass
+            self._fail(batch, e)
+            return
+
+        # Acknowledge only now that the batch is durable in the WAL
+        for future, result, error in results:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
@@ -0,0 +1,218 @@
+"""
+Bulk JSONL import/export of knowledge entries (used by `context-pilot kb import/export`).
+
+One JSON object per line, with the columns of `knowledge_entries`. Imports are
+written with `executemany` in large transactions, queued to the single writer
+(db_writer.py); each committed batch reports the input line to resume from, so
+an interrupted import can continue with `offset`.
+"""
+import sys
+import json
+import time
+import uuid
+import logging
+from contextlib import contextmanager
+from datetime import datetime
+from itertools import islice
+
+try:
+    from context_pilot.utils import minhash
+    from context_pilot.utils.knowledge_store import (
+        ENTRY_FIELDS, count_entries, entry_text, minhash_bands_complete, parse_tags,
+        rebuild_minhash_bands, replace_minhash_bands, resume_bulk_load_triggers,
+        suspend_bulk_load_triggers
+    )
+except ImportError:
+    import os
+    sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
+    from context_pilot.utils import minhash
+    from context_pilot.utils.knowledge_store import (
+        ENTRY_FIELDS, count_entries, entry_text, minhash_bands_complete, parse_tags,
+        rebuild_minhash_bands, replace_minhash_bands, resume_bulk_load_triggers,
+        suspend_bulk_load_triggers
+    )
+
+logger = logging.getLogger(__name__)
+
+EXPORT_FIELDS = ("id",) + ENTRY_FIELDS + ("created_at", "updated_at")
+
+DEFAULT_BATCH_SIZE = 5000
+
+# The fingerprint is derived from the content, so it is recomputed rather than exported
+_IMPORT_FIELDS = EXPORT_FIELDS + ("fingerprint",)
+
+_UPDATED_FIELDS = tuple(name for name in _IMPORT_FIELDS if name not in ("id", "created_at"))
+
+# Unchanged entries are left alone: no change-log row, no trigger work
+_UPSERT_SQL = f"""
+    INSERT INTO knowledge_entries ({", ".join(_IMPORT_FIELDS)})
+    VALUES ({", ".join("?" for _ in _IMPORT_FIELDS)})
+    ON CONFLICT(id) DO UPDATE SET
+    {", ".join(f"{name}=excluded.{name}" for name in _UPDATED_FIELDS)}
+    WHERE ({", ".join(_UPDATED_FIELDS)}) IS NOT ({", ".join(f"excluded.{name}" for name in _UPDATED_FIELDS)})
+"""
+
+
+@contextmanager
+def open_stream(path: str, mode: str):
+    """Opens `path` as text, with "-" meaning stdin/stdout."""
+    if path == "-":
+        yield sys.stdin if "r" in mode else sys.stdout
+    else:
+        with open(path, mode, encoding="utf-8") as f:
+            yield f
+
+
+def _entry_row(record: dict, now: str, signature) -> tuple:
+    record["id"] = record.get("id") or str(uuid.uuid4())
+    record["created_at"] = record.get("created_at") or now
+    record["updated_at"] = record.get("updated_at") or record["created_at"]
+    record["fingerprint"] = minhash.to_bytes(signature)
+    return tuple(record.get(name) for name in _IMPORT_FIELDS)
+
+
+def _entry_rows(records: list[dict], texts: list[str], now: str) -> list[tuple]:
+    # One vectorized MinHash pass per batch
+    return [_entry_row(record, now, signature) for record, signature in zip(records, minhash.signatures(texts))]
+
+
+def _existing_entries(conn, entry_ids: list[str]) -> dict[str, tuple]:
+    """(fingerprint, tags, created_at) of the entries among `entry_ids` that are already stored."""
+    existing = {}
+    # Stay well below SQLite's bound-parameter limit
+    for start in range(0, len(entry_ids), 500):
+        chunk = entry_ids[start:start + 500]
+        for entry_id, *values in conn.execute(
+            f"SELECT id, fingerprint, tags, created_at FROM knowledge_entries "
+            f"WHERE id IN ({', '.join('?' for _ in chunk)})", chunk
+        ):
+            existing[entry_id] = tuple(values)
+    return existing
+
+
+def _write_batch(conn, rows: list[tuple], bands: bool = True):
+    # The last line wins when an id repeats within the batch
+    rows = list({row[0]: row for row in rows}.values())
+    fingerprint_index = _IMPORT_FIELDS.index("fingerprint")
+    tags_index = _IMPORT_FIELDS.index("tags")
+    created_index = _IMPORT_FIELDS.index("created_at")
+    existing = _existing_entries(conn, [row[0] for row in rows])
+    conn.executemany(_UPSERT_SQL, rows)
+    if bands:
+        replace_minhash_bands(
+            conn, {entry_id: old[0] for entry_id, old in existing.items()},
+            {row[0]: row[fingerprint_index] for row in rows}
+        )
+    # Re-derive the normalized tags of new entries and of entries whose tags changed
+    retagged = [row for row in rows if row[0] not in existing or existing[row[0]][1] != row[tags_index]]
+    conn.executemany(
+        "DELETE FROM entry_tags WHERE entry_id = ?", [(row[0],) for row in retagged if row[0] in existing]
+    )
+    # The upsert keeps the created_at of existing entries
+    conn.executemany(
+        "INSERT OR IGNORE INTO entry_tags (entry_id, tag, created_at) VALUES (?, ?, ?)",
+        [
+            (row[0], tag, existing[row[0]][2] if row[0] in existing else row[created_index])
+            for row in retagged for tag in parse_tags(row[tags_index])
+        ]
+    )
+
+
+def _finish_bulk_load(conn):
+    rebuild_minhash_bands(conn)
+    resume_bulk_load_triggers(conn)
+
+
+def import_jsonl(db_manager, path: str, offset: int = 0, batch_size: int = DEFAULT_BATCH_SIZE,
+                 progress=None) -> dict:
+    """
+    Upserts the entries of a JSONL file (or "-" for stdin), skipping the first `offset` lines.
+
+    `progress(stats)` is called after every committed batch; `stats["next_offset"]`
+    is the line number to resume from.
+
+    Loading into an empty KB (or resuming such a load) is a bulk load: the per-batch
+    LSH band writes and the full-text/facet triggers are skipped, and that data is
+    derived in one pass at the end instead. A failed load restores the triggers right
+    away (one killed outright: the next `init_db`) and leaves the bands to its resumption.
+    """
+    db_manager.init_db()
+    now = datetime.now().isoformat()
+    stats = {"rows": 0, "skipped": 0, "next_offset": offset, "seconds": 0.0, "rows_per_sec": 0.0}
+    start = time.perf_counter()
+    with db_manager.get_connection() as conn:
+        bulk = count_entries(conn) == 0 or not minhash_bands_complete(conn)
+    if bulk:
+        db_manager.writer.submit(suspend_bulk_load_triggers).result()
+
+    try:
+        with open_stream(path, "r") as f:
+            lines = islice(f, offset, None)
+            while True:
+                chunk = list(islice(lines, batch_size))
+                if not chunk:
+                    break
+                records, texts = [], []
+                for line_no, line in enumerate(chunk, start=stats["next_offset"] + 1):
+                    line = line.strip()
+                    if not line:
+                        stats["skipped"] += 1
+                        continue
+                    try:
+                        record = dict(json.loads(line))
+                        texts.append(entry_text(record))
+                        records.append(record)
+                    except (ValueError, TypeError, AttributeError) as e:
+                        stats["skipped"] += 1
+                        logger.warning(f"Skipping malformed line {line_no}: {e}")
+                rows = _entry_rows(records, texts, now)
+
+                # Through the single writer, like every other write, so batches queue behind
+                # (and are not failed by) concurrent saves instead of racing for the write lock
+                db_manager.writer.submit(_write_batch, rows, not bulk).result()
+
+                stats["rows"] += len(rows)
+                stats["next_offset"] += len(chunk)
+                stats["seconds"] = time.perf_counter() - start
+                stats["rows_per_sec"] = stats["rows"] / stats["seconds"] if stats["seconds"] else 0.0
+                if progress:
+                    progress(stats)
+    except BaseException:
+        # The band rows are left for the resumed load to derive (see `bulk` above)
+        if bulk:
+            db_manager.writer.submit(resume_bulk_load_triggers).result()
+        raise
+    if bulk:
+        db_manager.writer.submit(_finish_bulk_load).result()
+    stats["seconds"] = time.perf_counter() - start
+    stats["rows_per_sec"] = stats["rows"] / stats["seconds"] if stats["seconds"] else 0.0
+    return stats
+
+
+def export_jsonl(db_manager, path: str, offset: int = 0, batch_size: int = DEFAULT_BATCH_SIZE,
+                 progress=None) -> dict:
+    """
+    Streams `knowledge_entries` to a JSONL file (or "-" for stdout) in insertion order,
+    skipping the first `offset` rows. With an offset the file is appended to.
+    """
+    db_manager.init_db()
+    stats = {"rows": 0, "next_offset": offset, "seconds": 0.0, "rows_per_sec": 0.0}
+    start = time.perf_counter()
+
+    with open_stream(path, "a" if offset else "w") as f, db_manager.get_connection() as conn:
+        cursor = conn.execute(
+            f"SELECT {', '.join(EXPORT_FIELDS)} FROM knowledge_entries ORDER BY rowid LIMIT -1 OFFSET ?",
+            (offset,)
+        )
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            f.writelines(json.dumps(dict(row), ensure_ascii=False) + "\n" for row in rows)
+            stats["rows"] += len(rows)
+            stats["next_offset"] += len(rows)
+            stats["seconds"] = time.perf_counter() - start
+            stats["rows_per_sec"] = stats["rows"] / stats["seconds"] if stats["seconds"] else 0.0
+            if progress:
+                progress(stats)
+    return stats
@@ -0,0 +1,373 @@
+"""
+Read/write helpers for `knowledge_entries` and its side tables.
+
+All writers (the save_experience tool, importers, ...) go through `save_entry` so
+derived tables such as `entry_tags` stay in sync with the entries.
+"""
+import uuid
+import sqlite3
+from datetime import datetime
+from typing import Optional
+
+import numpy as np
+
+from context_pilot.utils import minhash
+
+ENTRY_FIELDS = (
+    "intent", "problem_context", "root_cause", "solution_steps", "evidence", "tags", "contributor"
+)
+
+# Fields that make up the content of an entry (the sections of its markdown)
+CONTENT_FIELDS = ("intent", "problem_context", "root_cause", "solution_steps", "evidence")
+
+# Columns of the `entries_fts` full-text index (migration 5)
+SEARCH_FIELDS = ("intent", "root_cause", "solution_steps", "tags")
+
+# The trigram tokenizer cannot match terms shorter than this
+MIN_SEARCH_TERM = 3
+
+# Snippet highlight markers; control characters cannot clash with entry text and are
+# replaced after HTML-escaping (see api_routes)
+HIGHLIGHT_START, HIGHLIGHT_END = "\x02", "\x03"
+
+
+def reconstruct_markdown(row) -> str:
+    """Reconstructs the markdown content from DB columns."""
+    return f"""# Intent
+{row['intent']}
+
+# 1. Problem Context
+{row['problem_context']}
+
+# 2. Root Cause Analysis
+{row['root_cause']}
+
+# 3. Solution / SOP
+{row['solution_steps']}
+
+# 4. Evidence
+{row['evidence']}
+"""
+
+
+def entry_text(fields) -> str:
+    """
+    The text an entry's MinHash is computed from: its markdown sections without the fixed
+    headings (shared by every entry, they would only make unrelated short entries look alike).
+    """
+    fields = dict(fields)
+    return "\n".join(fields.get(name) or "" for name in CONTENT_FIELDS)
+
+
+def entry_signature(fields) -> np.ndarray:
+    """MinHash of one entry (batch writers call `minhash.signatures` on `entry_text`s)."""
+    return minhash.signature(entry_text(fields))
+
+
+def read_fingerprints(conn: sqlite3.Connection, entry_ids: list[str]) -> dict[str, bytes]:
+    """Stored fingerprints of the existing entries among `entry_ids`."""
+    fingerprints = {}
+    # Stay well below SQLite's bound-parameter limit
+    for start in range(0, len(entry_ids), 500):
+        chunk = entry_ids[start:start + 500]
+        fingerprints.update(conn.execute(
+            f"SELECT id, fingerprint FROM knowledge_entries WHERE id IN ({', '.join('?' for _ in chunk)})", chunk
+        ).fetchall())
+    return fingerprints
+
+
+def _band_rows(entry_id: str, fingerprint: bytes) -> list[tuple]:
+    return [
+        (band, fingerprint[band * minhash.BAND_BYTES:(band + 1) * minhash.BAND_BYTES], entry_id)
+        for band in range(minhash.BANDS)
+    ]
+
+
+def replace_minhash_bands(conn: sqlite3.Connection, old: dict[str, bytes], new: dict[str, bytes]):
+    """
+    Moves the LSH band rows of written entries from their `old` fingerprints (as read
+    before the write) to their `new` ones. Writers call this instead of row-level
+    triggers so bulk imports insert all band rows of a batch at once, in key order.
+    Deleted entries lose their band rows through a trigger (migration 4).
+    """
+    stale = [row for entry_id, fp in old.items() if fp and new.get(entry_id) != fp for row in _band_rows(entry_id, fp)]
+    fresh = sorted(row for entry_id, fp in new.items() if fp and old.get(entry_id) != fp for row in _band_rows(entry_id, fp))
+    conn.executemany("DELETE FROM entry_minhash_bands WHERE band = ? AND bucket = ? AND entry_id = ?", stale)
+    conn.executemany("INSERT OR IGNORE INTO entry_minhash_bands (band, bucket, entry_id) VALUES (?, ?, ?)", fresh)
+
+
+def parse_tags(tags: str) -> list[str]:
+    """Splits a comma-separated tag string into unique, lower-cased tags (order kept)."""
+    seen = []
+    for tag in (tags or "").split(","):
+        tag = tag.strip().lower()
+        if tag and tag not in seen:
+            seen.append(tag)
+    return seen
+
+
+def sync_entry_tags(conn: sqlite3.Connection, entry_id: str, tags: str):
+    """Replaces the normalized `entry_tags` rows of one entry (which must already be saved)."""
+    conn.execute("DELETE FROM entry_tags WHERE entry_id = ?", (entry_id,))
+    conn.executemany(
+        "INSERT OR IGNORE INTO entry_tags (entry_id, tag, created_at) "
+        "SELECT id, ?, created_at FROM knowledge_entries WHERE id = ?",
+        [(tag, entry_id) for tag in parse_tags(tags)]
+    )
+
+
+def find_near_duplicate(conn: sqlite3.Connection, signature, threshold: float,
+                        exclude_id: str = None, max_candidates: int = 32) -> Optional[tuple[str, float]]:
+    """
+    Returns (entry_id, similarity) of the most similar entry at or above `threshold`, or None.
+    Only entries sharing an LSH band are compared (those sharing the most bands first),
+    so this is a handful of primary-key lookups.
+    """
+    buckets = minhash.band_buckets(signature)
+    candidates = conn.execute(f"""
+        SELECT e.id, e.fingerprint
+        FROM (
+            SELECT entry_id, COUNT(*) AS shared
+            FROM entry_minhash_bands
+            WHERE {" OR ".join("(band = ? AND bucket = ?)" for _ in buckets)}
+            GROUP BY entry_id
+            ORDER BY shared DESC
+            LIMIT ?
+        ) b
+        JOIN knowledge_entries e ON e.id = b.entry_id
+    """, [value for band, bucket in enumerate(buckets) for value in (band, bucket)] + [max_candidates]).fetchall()
+
+    best = None
+    for candidate_id, blob in candidates:
+        if candidate_id == exclude_id or blob is None:
+            continue
+        score = minhash.similarity(signature, minhash.from_bytes(blob))
+        if score >= threshold and (best is None or score > best[1]):
+            best = (candidate_id, score)
+    return best
+
+
+def rebuild_minhash_bands(conn: sqlite3.Connection):
+    """Re-derives every LSH band row from the stored fingerprints, in key order (bulk loads)."""
+    conn.execute("DELETE FROM entry_minhash_bands")
+    conn.execute(f"""
+        INSERT INTO entry_minhash_bands (band, bucket, entry_id)
+        SELECT n.column1, substr(e.fingerprint, n.column1 * {minhash.BAND_BYTES} + 1, {minhash.BAND_BYTES}), e.id
+        FROM knowledge_entries e, (VALUES {", ".join(f"({band})" for band in range(minhash.BANDS))}) AS n
+        WHERE e.fingerprint IS NOT NULL
+        ORDER BY 1, 2, 3
+    """)
+
+
+# Triggers maintaining the full-text index and the facet counts. Bulk imports suspend
+# them and re-derive that data in one pass when done (kb_transfer.import_jsonl).
+BULK_LOAD_TRIGGERS = (
+    "knowledge_entries_insert_fts", "knowledge_entries_update_fts", "knowledge_entries_delete_fts",
+    "entry_tags_insert_facets", "entry_tags_delete_facets",
+    "knowledge_entries_insert_contributor", "knowledge_entries_update_contributor",
+    "knowledge_entries_delete_contributor",
+)
+
+
+def suspend_bulk_load_triggers(conn: sqlite3.Connection):
+    """
+    Drops BULK_LOAD_TRIGGERS. Their definitions are kept in `kb_suspended_triggers`
+    (migration 9) until `resume_bulk_load_triggers`, so an interrupted load cannot lose them.
+    """
+    conn.execute(f"""
+        INSERT OR IGNORE INTO kb_suspended_triggers (name, sql)
+        SELECT name, sql FROM sqlite_master
+        WHERE type = 'trigger' AND name IN ({", ".join("?" for _ in BULK_LOAD_TRIGGERS)})
+    """, BULK_LOAD_TRIGGERS)
+    for name in BULK_LOAD_TRIGGERS:
+        conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+
+
+def resume_bulk_load_triggers(conn: sqlite3.Connection) -> bool:
+    """
+    Re-derives the full-text index and the facet counts, then recreates the suspended
+    triggers. Returns False (and does nothing) if no triggers were suspended.
+    """
+    suspended = conn.execute("SELECT name, sql FROM kb_suspended_triggers").fetchall()
+    if not suspended:
+        return False
+    conn.execute("INSERT INTO entries_fts (entries_fts) VALUES ('rebuild')")
+    conn.execute("DELETE FROM tag_facets")
+    conn.execute("INSERT INTO tag_facets (tag, entry_count) SELECT tag, COUNT(*) FROM entry_tags GROUP BY tag")
+    conn.execute("DELETE FROM contributor_facets")
+    conn.execute("""
+        INSERT INTO contributor_facets (contributor, entry_count)
+        SELECT IFNULL(contributor, ''), COUNT(*) FROM knowledge_entries GROUP BY IFNULL(contributor, '')
+    """)
+    existing = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'")}
+    for name, sql in suspended:
+        if name not in existing:
+            conn.execute(sql)
+    conn.execute("DELETE FROM kb_suspended_triggers")
+    return True
+
+
+def minhash_bands_complete(conn: sqlite3.Connection) -> bool:
+    """False if some fingerprinted entries lack band rows (e.g. an interrupted bulk import)."""
+    bands = conn.execute("SELECT COUNT(*) FROM entry_minhash_bands").fetchone()[0]
+    entries = conn.execute("SELECT COUNT(*) FROM knowledge_entries WHERE fingerprint IS NOT NULL").fetchone()[0]
+    return bands == entries * minhash.BANDS
+
+
+def save_entry(conn: sqlite3.Connection, fields: dict, entry_id: str = "", now: str = None,
+               duplicate_threshold: float = None) -> tuple[str, str]:
+    """
+    Inserts a new entry, or updates `entry_id` if it exists.
+
+    With `duplicate_threshold`, a new entry that is a near-duplicate (MinHash similarity
+    at or above the threshold) of an existing one is not written: the existing entry is
+    returned for the caller to confirm (update it via `entry_id`, or save without a threshold).
+
+    Returns:
+        (entry_id, action) where action is "created", "updated", or "duplicate" (nothing
+        written, entry_id is the existing near-duplicate).
+    """
+    now = now or datetime.now().isoformat()
+    values = [fields.get(name) for name in ENTRY_FIELDS]
+    signature = entry_signature(fields)
+
+    is_update = False
+    if entry_id:
+        existing = conn.execute(
+            "SELECT id FROM knowledge_entries WHERE id = ?",
+            (entry_id,)
+        ).fetchone()
+        is_update = existing is not None
+
+    action = "updated"
+    if not is_update and duplicate_threshold is not None:
+        duplicate = find_near_duplicate(conn, signature, duplicate_threshold)
+        if duplicate:
+            return duplicate[0], "duplicate"
+
+    fingerprint = minhash.to_bytes(signature)
+    old = read_fingerprints(conn, [entry_id]) if is_update else {}
+    if is_update:
+        conn.execute("""
+            UPDATE knowledge_entries 
+            SET intent=?, problem_context=?, root_cause=?, solution_steps=?, 
+                evidence=?, tags=?, contributor=?, fingerprint=?, updated_at=?
+            WHERE id=?
+        """, (*values, fingerprint, now, entry_id))
+    else:
+        entry_id = str(uuid.uuid4())
+        conn.execute("""
+            INSERT INTO knowledge_entries 
+            (id, intent, problem_context, root_cause, solution_steps, evidence, tags, contributor, fingerprint, created_at, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, (entry_id, *values, fingerprint, now, now))
+        action = "created"
+
+    replace_minhash_bands(conn, old, {entry_id: fingerprint})
+    sync_entry_tags(conn, entry_id, fields.get("tags"))
+    return entry_id, action
+
+
+def list_entries(conn: sqlite3.Connection, limit: int = 50, tag: str = None, before: tuple = None) -> list[sqlite3.Row]:
+    """
+    Newest entries first, optionally restricted to one tag (both index-backed).
+    `before` is a (created_at, id) keyset cursor: only entries ordered after it are returned.
+    """
+    # With a tag, filter and order on entry_tags' own copy of created_at, so the
+    # (tag, created_at, entry_id) index is walked in order and stops after `limit` rows
+    if tag:
+        source = "entry_tags t JOIN knowledge_entries e ON e.id = t.entry_id"
+        order = ("t.created_at", "t.entry_id")
+        where, params = ["t.tag = ?"], [tag.strip().lower()]
+    else:
+        source = "knowledge_entries e"
+        order = ("e.created_at", "e.id")
+        where, params = [], []
+    if before:
+        where.append(f"({order[0]}, {order[1]}) < (?, ?)")
+        params.extend(before)
+    return conn.execute(f"""
+        SELECT e.id, e.intent, e.root_cause, e.tags, e.created_at
+        FROM {source}
+        {"WHERE " + " AND ".join(where) if where else ""}
+        ORDER BY {order[0]} DESC, {order[1]} DESC
+        LIMIT ?
+    """, (*params, limit)).fetchall()
+
+
+def search_entries(conn: sqlite3.Connection, query: str, limit: int = 20, offset: int = 0) -> list[sqlite3.Row]:
+    """
+    Full-text search over SEARCH_FIELDS, best matches first (bm25). Every term must match
+    (as a substring). Terms shorter than MIN_SEARCH_TERM cannot use the index: they are
+    checked with LIKE on the rows the other terms matched, or, if there are no other
+    terms, on the newest entries first.
+    Rows have the entry columns plus `snippet`, with matches wrapped in HIGHLIGHT_START/END.
+    """
+    terms = query.split()
+    if not terms:
+        return []
+    long_terms = [t for t in terms if len(t) >= MIN_SEARCH_TERM]
+    short_terms = [t for t in terms if len(t) < MIN_SEARCH_TERM]
+
+    like_sql, like_params = [], []
+    for term in short_terms:
+        pattern = "%" + term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+        like_sql.append("(" + " OR ".join(f"e.{field} LIKE ? ESCAPE '\\'" for field in SEARCH_FIELDS) + ")")
+        like_params.extend([pattern] * len(SEARCH_FIELDS))
+
+    if long_terms:
+        # Each term is quoted as a phrase so FTS5 query syntax in the input is inert
+        match = " ".join('"' + t.replace('"', '""') + '"' for t in long_terms)
+        return conn.execute(f"""
+            SELECT e.id, e.intent, e.root_cause, e.tags, e.created_at, f.rank AS score,
+                   snippet(entries_fts, -1, '{HIGHLIGHT_START}', '{HIGHLIGHT_END}', '…', 64) AS snippet
+            FROM entries_fts f
+            JOIN knowledge_entries e ON e.rowid = f.rowid
+            WHERE entries_fts MATCH ? {"".join(" AND " + sql for sql in like_sql)}
+            ORDER BY f.rank
+            LIMIT ? OFFSET ?
+        """, (match, *like_params, limit, offset)).fetchall()
+
+    return conn.execute(f"""
+        SELECT e.id, e.intent, e.root_cause, e.tags, e.created_at, NULL AS score, e.intent AS snippet
+        FROM knowledge_entries e
+        WHERE {" AND ".join(like_sql)}
+        ORDER BY e.created_at DESC, e.id DESC
+        LIMIT ? OFFSET ?
+    """, (*like_params, limit, offset)).fetchall()
+
+
+def related_entries(conn: sqlite3.Connection, entry_id: str, limit: int = 5) -> list[sqlite3.Row]:
+    """Precomputed neighbours of `entry_id` (see build_index.update_neighbor_table), best first."""
+    return conn.execute("""
+        SELECT n.neighbor_id, n.score, e.intent, e.root_cause, e.tags
+        FROM knowledge_neighbors n
+        JOIN knowledge_entries e ON e.id = n.neighbor_id
+        WHERE n.entry_id = ?
+        ORDER BY n.rank
+        LIMIT ?
+    """, (entry_id, limit)).fetchall()
+
+
+def get_entry(conn: sqlite3.Connection, entry_id: str) -> Optional[sqlite3.Row]:
+    return conn.execute("SELECT * FROM knowledge_entries WHERE id = ?", (entry_id,)).fetchone()
+
+
+def tag_facets(conn: sqlite3.Connection, limit: int = None) -> list[sqlite3.Row]:
+    """(tag, entry_count) rows, most used first; read from the materialized `tag_facets`."""
+    return conn.execute(
+        "SELECT tag, entry_count FROM tag_facets ORDER BY entry_count DESC, tag LIMIT ?",
+        (-1 if limit is None else limit,)
+    ).fetchall()
+
+
+def contributor_facets(conn: sqlite3.Connection, limit: int = None) -> list[sqlite3.Row]:
+    """(contributor, entry_count) rows, most active first ('' collects entries without a contributor)."""
+    return conn.execute(
+        "SELECT contributor, entry_count FROM contributor_facets ORDER BY entry_count DESC, contributor LIMIT ?",
+        (-1 if limit is None else limit,)
+    ).fetchall()
+
+
+def count_entries(conn: sqlite3.Connection) -> int:
+    return conn.execute("SELECT COUNT(*) FROM knowledge_entries").fetchone()[0]
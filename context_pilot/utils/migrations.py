@@ -0,0 +1,382 @@
+"""
+Forward-only schema migrations for the knowledge base SQLite file.
+
+The applied version is stored in `PRAGMA user_version`. Each migration is a list of
+steps: an SQL statement (executed as-is) or a callable taking the connection, for
+data backfills. Never edit a released migration; append a new one instead.
+"""
+import logging
+import sqlite3
+
+from context_pilot.utils.knowledge_store import (
+    CONTENT_FIELDS, SEARCH_FIELDS, entry_text, parse_tags,
+    rebuild_minhash_bands
+)
+from context_pilot.utils import minhash
+
+logger = logging.getLogger(__name__)
+
+
+def _backfill_entry_tags(conn: sqlite3.Connection):
+    rows = conn.execute("SELECT id, tags FROM knowledge_entries WHERE tags IS NOT NULL AND tags != ''").fetchall()
+    conn.executemany(
+        "INSERT OR IGNORE INTO entry_tags (entry_id, tag) VALUES (?, ?)",
+        [(row[0], tag) for row in rows for tag in parse_tags(row[1])]
+    )
+
+
+def _recompute_fingerprints(conn: sqlite3.Connection):
+    seq_before = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'kb_changes'").fetchone()
+    cursor = conn.execute(f"SELECT id, fingerprint, {', '.join(CONTENT_FIELDS)} FROM knowledge_entries")
+    while True:
+        rows = cursor.fetchmany(5000)
+        if not rows:
+            break
+        signatures = minhash.signatures([entry_text(zip(CONTENT_FIELDS, row[2:])) for row in rows])
+        fingerprints = [minhash.to_bytes(signature) for signature in signatures]
+        # Rows that already carry the current fingerprint are left alone
+        conn.executemany(
+            "UPDATE knowledge_entries SET fingerprint = ? WHERE id = ?",
+            [(fingerprint, row[0]) for row, fingerprint in zip(rows, fingerprints) if row[1] != fingerprint]
+        )
+    # The content did not change: drop the change-log rows the updates produced
+    conn.execute("DELETE FROM kb_changes WHERE seq > ?", (seq_before[0] if seq_before else 0,))
+
+
+def _insert_bands_sql(ref: str) -> str:
+    """Inserts the LSH band rows of `ref` (new/old) derived from its fingerprint."""
+    bands = ", ".join(f"({band})" for band in range(minhash.BANDS))
+    return f"""
+        INSERT OR IGNORE INTO entry_minhash_bands (band, bucket, entry_id)
+        SELECT n.column1, substr({ref}.fingerprint, n.column1 * {minhash.BAND_BYTES} + 1, {minhash.BAND_BYTES}), {ref}.id
+        FROM (VALUES {bands}) AS n
+        WHERE {ref}.fingerprint IS NOT NULL;
+    """
+
+
+def _delete_bands_sql(ref: str) -> str:
+    # One statement per band so each delete is a full primary-key lookup
+    return "".join(
+        f"DELETE FROM entry_minhash_bands WHERE band = {band} AND entry_id = {ref}.id "
+        f"AND bucket = substr({ref}.fingerprint, {band * minhash.BAND_BYTES + 1}, {minhash.BAND_BYTES});\n"
+        for band in range(minhash.BANDS)
+    )
+
+
+def _facet_increment_sql(table: str, key: str, value: str) -> str:
+    return f"""
+        INSERT INTO {table} ({key}, entry_count) VALUES ({value}, 1)
+        ON CONFLICT ({key}) DO UPDATE SET entry_count = entry_count + 1;
+    """
+
+
+def _facet_decrement_sql(table: str, key: str, value: str) -> str:
+    return f"""
+        UPDATE {table} SET entry_count = entry_count - 1 WHERE {key} = {value};
+        DELETE FROM {table} WHERE {key} = {value} AND entry_count <= 0;
+    """
+
+
+def _fts_row_sql(ref: str) -> str:
+    return ", ".join([f"{ref}.rowid"] + [f"{ref}.{field}" for field in SEARCH_FIELDS])
+
+
+_FTS_COLUMNS = ", ".join(SEARCH_FIELDS)
+
+
+MIGRATIONS = [
+    (1, [
+        # IF NOT EXISTS: databases created before versioning already have these tables
+        """
+        CREATE TABLE IF NOT EXISTS knowledge_entries (
+            id TEXT PRIMARY KEY,
+            intent TEXT,
+            problem_context TEXT,
+            root_cause TEXT,
+            solution_steps TEXT,
+            evidence TEXT,
+            tags TEXT,
+            contributor TEXT,
+            created_at TIMESTAMP,
+            updated_at TIMESTAMP
+        )
+        """,
+        # Precomputed nearest neighbours per entry (filled by build_index.py)
+        """
+        CREATE TABLE IF NOT EXISTS knowledge_neighbors (
+            entry_id TEXT NOT NULL,
+            rank INTEGER NOT NULL,
+            neighbor_id TEXT NOT NULL,
+            score REAL,
+            PRIMARY KEY (entry_id, rank)
+        ) WITHOUT ROWID
+        """,
+    ]),
+    (2, [
+        # Time-ordered listings; `id` breaks ties for stable keyset pagination
+        "CREATE INDEX IF NOT EXISTS idx_knowledge_entries_created_at ON knowledge_entries (created_at, id)",
+        "CREATE INDEX IF NOT EXISTS idx_knowledge_entries_updated_at ON knowledge_entries (updated_at)",
+        # Normalized tags, kept in sync by knowledge_store.save_entry
+        """
+        CREATE TABLE IF NOT EXISTS entry_tags (
+            entry_id TEXT NOT NULL,
+            tag TEXT NOT NULL,
+            PRIMARY KEY (entry_id, tag)
+        ) WITHOUT ROWID
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_entry_tags_tag ON entry_tags (tag, entry_id)",
+        """
+        CREATE TRIGGER IF NOT EXISTS knowledge_entries_delete_tags
+        AFTER DELETE ON knowledge_entries
+        BEGIN
+            DELETE FROM entry_tags WHERE entry_id = old.id;
+        END
+        """,
+        _backfill_entry_tags,
+    ]),
+    (3, [
+        # Change feed consumed by incremental index builds (see utils/change_feed.py).
+        # AUTOINCREMENT: sequence numbers are never reused after the log is truncated.
+        """
+        CREATE TABLE IF NOT EXISTS kb_changes (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            entry_id TEXT NOT NULL,
+            op TEXT NOT NULL CHECK (op IN ('I', 'U', 'D'))
+        )
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS knowledge_entries_log_insert
+        AFTER INSERT ON knowledge_entries
+        BEGIN
+            INSERT INTO kb_changes (entry_id, op) VALUES (new.id, 'I');
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS knowledge_entries_log_update
+        AFTER UPDATE ON knowledge_entries
+        BEGIN
+            INSERT INTO kb_changes (entry_id, op) SELECT old.id, 'D' WHERE old.id IS NOT new.id;
+            INSERT INTO kb_changes (entry_id, op) VALUES (new.id, 'U');
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS knowledge_entries_log_delete
+        AFTER DELETE ON knowledge_entries
+        BEGIN
+            INSERT INTO kb_changes (entry_id, op) VALUES (old.id, 'D');
+        END
+        """,
+    ]),
+    (4, [
+        # MinHash signature of the entry content (see utils/minhash.py), used to spot
+        # near-duplicate saves. Its LSH bands are kept in sync by the triggers below.
+        "ALTER TABLE knowledge_entries ADD COLUMN fingerprint BLOB",
+        """
+        CREATE TABLE IF NOT EXISTS entry_minhash_bands (
+            band INTEGER NOT NULL,
+            bucket BLOB NOT NULL,
+            entry_id TEXT NOT NULL,
+            PRIMARY KEY (band, bucket, entry_id)
+        ) WITHOUT ROWID
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS knowledge_entries_insert_bands
+        AFTER INSERT ON knowledge_entries
+        BEGIN
+            {_insert_bands_sql("new")}
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS knowledge_entries_update_bands
+        AFTER UPDATE ON knowledge_entries
+        WHEN old.fingerprint IS NOT new.fingerprint OR old.id IS NOT new.id
+        BEGIN
+            {_delete_bands_sql("old")}
+            {_insert_bands_sql("new")}
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS knowledge_entries_delete_bands
+        AFTER DELETE ON knowledge_entries
+        BEGIN
+            {_delete_bands_sql("old")}
+        END
+        """,
+        # Existing entries get their fingerprints from migration 7, which computes them in
+        # one vectorized pass (a backfill here would only be redone there)
+    ]),
+    (5, [
+        # Full-text index for the dashboard search (knowledge_store.search_entries).
+        # External content: the text lives only in knowledge_entries, the triggers
+        # below keep the index in sync. The trigram tokenizer matches substrings, which
+        # also works for Chinese text (no word boundaries).
+        f"""
+        CREATE VIRTUAL TABLE IF NOT EXISTS entries_fts USING fts5(
+            {_FTS_COLUMNS},
+            content='knowledge_entries', content_rowid='rowid', tokenize='trigram'
+        )
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS knowledge_entries_insert_fts
+        AFTER INSERT ON knowledge_entries
+        BEGIN
+            INSERT INTO entries_fts (rowid, {_FTS_COLUMNS}) VALUES ({_fts_row_sql("new")});
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS knowledge_entries_update_fts
+        AFTER UPDATE ON knowledge_entries
+        WHEN {" OR ".join(f"old.{field} IS NOT new.{field}" for field in SEARCH_FIELDS)}
+        BEGIN
+            INSERT INTO entries_fts (entries_fts, rowid, {_FTS_COLUMNS}) VALUES ('delete', {_fts_row_sql("old")});
+            INSERT INTO entries_fts (rowid, {_FTS_COLUMNS}) VALUES ({_fts_row_sql("new")});
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS knowledge_entries_delete_fts
+        AFTER DELETE ON knowledge_entries
+        BEGIN
+            INSERT INTO entries_fts (entries_fts, rowid, {_FTS_COLUMNS}) VALUES ('delete', {_fts_row_sql("old")});
+        END
+        """,
+        "INSERT INTO entries_fts (entries_fts) VALUES ('rebuild')",
+    ]),
+    (6, [
+        # Materialized facet counts (knowledge_store.tag_facets / contributor_facets):
+        # reading them costs O(number of facets), whatever the number of entries.
+        # Tag counts follow `entry_tags`, so every path that maintains it is covered.
+        """
+        CREATE TABLE IF NOT EXISTS tag_facets (
+            tag TEXT PRIMARY KEY,
+            entry_count INTEGER NOT NULL
+        ) WITHOUT ROWID
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS entry_tags_insert_facets
+        AFTER INSERT ON entry_tags
+        BEGIN
+            {_facet_increment_sql("tag_facets", "tag", "new.tag")}
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS entry_tags_delete_facets
+        AFTER DELETE ON entry_tags
+        BEGIN
+            {_facet_decrement_sql("tag_facets", "tag", "old.tag")}
+        END
+        """,
+        # Entries without a contributor are counted under ''
+        """
+        CREATE TABLE IF NOT EXISTS contributor_facets (
+            contributor TEXT PRIMARY KEY,
+            entry_count INTEGER NOT NULL
+        ) WITHOUT ROWID
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS knowledge_entries_insert_contributor
+        AFTER INSERT ON knowledge_entries
+        BEGIN
+            {_facet_increment_sql("contributor_facets", "contributor", "IFNULL(new.contributor, '')")}
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS knowledge_entries_update_contributor
+        AFTER UPDATE OF contributor ON knowledge_entries
+        WHEN IFNULL(old.contributor, '') != IFNULL(new.contributor, '')
+        BEGIN
+            {_facet_decrement_sql("contributor_facets", "contributor", "IFNULL(old.contributor, '')")}
+            {_facet_increment_sql("contributor_facets", "contributor", "IFNULL(new.contributor, '')")}
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS knowledge_entries_delete_contributor
+        AFTER DELETE ON knowledge_entries
+        BEGIN
+            {_facet_decrement_sql("contributor_facets", "contributor", "IFNULL(old.contributor, '')")}
+        END
+        """,
+        "INSERT INTO tag_facets (tag, entry_count) SELECT tag, COUNT(*) FROM entry_tags GROUP BY tag",
+        """
+        INSERT INTO contributor_facets (contributor, entry_count)
+        SELECT IFNULL(contributor, ''), COUNT(*) FROM knowledge_entries GROUP BY IFNULL(contributor, '')
+        """,
+    ]),
+    (7, [
+        # Band rows are now written by knowledge_store.replace_minhash_bands, per batch and
+        # in key order, instead of 16 trigger inserts per row (bulk imports). Fingerprints
+        # switch to one-permutation hashing (utils/minhash.py) and are recomputed.
+        "DROP TRIGGER IF EXISTS knowledge_entries_insert_bands",
+        "DROP TRIGGER IF EXISTS knowledge_entries_update_bands",
+        _recompute_fingerprints,
+        rebuild_minhash_bands,
+    ]),
+    (8, [
+        # Tag listings (knowledge_store.list_entries) are ordered by creation time: keeping
+        # created_at next to the tag lets one index serve the filter, the order and the
+        # keyset cursor, with no sort of all the entries carrying the tag.
+        "ALTER TABLE entry_tags ADD COLUMN created_at TIMESTAMP",
+        "UPDATE entry_tags SET created_at = (SELECT created_at FROM knowledge_entries WHERE id = entry_tags.entry_id)",
+        "CREATE INDEX IF NOT EXISTS idx_entry_tags_tag_created_at ON entry_tags (tag, created_at, entry_id)",
+        # Superseded: (tag, created_at, entry_id) also serves plain tag lookups
+        "DROP INDEX IF EXISTS idx_entry_tags_tag",
+        """
+        CREATE TRIGGER IF NOT EXISTS knowledge_entries_update_tag_created_at
+        AFTER UPDATE OF created_at ON knowledge_entries
+        WHEN old.created_at IS NOT new.created_at
+        BEGIN
+            UPDATE entry_tags SET created_at = new.created_at WHERE entry_id = new.id;
+        END
+        """,
+    ]),
+    (9, [
+        # Definitions of the triggers a bulk import has dropped, until it re-derives their
+        # data and recreates them (knowledge_store.suspend_bulk_load_triggers)
+        """
+        CREATE TABLE IF NOT EXISTS kb_suspended_triggers (
+            name TEXT PRIMARY KEY,
+            sql TEXT NOT NULL
+        ) WITHOUT ROWID
+        """,
+    ]),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def get_schema_version(conn: sqlite3.Connection) -> int:
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def apply_migrations(conn: sqlite3.Connection) -> int:
+    """
+    Applies all pending migrations in one IMMEDIATE transaction and returns the
+    resulting schema version. Safe to race against other processes: the version is
+    re-read once the write lock is held.
+    """
+    if get_schema_version(conn) >= LATEST_VERSION:
+        return LATEST_VERSION
+
+    previous_isolation = conn.isolation_level
+    conn.isolation_level = None  # manage the transaction explicitly
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            current = get_schema_version(conn)
+            for version, steps in MIGRATIONS:
+                if version <= current:
+                    continue
+                logger.info(f"Applying knowledge base migration {version}...")
+                for step in steps:
+                    if callable(step):
+                        step(conn)
+                    else:
+                        conn.execute(step)
+                conn.execute(f"PRAGMA user_version = {version}")
+                current = version
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+    finally:
+        conn.isolation_level = previous_isolation
+    return current
@@ -0,0 +1,108 @@
+"""
+MinHash signatures for near-duplicate detection of knowledge entries.
+
+Texts are compared by the Jaccard similarity of their character trigrams (works for
+both English and Chinese, which has no word boundaries). A 64-value signature
+estimates that similarity, and its 16 bands of 4 values are the LSH keys stored in
+`entry_minhash_bands`: two entries share a band with probability 1 - (1 - s^4)^16,
+i.e. ~0.64 at s=0.5, ~0.89 at s=0.6 and ~0.98 at s=0.7.
+
+Signatures use one-permutation hashing: every trigram is hashed once, the top bits
+of the hash pick one of the 64 bins and each bin keeps its minimum. Bins a short
+text leaves empty borrow the next non-empty bin (rotation densification). This is
+one hash per trigram instead of one per trigram and signature value, and a whole
+batch of texts is hashed with array operations (`signatures`).
+"""
+import re
+
+import numpy as np
+
+NUM_BINS = 64
+BANDS = 16
+ROWS = NUM_BINS // BANDS
+BAND_BYTES = ROWS * 4
+SHINGLE_SIZE = 3
+
+_BIN_SHIFT = np.uint64(64 - 6)  # log2(NUM_BINS) top bits select the bin
+_EMPTY = np.uint32(0xFFFFFFFF)
+# Added per step when an empty bin borrows a neighbour, so borrowed values differ from the original
+_ROTATION_OFFSET = np.uint32(0x9E3779B1)
+_SEPARATOR = "\x01"
+
+
+def _hash(keys: np.ndarray) -> np.ndarray:
+    """splitmix64 finalizer: fixed, so signatures stay comparable across processes."""
+    keys = keys ^ (keys >> np.uint64(31))
+    keys *= np.uint64(0x9E3779B97F4A7C15)
+    keys ^= keys >> np.uint64(29)
+    keys *= np.uint64(0xBF58476D1CE4E5B9)
+    keys ^= keys >> np.uint64(32)
+    return keys
+
+
+def _normalize(texts: list[str]) -> list[str]:
+    # Lower-case and collapse whitespace in one pass over the whole batch
+    joined = _SEPARATOR.join((text or "").replace(_SEPARATOR, " ") for text in texts)
+    joined = re.sub(r"\s+", " ", joined.lower())
+    # Texts shorter than a shingle are one (padded) shingle
+    return [text.strip().ljust(SHINGLE_SIZE, "\0") for text in joined.split(_SEPARATOR)]
+
+
+def signatures(texts: list[str]) -> np.ndarray:
+    """Signatures of many texts at once, as a (len(texts), NUM_BINS) uint32 matrix."""
+    if not texts:
+        return np.empty((0, NUM_BINS), dtype=np.uint32)
+    texts = _normalize(texts)
+    codes = np.frombuffer("".join(texts).encode("utf-32-le"), dtype=np.uint32).astype(np.uint64)
+    lengths = np.fromiter((len(text) for text in texts), dtype=np.int64, count=len(texts))
+    counts = lengths - (SHINGLE_SIZE - 1)
+
+    # Position of every trigram in `codes`, skipping those that span two texts;
+    # a trigram is packed exactly into one key (three 21-bit code points)
+    firsts = np.cumsum(counts) - counts
+    positions = np.arange(counts.sum()) + np.repeat(np.cumsum(lengths) - lengths - firsts, counts)
+    hashes = _hash((codes[positions] << np.uint64(42)) | (codes[positions + 1] << np.uint64(21)) | codes[positions + 2])
+
+    cells = np.repeat(np.arange(len(texts)) * NUM_BINS, counts) + (hashes >> _BIN_SHIFT).astype(np.int64)
+    result = np.full(len(texts) * NUM_BINS, _EMPTY, dtype=np.uint32)
+    np.minimum.at(result, cells, (hashes & np.uint64(0xFFFFFFFF)).astype(np.uint32))
+    result = result.reshape(len(texts), NUM_BINS)
+
+    empty = result == _EMPTY
+    if empty.any():
+        # Index of the next non-empty bin, looking to the right and wrapping around
+        bins = np.arange(NUM_BINS)
+        filled = np.where(empty, 3 * NUM_BINS, bins)
+        doubled = np.concatenate([filled, np.where(empty, 3 * NUM_BINS, bins + NUM_BINS)], axis=1)
+        source = np.minimum.accumulate(doubled[:, ::-1], axis=1)[:, ::-1][:, :NUM_BINS]
+        borrowed = np.take_along_axis(result, source % NUM_BINS, axis=1)
+        steps = (source - bins).astype(np.uint32)
+        result = np.where(empty, borrowed + steps * _ROTATION_OFFSET, result)
+    return result
+
+
+def signature(text: str) -> np.ndarray:
+    """Signature (NUM_BINS uint32 values) of `text`."""
+    return signatures([text])[0]
+
+
+def to_bytes(sig: np.ndarray) -> bytes:
+    return sig.astype("<u4").tobytes()
+
+
+def from_bytes(blob: bytes) -> np.ndarray:
+    return np.frombuffer(blob, dtype="<u4")
+
+
+def band_buckets(sig: np.ndarray) -> list[bytes]:
+    """
+    The LSH bucket of every band: simply that band's slice of `to_bytes(sig)`, so
+    SQLite triggers can derive the buckets from the stored fingerprint with substr().
+    """
+    raw = to_bytes(sig)
+    return [raw[i:i + BAND_BYTES] for i in range(0, len(raw), BAND_BYTES)]
+
+
+def similarity(a: np.ndarray, b: np.ndarray) -> float:
+    """Estimated Jaccard similarity of the texts behind two signatures."""
+    return float(np.mean(a == b))
@@ -0,0 +1,225 @@
+"""
+Online snapshots of a knowledge base: the SQLite DB plus the persisted index.
+
+The DB is copied with the SQLite online backup API a few pages per step, so writers
+keep going while the copy runs. The build lock is held meanwhile, which pins the
+index version: the archived manifest's `change_seq` matches the archived change log,
+so after a restore an incremental build only embeds what changed since.
+
+Archive layout (tar.gz):
+    snapshot.json            metadata (KB, schema version, index manifest)
+    knowledge_base.sqlite    the DB
+    rag_storage/...          the persisted index
+"""
+import os
+import json
+import shutil
+import sqlite3
+import logging
+import tarfile
+import tempfile
+from datetime import datetime
+
+from filelock import FileLock
+
+try:
+    from context_pilot.scripts.rag_config import RagConfig
+    from context_pilot.utils.db_manager import get_db_manager
+    from context_pilot.utils.migrations import get_schema_version
+except ImportError:
+    import sys
+    sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
+    from context_pilot.scripts.rag_config import RagConfig
+    from context_pilot.utils.db_manager import get_db_manager
+    from context_pilot.utils.migrations import get_schema_version
+
+logger = logging.getLogger(__name__)
+
+META_FILE = "snapshot.json"
+STORAGE_ARCNAME = "rag_storage"
+LOCK_TIMEOUT = 120
+
+
+def _backup_db(db_manager, dest_path: str, pages: int) -> int:
+    """Copies the live DB to `dest_path` in steps of `pages` pages; returns the schema version."""
+    source = db_manager.new_connection()
+    dest = sqlite3.connect(dest_path)
+    try:
+        source.backup(dest, pages=pages)
+        # The copy does not need the WAL: fold it into a single self-contained file
+        dest.execute("PRAGMA journal_mode=DELETE")
+        return get_schema_version(dest)
+    finally:
+        dest.close()
+        source.close()
+
+
+def create_snapshot(kb: str = None, output_dir: str = None, pages: int = None) -> dict:
+    """
+    Writes `<output_dir>/<kb>-<timestamp>.tar.gz` and returns its metadata
+    (including `path` and `size_bytes`).
+    """
+    kb = RagConfig.normalize_kb_name(kb)
+    output_dir = output_dir or RagConfig.SNAPSHOT_DIR
+    pages = pages or RagConfig.SNAPSHOT_PAGES_PER_STEP
+    os.makedirs(output_dir, exist_ok=True)
+
+    db_manager = get_db_manager(kb)
+    db_manager.init_db()
+    storage_dir = RagConfig.kb_storage_dir(kb)
+    lock_path = RagConfig.kb_lock_path(kb)
+    os.makedirs(os.path.dirname(lock_path), exist_ok=True)
+
+    with tempfile.TemporaryDirectory(dir=output_dir) as staging:
+        staged_db = os.path.join(staging, RagConfig.DB_FILENAME)
+        staged_storage = os.path.join(staging, STORAGE_ARCNAME)
+
+        # No build may swap the index (or truncate the change log) while we copy
+        with FileLock(lock_path, timeout=LOCK_TIMEOUT):
+            schema_version = _backup_db(db_manager, staged_db, pages)
+            if os.path.isdir(storage_dir):
+                shutil.copytree(storage_dir, staged_storage)
+
+        index_manifest = {}
+        manifest_path = os.path.join(staged_storage, RagConfig.MANIFEST_FILE)
+        if os.path.exists(manifest_path):
+            with open(manifest_path, 'r') as f:
+                index_manifest = json.load(f)
+
+        meta = {
+            "knowledge_base": kb,
+            "created_at": datetime.now().isoformat(),
+            "schema_version": schema_version,
+            "db_file": RagConfig.DB_FILENAME,
+            "has_index": os.path.isdir(staged_storage),
+            "index_manifest": index_manifest,
+        }
+        with open(os.path.join(staging, META_FILE), 'w') as f:
+            json.dump(meta, f, indent=2)
+
+        archive = os.path.join(output_dir, f"{kb}-{datetime.now().strftime('%Y%m%d-%H%M%S')}.tar.gz")
+        partial = archive + ".partial"
+        with tarfile.open(partial, "w:gz") as tar:
+            tar.add(os.path.join(staging, META_FILE), arcname=META_FILE)
+            tar.add(staged_db, arcname=RagConfig.DB_FILENAME)
+            if meta["has_index"]:
+                tar.add(staged_storage, arcname=STORAGE_ARCNAME)
+        os.replace(partial, archive)
+
+    meta["path"] = archive
+    meta["size_bytes"] = os.path.getsize(archive)
+    logger.info(f"✅ Snapshot of '{kb}' written to {archive} ({meta['size_bytes'] / 1e6:.1f} MB)")
+    return meta
+
+
+def _extract(tar: tarfile.TarFile, dest: str):
+    """Extracts `tar` into `dest`, rejecting links, devices and paths outside `dest`."""
+    if hasattr(tarfile, "data_filter"):
+        try:
+            tar.extractall(dest, filter="data")
+        except tarfile.FilterError as e:
+            raise ValueError(f"Unsafe member in snapshot archive: {e}") from e
+        return
+
+    # Python < 3.11.4 has no extraction filters: snapshots only hold files and directories
+    root = os.path.realpath(dest)
+    for member in tar.getmembers():
+        target = os.path.realpath(os.path.join(root, member.name))
+        if not (member.isfile() or member.isdir()) or os.path.commonpath([root, target]) != root:
+            raise ValueError(f"Unsafe member in snapshot archive: {member.name}")
+    tar.extractall(dest)
+
+
+def read_snapshot_meta(archive: str) -> dict:
+    with tarfile.open(archive, "r:*") as tar:
+        return json.load(tar.extractfile(META_FILE))
+
+
+class KnowledgeBaseInUseError(RuntimeError):
+    """The DB to restore over is open in another connection (server, writer, build)."""
+
+
+def _claim_db(db_path: str) -> sqlite3.Connection:
+    """
+    Returns a connection holding an exclusive lock on the existing DB at `db_path`,
+    or raises KnowledgeBaseInUseError if any other connection has it open.
+    """
+    conn = sqlite3.connect(db_path, timeout=0, isolation_level=None)
+    try:
+        # Leaving WAL mode requires being the only connection to the file (this also
+        # checkpoints and removes the -wal/-shm files)
+        if conn.execute("PRAGMA journal_mode=DELETE").fetchone()[0] != "delete":
+            raise sqlite3.OperationalError("database is locked")
+        # Keeps new connections out until the file has been replaced
+        conn.execute("PRAGMA locking_mode=EXCLUSIVE")
+        conn.execute("BEGIN EXCLUSIVE")
+    except sqlite3.OperationalError as e:
+        conn.close()
+        raise KnowledgeBaseInUseError(
+            f"The DB at {db_path} is in use ({e}). Restore is a cold-start operation: "
+            f"stop the server, auto-indexer and any other process using the knowledge base first."
+        ) from e
+    return conn
+
+
+def restore_snapshot(archive: str, kb: str = None, force: bool = False) -> dict:
+    """
+    Replaces a KB's DB and index with the content of `archive` (no re-embedding).
+    `kb` defaults to the KB the snapshot was taken from; an existing DB is only
+    overwritten with `force`, and never while another connection has it open
+    (KnowledgeBaseInUseError). If the snapshot has no index, the existing one is
+    removed: it does not match the restored DB and a full build is needed.
+    """
+    meta = read_snapshot_meta(archive)
+    kb = RagConfig.normalize_kb_name(kb or meta["knowledge_base"])
+    db_manager = get_db_manager(kb)
+    db_path = db_manager.db_path
+    storage_dir = RagConfig.kb_storage_dir(kb)
+
+    if os.path.exists(db_path) and not force:
+        raise FileExistsError(f"Knowledge base '{kb}' already has a DB at {db_path}. Use force to overwrite it.")
+
+    parent = os.path.dirname(os.path.abspath(db_path))
+    os.makedirs(parent, exist_ok=True)
+    os.makedirs(os.path.dirname(storage_dir), exist_ok=True)
+    lock_path = RagConfig.kb_lock_path(kb)
+
+    # Extract next to the targets so the final moves are renames on the same filesystem
+    with tempfile.TemporaryDirectory(dir=parent) as staging:
+        with tarfile.open(archive, "r:*") as tar:
+            _extract(tar, staging)
+
+        staged_db = os.path.join(staging, meta["db_file"])
+        check = sqlite3.connect(staged_db)
+        try:
+            result = check.execute("PRAGMA quick_check").fetchone()[0]
+        finally:
+            check.close()
+        if result != "ok":
+            raise ValueError(f"Snapshot DB failed its integrity check: {result}")
+
+        with FileLock(lock_path, timeout=LOCK_TIMEOUT):
+            # Our own connections would count as users of the file
+            db_manager.reset()
+            guard = _claim_db(db_path) if os.path.exists(db_path) else None
+            try:
+                for suffix in ("-wal", "-shm"):
+                    if os.path.exists(db_path + suffix):
+                        os.remove(db_path + suffix)
+                os.replace(staged_db, db_path)
+            finally:
+                if guard is not None:
+                    guard.close()
+
+            # The replaced index is moved into the staging dir and removed with it
+            if os.path.exists(storage_dir):
+                os.replace(storage_dir, os.path.join(staging, "previous_storage"))
+            staged_storage = os.path.join(staging, STORAGE_ARCNAME)
+            if os.path.isdir(staged_storage):
+                shutil.move(staged_storage, storage_dir)
+
+    if meta["has_index"]:
+        logger.info(f"✅ Snapshot {archive} restored into '{kb}' (index built {meta['index_manifest'].get('build_time', 'never')}).")
+    else:
+        logger.warning(f"⚠️ Snapshot {archive} restored into '{kb}' without an index: run a full build before querying it.")
+    return {**meta, "knowledge_base": kb}
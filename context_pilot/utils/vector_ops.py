@@ -0,0 +1,120 @@
+import numpy as np
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """Returns a float32 copy of `matrix` with every row scaled to unit length."""
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def blocked_top_k_neighbors(matrix: np.ndarray, top_k: int, block_size: int = 1024, rows=None):
+    """
+    Finds the `top_k` most similar rows (cosine) for every row of `matrix`, or only
+    for the row indices in `rows` (their neighbours are still searched among all rows).
+
+    Similarities are computed one block of rows at a time so peak memory stays at
+    `block_size x n` instead of `n x n`.
+
+    Returns:
+        (indices, scores): two `len(rows) x k` arrays ordered from most to least similar,
+        where k = min(top_k, n - 1). A row is never its own neighbour.
+    """
+    normed = normalize_rows(matrix)
+    n = normed.shape[0]
+    rows = np.arange(n) if rows is None else np.asarray(rows, dtype=np.int64)
+    k = min(top_k, n - 1)
+    if k <= 0:
+        return np.empty((len(rows), 0), dtype=np.int64), np.empty((len(rows), 0), dtype=np.float32)
+
+    indices = np.empty((len(rows), k), dtype=np.int64)
+    scores = np.empty((len(rows), k), dtype=np.float32)
+    for start in range(0, len(rows), block_size):
+        block = rows[start:start + block_size]
+        sims = normed[block] @ normed.T
+        # Exclude self-matches
+        sims[np.arange(len(block)), block] = -np.inf
+
+        # argpartition gives the top-k unordered; sort only those k columns
+        part = np.argpartition(-sims, k - 1, axis=1)[:, :k]
+        part_scores = np.take_along_axis(sims, part, axis=1)
+        order = np.argsort(-part_scores, axis=1)
+        indices[start:start + len(block)] = np.take_along_axis(part, order, axis=1)
+        scores[start:start + len(block)] = np.take_along_axis(part_scores, order, axis=1)
+    return indices, scores
+
+
+def blocked_max_similarity(matrix: np.ndarray, rows, block_size: int = 1024) -> np.ndarray:
+    """Best cosine similarity of every row of `matrix` to any of the rows in `rows`."""
+    normed = normalize_rows(matrix)
+    rows = np.asarray(rows, dtype=np.int64)
+    best = np.full(normed.shape[0], -np.inf, dtype=np.float32)
+    for start in range(0, len(rows), block_size):
+        sims = normed[rows[start:start + block_size]] @ normed.T
+        np.maximum(best, sims.max(axis=0), out=best)
+    return best
+
+
+QUANTIZATION_MODES = ("float16", "int8")
+
+# Rows widened to float32 per scoring step: about 1 MB, so each block stays in cache
+SCORE_BLOCK_BYTES = 1 << 20
+
+
+def quantize_rows(matrix: np.ndarray, mode: str):
+    """
+    Scalar-quantizes the rows of `matrix`.
+
+    Returns:
+        (quantized, scales): for "float16" scales is None; for "int8" every row is
+        stored as round(row / scale) with scale = max(|row|) / 127.
+    """
+    matrix = np.asarray(matrix, dtype=np.float32)
+    if mode == "float16":
+        return matrix.astype(np.float16), None
+    if mode == "int8":
+        scales = np.abs(matrix).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        quantized = np.clip(np.rint(matrix / scales[:, None]), -127, 127).astype(np.int8)
+        return quantized, scales.astype(np.float32)
+    raise ValueError(f"Unknown quantization mode: {mode}")
+
+
+def quantized_scores(quantized: np.ndarray, scales, query: np.ndarray, block_size: int = None) -> np.ndarray:
+    """
+    Approximate dot products between `query` and every quantized row.
+
+    NumPy has no BLAS kernels for float16/int8, so rows are widened to float32 one
+    block of `block_size` rows (default: SCORE_BLOCK_BYTES worth) at a time; the
+    quantized matrix itself is never fully expanded. int8 scores about as fast as
+    float32 this way, but NumPy widens float16 without SIMD, so float16 scoring is
+    several times slower than float32.
+    """
+    block_size = block_size or max(1, SCORE_BLOCK_BYTES // (4 * max(1, quantized.shape[-1])))
+    query = np.asarray(query, dtype=np.float32)
+    scores = np.empty(quantized.shape[0], dtype=np.float32)
+    for start in range(0, quantized.shape[0], block_size):
+        stop = min(start + block_size, quantized.shape[0])
+        scores[start:stop] = quantized[start:stop].astype(np.float32) @ query
+    if scales is not None:
+        scores *= scales
+    return scores
+
+
+def top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the `k` highest scores, best first."""
+    k = min(k, scores.shape[0])
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    part = np.argpartition(-scores, k - 1)[:k]
+    return part[np.argsort(-scores[part])]
+
+
+def truncate_and_normalize(vector, dim: int) -> list[float]:
+    """Keeps the first `dim` components (Matryoshka-style) and rescales to unit length."""
+    truncated = np.asarray(vector, dtype=np.float32)[:dim]
+    norm = np.linalg.norm(truncated)
+    if norm > 0:
+        truncated = truncated / norm
+    return truncated.tolist()
@@ -1,4 +1,9 @@
 #!/bin/sh
+# Cold start from a snapshot (skipped when the knowledge DB already exists)
+if [ -n "$KB_RESTORE_SNAPSHOT" ]; then
+    python -m context_pilot.main kb restore --if-missing "$KB_RESTORE_SNAPSHOT"
+fi
+
 # Start auto indexer in background
 python context_pilot/scripts/run_auto_index.py &
 
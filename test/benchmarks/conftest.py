@@ -0,0 +1,12 @@
+"""
+Benchmark scripts - performance measurements of the knowledge index.
+
+These scripts are NOT auto-discovered by pytest; they are run by hand (or from a
+nightly job) and write their results to a JSON file that can be compared across commits.
+
+Usage:
+    python test/benchmarks/manual_quantization_benchmark.py --output quantization.json
+    python test/benchmarks/manual_retrieval_benchmark.py --output retrieval.json
+    python test/benchmarks/manual_build_scaling_benchmark.py --sizes 1000,10000 --output build_scaling.json
+"""
+collect_ignore_glob = ["manual_*.py"]
@@ -0,0 +1,131 @@
+"""
+How index builds scale with the number of knowledge entries.
+
+For each size, seeds synthetic rows into a temporary DB and runs, with the offline
+HashEmbedding: a full build, an incremental build after changing a fraction of the
+rows, and a no-op incremental build. Records per-phase wall time, persisted bytes
+and peak RSS (each size runs in its own process):
+    python test/benchmarks/manual_build_scaling_benchmark.py --sizes 1000,10000,100000
+
+Exits with status 1 if a no-op incremental build takes longer than --noop-budget
+seconds (default: KB_BENCH_NOOP_BUDGET_SECONDS or 0.5).
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+from unittest.mock import patch
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
+
+from context_pilot.scripts.build_progress import read_progress
+from context_pilot.scripts.rag_config import RagConfig
+from context_pilot.testing.synthetic_kb import make_dataset, offline_build, seed_kb
+from context_pilot.utils.db_manager import get_db_manager
+
+KB = "scaling-bench"
+NOOP_BUDGET_SECONDS = float(os.getenv("KB_BENCH_NOOP_BUDGET_SECONDS", "0.5"))
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def persisted_bytes(path: str) -> int:
+    return sum(
+        os.path.getsize(os.path.join(root, name))
+        for root, _, files in os.walk(path) for name in files
+    )
+
+
+def timed_build(build_module, mode: str) -> dict:
+    start = time.perf_counter()
+    build_module.build_index(mode=mode, kb=KB)
+    wall = time.perf_counter() - start
+    progress = read_progress(KB) or {}
+    return {
+        "wall_seconds": wall,
+        "state": progress.get("state"),
+        "phases": progress.get("phases", {}),
+        "counters": progress.get("counters", {}),
+        "persisted_bytes": persisted_bytes(RagConfig.kb_storage_dir(KB)),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def _run_size(size: int, changed: float, dim: int, result_path: str):
+    """Runs in a child process per size, so peak RSS is per size."""
+    entries, _ = make_dataset(size, 0)
+    with tempfile.TemporaryDirectory() as root, \
+         patch.object(RagConfig, "KB_ROOT_DIR", root), offline_build(dim) as build_module:
+        seed = seed_kb(KB, entries)
+        result = {"rows": size, "seed_seconds": seed["seconds"], "full": timed_build(build_module, "full")}
+
+        ids = [entry["id"] for entry in entries[:max(1, int(size * changed))]]
+        with get_db_manager(KB).get_connection() as conn:
+            conn.executemany(
+                "UPDATE knowledge_entries SET root_cause = root_cause || ' (revised)' WHERE id = ?",
+                [(entry_id,) for entry_id in ids]
+            )
+        result["changed_rows"] = len(ids)
+        result["incremental"] = timed_build(build_module, "incremental")
+        result["noop"] = timed_build(build_module, "incremental")
+
+    with open(result_path, 'w') as f:
+        json.dump(result, f)
+
+
+def run(sizes: list, changed: float, dim: int) -> list:
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in sizes:
+            result_path = os.path.join(tmp, f"{size}.json")
+            child = multiprocessing.get_context("spawn").Process(
+                target=_run_size, args=(size, changed, dim, result_path))
+            child.start()
+            child.join()
+            if child.exitcode != 0:
+                raise RuntimeError(f"Build benchmark for {size} rows failed (exit code {child.exitcode})")
+            with open(result_path) as f:
+                results.append(json.load(f))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Index build scaling benchmark")
+    parser.add_argument("--sizes", default="1000,10000,100000", help="Comma-separated row counts")
+    parser.add_argument("--changed", type=float, default=0.01, help="Fraction of rows changed before the incremental build")
+    parser.add_argument("--dim", type=int, default=256, help="HashEmbedding dimensions")
+    parser.add_argument("--noop-budget", type=float, default=NOOP_BUDGET_SECONDS,
+                        help="Maximum seconds for a no-op incremental build")
+    parser.add_argument("--output", default="build_scaling_benchmark.json")
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(",")]
+    results = run(sizes, args.changed, args.dim)
+    over_budget = [r["rows"] for r in results if r["noop"]["wall_seconds"] > args.noop_budget]
+    with open(args.output, 'w') as f:
+        json.dump({
+            "config": {"sizes": sizes, "changed": args.changed, "embedding": f"hash-{args.dim}",
+                       "vector_storage": RagConfig.VECTOR_STORAGE, "noop_budget_seconds": args.noop_budget},
+            "results": results,
+        }, f, indent=2)
+
+    print(f"{'rows':>8} {'full s':>8} {'incr s':>8} {'noop s':>8} {'index MB':>9} {'peak RSS MB':>12}")
+    for r in results:
+        print(f"{r['rows']:>8} {r['full']['wall_seconds']:>8.2f} {r['incremental']['wall_seconds']:>8.2f} "
+              f"{r['noop']['wall_seconds']:>8.3f} {r['full']['persisted_bytes'] / 1e6:>9.1f} {r['noop']['peak_rss_mb']:>12.0f}")
+    print(f"Results written to {args.output}")
+
+    if over_budget:
+        print(f"❌ No-op incremental build exceeded {args.noop_budget}s for {over_budget} rows", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Memory / latency / recall of quantized vector storage against the float32 baseline.
+
+Uses synthetic clustered embeddings (no API calls), so results are reproducible:
+    python test/benchmarks/manual_quantization_benchmark.py --count 20000 --dim 3072
+
+int8 is the recommended quantized mode. float16 trades latency for memory: NumPy
+widens float16 without SIMD, so its searches are several times slower than float32
+(see `latency_vs_float32` in the output).
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
+
+from context_pilot.scripts.quantized_index import QuantizedIndex
+from context_pilot.utils.vector_ops import normalize_rows, quantize_rows, quantized_scores, top_k_indices
+
+# A Python float inside a list costs a 24-byte object plus an 8-byte pointer;
+# this is how the LlamaIndex JSON vector store holds embeddings once loaded.
+PY_FLOAT_LIST_BYTES = 32
+
+
+def make_dataset(count: int, dim: int, queries: int, seed: int = 7):
+    """Clustered unit vectors; queries are noisy copies of random rows."""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(max(count // 20, 1), dim)).astype(np.float32)
+    assignment = rng.integers(0, centers.shape[0], size=count)
+    matrix = centers[assignment] + 0.5 * rng.normal(size=(count, dim)).astype(np.float32)
+    picks = rng.integers(0, count, size=queries)
+    query_matrix = matrix[picks] + 0.3 * rng.normal(size=(queries, dim)).astype(np.float32)
+    return normalize_rows(matrix), normalize_rows(query_matrix)
+
+
+def percentile_ms(samples, pct):
+    return float(np.percentile(samples, pct) * 1000)
+
+
+def recall(found, expected) -> float:
+    return len(set(found) & set(expected)) / len(expected)
+
+
+def run(count: int, dim: int, queries: int, top_k: int, rescore: int) -> dict:
+    matrix, query_matrix = make_dataset(count, dim, queries)
+    exact_top = [top_k_indices(matrix @ q, top_k) for q in query_matrix]
+
+    results = {
+        "config": {"count": count, "dim": dim, "queries": queries, "top_k": top_k, "rescore_candidates": rescore},
+        "modes": {},
+    }
+
+    latencies = []
+    for q in query_matrix:
+        start = time.perf_counter()
+        top_k_indices(matrix @ q, top_k)
+        latencies.append(time.perf_counter() - start)
+    results["modes"]["float32"] = {
+        "resident_bytes": int(matrix.nbytes),
+        "python_list_bytes_estimate": count * dim * PY_FLOAT_LIST_BYTES,
+        "p50_ms": percentile_ms(latencies, 50),
+        "p99_ms": percentile_ms(latencies, 99),
+        "recall_at_k": 1.0,
+    }
+
+    with tempfile.TemporaryDirectory() as tmp:
+        full_path = os.path.join(tmp, "vectors_f32.npy")
+        np.save(full_path, matrix)
+        full = np.load(full_path, mmap_mode="r")
+        node_ids = list(range(count))
+
+        for mode in ("float16", "int8"):
+            quantized, scales = quantize_rows(matrix, mode)
+            index = QuantizedIndex(None, node_ids, quantized, scales, full, mode, rescore_candidates=rescore)
+
+            latencies, recalls, first_pass_recalls = [], [], []
+            for q, expected in zip(query_matrix, exact_top):
+                start = time.perf_counter()
+                hits = index.search(q, top_k)
+                latencies.append(time.perf_counter() - start)
+                recalls.append(recall([h[0] for h in hits], expected))
+                first_pass = top_k_indices(quantized_scores(quantized, scales, q), top_k)
+                first_pass_recalls.append(recall(first_pass, expected))
+
+            results["modes"][mode] = {
+                "resident_bytes": int(index.memory_bytes()),
+                "p50_ms": percentile_ms(latencies, 50),
+                "p99_ms": percentile_ms(latencies, 99),
+                "recall_at_k": float(np.mean(recalls)),
+                "recall_at_k_without_rescore": float(np.mean(first_pass_recalls)),
+            }
+    baseline = results["modes"]["float32"]["p50_ms"]
+    for r in results["modes"].values():
+        r["latency_vs_float32"] = r["p50_ms"] / baseline if baseline else 0.0
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Quantized vector storage benchmark")
+    parser.add_argument("--count", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=3072)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--rescore", type=int, default=50)
+    parser.add_argument("--output", default="quantization_benchmark.json")
+    args = parser.parse_args()
+
+    results = run(args.count, args.dim, args.queries, args.top_k, args.rescore)
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+
+    print(f"{'mode':<8} {'resident MB':>12} {'p50 ms':>8} {'p99 ms':>8} {'vs f32':>7} {'recall@k':>9}")
+    for mode, r in results["modes"].items():
+        print(f"{mode:<8} {r['resident_bytes'] / 1e6:>12.1f} {r['p50_ms']:>8.2f} {r['p99_ms']:>8.2f} "
+              f"{r['latency_vs_float32']:>6.1f}x {r['recall_at_k']:>9.3f}")
+    print("Note: float16 trades latency for memory (no SIMD float16 widening in NumPy); int8 is the recommended quantized mode.")
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+"""
+Retrieval quality vs latency of the knowledge index, end to end.
+
+Seeds a labeled synthetic KB (or a dataset file) into a temporary `knowledge_entries`
+DB, builds it with build_index.py using the offline HashEmbedding, then runs the
+fixed query set through the same loader as the retrieval tool:
+    python test/benchmarks/manual_retrieval_benchmark.py --entries 5000 --top-k 1,5,10
+    RAG_VECTOR_STORAGE=int8 python test/benchmarks/manual_retrieval_benchmark.py --output int8.json
+
+A dataset file is JSON with "entries" (import format, with ids) and
+"queries" ({"query", "relevant": [entry ids]}).
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from unittest.mock import patch
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
+
+from llama_index.core import Settings
+
+from context_pilot.scripts.rag_config import RagConfig
+from context_pilot.testing.hash_embedding import HashEmbedding
+from context_pilot.testing.synthetic_kb import make_dataset, offline_build, seed_kb
+
+KB = "retrieval-bench"
+
+
+def percentile_ms(samples, pct):
+    return float(np.percentile(samples, pct) * 1000)
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        return ""
+
+
+def _build(root: str, entries: list, dim: int, chunk_size: int, result_path: str):
+    """Runs in a child process, so its memory does not count towards the retrieval peak."""
+    with patch.object(RagConfig, "KB_ROOT_DIR", root), offline_build(dim) as build_module:
+        if chunk_size:
+            Settings.chunk_size = chunk_size
+        seed = seed_kb(KB, entries)
+        build_module.build_index(mode="full", kb=KB)
+        with open(os.path.join(RagConfig.kb_storage_dir(KB), RagConfig.MANIFEST_FILE)) as f:
+            manifest = json.load(f)
+    with open(result_path, 'w') as f:
+        json.dump({
+            "seed_seconds": seed["seconds"],
+            "build_stats": manifest.get("build_stats", {}),
+            "peak_rss_mb": peak_rss_mb(),
+        }, f)
+
+
+def ranked_entry_ids(nodes) -> list:
+    # Several chunks of one entry count once, at their best rank
+    return list(dict.fromkeys(node.node.ref_doc_id for node in nodes))
+
+
+def run(entries: list, queries: list, ks: list, dim: int, chunk_size: int) -> dict:
+    from context_pilot.context_pilot_app.tools import llama_rag_tool
+
+    with tempfile.TemporaryDirectory() as root:
+        result_path = os.path.join(root, "build.json")
+        child = multiprocessing.get_context("spawn").Process(
+            target=_build, args=(root, entries, dim, chunk_size, result_path))
+        child.start()
+        child.join()
+        if child.exitcode != 0:
+            raise RuntimeError(f"Index build failed (exit code {child.exitcode})")
+        with open(result_path) as f:
+            build = json.load(f)
+
+        rss_before_load = peak_rss_mb()
+        Settings.embed_model = HashEmbedding(dim=dim)
+        with patch.object(RagConfig, "KB_ROOT_DIR", root), \
+             patch.object(llama_rag_tool, "_SETTINGS_CONFIGURED", True):
+            start = time.perf_counter()
+            index = llama_rag_tool._get_index(KB)
+            load_seconds = time.perf_counter() - start
+
+            retriever = index.as_retriever(similarity_top_k=max(ks))
+            latencies, ranks = [], []
+            for labeled in queries:
+                start = time.perf_counter()
+                nodes = retriever.retrieve(labeled["query"])
+                latencies.append(time.perf_counter() - start)
+                found = ranked_entry_ids(nodes)
+                relevant = set(labeled["relevant"])
+                ranks.append(next((rank for rank, entry_id in enumerate(found, 1) if entry_id in relevant), None))
+                labeled["_found"] = found
+
+    retrieval = {
+        f"recall@{k}": float(np.mean([
+            len(set(q["_found"][:k]) & set(q["relevant"])) / len(q["relevant"]) for q in queries
+        ]))
+        for k in ks
+    }
+    retrieval["mrr"] = float(np.mean([1 / rank if rank else 0.0 for rank in ranks]))
+    retrieval["p50_ms"] = percentile_ms(latencies, 50)
+    retrieval["p99_ms"] = percentile_ms(latencies, 99)
+
+    return {
+        "commit": git_commit(),
+        "config": {
+            "entries": len(entries),
+            "queries": len(queries),
+            "top_k": ks,
+            "embedding": f"hash-{dim}",
+            "chunk_size": chunk_size or Settings.chunk_size,
+            "vector_storage": RagConfig.VECTOR_STORAGE,
+        },
+        "build": build,
+        "index_load_seconds": load_seconds,
+        "retrieval": retrieval,
+        "rss_before_load_mb": rss_before_load,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Retrieval quality/latency benchmark")
+    parser.add_argument("--entries", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--dataset", help="JSON file with labeled entries and queries (instead of synthetic data)")
+    parser.add_argument("--top-k", default="1,5,10", help="Comma-separated k values for recall@k")
+    parser.add_argument("--dim", type=int, default=256, help="HashEmbedding dimensions")
+    parser.add_argument("--chunk-size", type=int, default=0, help="Node parser chunk size (0 = llama_index default)")
+    parser.add_argument("--output", default="retrieval_benchmark.json")
+    args = parser.parse_args()
+
+    if args.dataset:
+        with open(args.dataset) as f:
+            dataset = json.load(f)
+        entries, queries = dataset["entries"], dataset["queries"]
+    else:
+        entries, queries = make_dataset(args.entries, args.queries, args.seed)
+    ks = sorted(int(k) for k in args.top_k.split(","))
+
+    results = run(entries, queries, ks, args.dim, args.chunk_size)
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+
+    r = results["retrieval"]
+    print(" ".join(f"recall@{k} {r[f'recall@{k}']:.3f}" for k in ks) + f" MRR {r['mrr']:.3f}")
+    print(f"p50 {r['p50_ms']:.2f}ms p99 {r['p99_ms']:.2f}ms, index load {results['index_load_seconds']:.2f}s, "
+          f"peak RSS {results['peak_rss_mb']:.0f} MB (build {results['build']['peak_rss_mb']:.0f} MB)")
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
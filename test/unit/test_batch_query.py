@@ -0,0 +1,76 @@
+import io
+import os
+import json
+from unittest.mock import patch
+
+from click.testing import CliRunner
+from llama_index.core import VectorStoreIndex, Settings, Document
+from llama_index.core.embeddings import MockEmbedding
+
+from context_pilot.context_pilot_app.tools import llama_rag_tool
+from context_pilot.main import main
+from context_pilot.scripts.rag_config import RagConfig
+from context_pilot.utils.batch_query import arun_queries, read_queries
+
+
+def test_read_queries_accepts_plain_and_jsonl_lines():
+    lines = ["redis timeout\n", "\n", '{"id": "q2", "query": "boot crash"}\n', "{not json\n"]
+    assert read_queries(lines) == [
+        {"id": 1, "query": "redis timeout"},
+        {"id": "q2", "query": "boot crash"},
+        {"id": 4, "query": "{not json"},
+    ]
+
+
+async def test_results_keep_input_order():
+    original = Settings._embed_model
+    Settings.embed_model = MockEmbedding(embed_dim=8)
+    try:
+        index = VectorStoreIndex.from_documents([
+            Document(text="Redis timeout during login", id_="doc-1"),
+            Document(text="Null pointer on boot", id_="doc-2"),
+        ])
+        queries = [{"id": i, "query": f"query {i}"} for i in range(5)]
+        out = io.StringIO()
+        with patch.object(llama_rag_tool, "_get_index", return_value=index):
+            stats = await arun_queries(queries, out, top_k=1, batch_size=2, workers=2)
+    finally:
+        Settings._embed_model = original
+
+    results = [json.loads(line) for line in out.getvalue().splitlines()]
+    assert [r["id"] for r in results] == list(range(5)) and stats["queries"] == 5
+    assert all(len(r["nodes"]) == 1 and "text" not in r["nodes"][0] for r in results)
+    assert all(r["latency_ms"] >= r["search_ms"] for r in results)
+
+
+def test_query_command_reads_stdin():
+    with patch("context_pilot.utils.batch_query.run_queries", return_value={
+        "queries": 1, "seconds": 0.1, "queries_per_sec": 10.0, "p50_ms": 1.0, "p99_ms": 2.0
+    }) as run:
+        result = CliRunner().invoke(main, ["kb", "query", "--kb", "ops", "-k", "3"], input="login\n")
+    assert result.exit_code == 0, result.output
+    assert run.call_args.args == ("-", "-") and run.call_args.kwargs["top_k"] == 3
+    assert run.call_args.kwargs["knowledge_base"] == "ops"
+
+
+def test_query_command_runs_against_default_kb(tmp_path):
+    """End to end: no initialize_rag_tool call, the default KB resolves to RagConfig.STORAGE_DIR."""
+    original = Settings._embed_model
+    Settings.embed_model = MockEmbedding(embed_dim=8)
+    try:
+        index = VectorStoreIndex.from_documents([Document(text="Redis timeout during login", id_="doc-1")])
+        index.storage_context.persist(persist_dir=str(tmp_path))
+        with open(os.path.join(tmp_path, RagConfig.MANIFEST_FILE), 'w') as f:
+            json.dump({"build_time": "t1", "embedding_dim": RagConfig.EMBEDDING_DIM}, f)
+
+        with patch.object(RagConfig, "STORAGE_DIR", str(tmp_path)), \
+             patch.object(llama_rag_tool, "_STORAGE_DIR", None), \
+             patch.object(llama_rag_tool, "_SETTINGS_CONFIGURED", True), \
+             patch.object(llama_rag_tool, "_INDEX_CACHE", llama_rag_tool.IndexLRUCache(1 << 30)):
+            result = CliRunner().invoke(main, ["kb", "query", "-k", "1"], input="redis timeout\n")
+    finally:
+        Settings._embed_model = original
+
+    assert result.exit_code == 0, result.output
+    record = json.loads(result.stdout.splitlines()[0])
+    assert record["query"] == "redis timeout" and record["nodes"][0]["entry_id"] == "doc-1"
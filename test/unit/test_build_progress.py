@@ -0,0 +1,52 @@
+import json
+from unittest.mock import patch
+
+import pytest
+
+from context_pilot.api_routes import stream_build_progress
+from context_pilot.scripts.build_progress import BuildProgress, read_progress
+from context_pilot.scripts.rag_config import RagConfig
+
+
+@pytest.fixture
+def kb(tmp_path):
+    with patch.object(RagConfig, "KB_ROOT_DIR", str(tmp_path)):
+        yield tmp_path.name
+
+
+def test_progress_file_tracks_phases_and_counters(kb):
+    progress = BuildProgress(kb, "full")
+    with progress.phase_timer("reconstruct", total=3):
+        assert read_progress(kb)["phase"] == "reconstruct"
+        for _ in range(3):
+            progress.advance("reconstruct")
+    progress.finish()
+
+    written = read_progress(kb)
+    assert (written["state"], written["mode"], written["phase"]) == ("done", "full", None)
+    assert written["counters"] == {"reconstruct": 3} and written["totals"] == {"reconstruct": 3}
+    assert written["phases"]["reconstruct"] >= 0
+    assert BuildProgress.disabled().path is None
+
+
+class _Request:
+    """Stays connected for `polls` polls."""
+
+    def __init__(self, polls):
+        self.polls = polls
+
+    async def is_disconnected(self):
+        self.polls -= 1
+        return self.polls < 0
+
+
+async def test_progress_stream_sends_updates(kb):
+    BuildProgress(kb, "incremental").finish()
+    with patch("context_pilot.api_routes.PROGRESS_POLL_SECONDS", 0):
+        response = await stream_build_progress(_Request(polls=3), kb)
+        messages = [chunk async for chunk in response.body_iterator]
+
+    assert response.media_type == "text/event-stream"
+    # Unchanged progress is not sent again
+    assert len(messages) == 1 and messages[0].startswith("data: ")
+    assert json.loads(messages[0][len("data: "):])["state"] == "done"
@@ -0,0 +1,93 @@
+import threading
+from unittest.mock import patch
+
+from context_pilot.scripts.build_worker import BuildWorker, FAILED, SKIPPED, SUCCEEDED
+
+
+class _FakeBuild:
+    def __init__(self):
+        self.calls = []
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def __call__(self, mode, force, kb):
+        self.calls.append((kb, mode, force))
+        self.started.set()
+        self.release.wait(5)
+        if kb == "broken":
+            raise RuntimeError("boom")
+        return kb != "locked"
+
+
+def test_pending_requests_are_coalesced(tmp_path):
+    build = _FakeBuild()
+    worker = BuildWorker(build_fn=build, worker_dir=str(tmp_path))
+    try:
+        running = worker.submit("a", "incremental")
+        assert build.started.wait(5)
+
+        # `running` has started: these queue behind it and collapse into two jobs
+        first = worker.submit("a", "incremental")
+        assert worker.submit("a", "incremental", force=True) is first
+        full = worker.submit("b", "full")
+        assert worker.submit("b", "incremental") is full
+        assert first.requests == 2 and first.force and full.requests == 2
+
+        build.release.set()
+        for job in (running, first, full):
+            assert job.wait(5)
+        assert build.calls == [("a", "incremental", False), ("a", "incremental", True), ("b", "full", False)]
+        assert [job.state for job in (running, first, full)] == [SUCCEEDED] * 3
+        assert worker.get(first.id) is first and worker.jobs()[0] is full
+    finally:
+        build.release.set()
+        worker.close(5)
+
+
+def test_job_states_report_skips_and_failures(tmp_path):
+    build = _FakeBuild()
+    build.release.set()
+    worker = BuildWorker(build_fn=build, worker_dir=str(tmp_path))
+    try:
+        skipped = worker.submit("locked")
+        failed = worker.submit("broken")
+        assert skipped.wait(5) and failed.wait(5)
+        assert skipped.state == SKIPPED
+        assert (failed.state, failed.error) == (FAILED, "boom")
+        assert failed.to_dict()["finished_at"] is not None
+    finally:
+        worker.close(5)
+
+
+def test_second_worker_forwards_to_the_resident_one(tmp_path):
+    build = _FakeBuild()
+    build.release.set()
+    with patch.object(BuildWorker, "POLL_SECONDS", 0.02):
+        resident = BuildWorker(build_fn=build, worker_dir=str(tmp_path))
+        # e.g. the server next to run_auto_index.py: it must not build itself
+        other_build = _FakeBuild()
+        other_build.release.set()
+        other = BuildWorker(build_fn=other_build, worker_dir=str(tmp_path))
+        try:
+            assert resident.owner and not other.owner
+            job = other.submit("a", "full")
+            assert job.wait(5)
+            assert job.state == SUCCEEDED and other.get(job.id) is job
+            assert build.calls == [("a", "full", False)] and other_build.calls == []
+
+            # The other worker takes over once the resident one has stopped
+            resident.close(5)
+            job = other.submit("b")
+            assert job.wait(5) and job.state == SUCCEEDED
+            assert other.owner and other_build.calls == [("b", "incremental", False)]
+
+            # A lock taken over on the worker thread is still released by close()
+            other.close(5)
+            third = BuildWorker(build_fn=_FakeBuild(), worker_dir=str(tmp_path))
+            try:
+                assert third.owner
+            finally:
+                third.close(5)
+        finally:
+            resident.close(5)
+            other.close(5)
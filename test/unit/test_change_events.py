@@ -0,0 +1,72 @@
+import json
+import os
+from unittest.mock import patch
+
+from context_pilot.scripts.build_index import has_pending_changes
+from context_pilot.scripts.rag_config import RagConfig
+from context_pilot.utils.change_events import ChangeWatcher, Debouncer, publish_change
+from context_pilot.utils.db_manager import get_db_manager
+from context_pilot.utils.knowledge_store import save_entry
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_debouncer_waits_for_quiet_but_caps_the_delay():
+    clock = _Clock()
+    debouncer = Debouncer(quiet=2, max_wait=30, clock=clock)
+    assert not debouncer.due()
+
+    debouncer.event()
+    clock.now = 1.5
+    assert not debouncer.due()
+    clock.now = 2.0
+    assert debouncer.due()
+
+    # A steady stream of events still fires after max_wait
+    debouncer.reset()
+    for t in range(0, 40):
+        clock.now = 100 + t
+        debouncer.event()
+        if debouncer.due():
+            break
+    assert clock.now == 130
+
+
+def test_watcher_reports_published_changes(tmp_path):
+    with patch.object(RagConfig, "KB_ROOT_DIR", str(tmp_path)):
+        watcher = ChangeWatcher(["a", "b"])
+        assert watcher.poll(["a", "b"]) == []
+
+        publish_change("b")
+        assert watcher.poll(["a", "b"]) == ["b"]
+        assert watcher.poll(["a", "b"]) == []
+
+        # KBs created after the watcher started are reported on their first event
+        publish_change("c")
+        assert watcher.poll(["a", "b", "c"]) == ["c"]
+
+
+def test_has_pending_changes_compares_log_with_manifest(tmp_path):
+    with patch.object(RagConfig, "KB_ROOT_DIR", str(tmp_path)):
+        kb = tmp_path.name
+        assert has_pending_changes(kb)
+
+        db = get_db_manager(kb)
+        db.init_db()
+        with db.get_connection() as conn:
+            save_entry(conn, {"intent": "A"})
+        storage = RagConfig.kb_storage_dir(kb)
+        os.makedirs(storage)
+        with open(os.path.join(storage, RagConfig.MANIFEST_FILE), "w") as f:
+            json.dump({"change_seq": 1}, f)
+        assert not has_pending_changes(kb)
+
+        with db.get_connection() as conn:
+            save_entry(conn, {"intent": "B"})
+        assert has_pending_changes(kb)
@@ -0,0 +1,183 @@
+import json
+import os
+from unittest.mock import patch
+
+import pytest
+from llama_index.core import Settings
+from llama_index.core.embeddings import MockEmbedding
+
+from context_pilot.scripts import build_index as build_module
+from context_pilot.scripts.build_progress import read_progress
+from context_pilot.scripts.rag_config import RagConfig
+from context_pilot.utils.change_feed import ChangeSet, latest_change_seq, read_changes, truncate_changes
+from context_pilot.utils.db_manager import DBManager, get_db_manager
+from context_pilot.utils.knowledge_store import save_entry
+
+
+def test_triggers_log_changes_and_reads_collapse_them(tmp_path):
+    db = DBManager(db_path=str(tmp_path / "kb.sqlite"))
+    db.init_db()
+    with db.get_connection() as conn:
+        a, _ = save_entry(conn, {"intent": "A"})
+        b, _ = save_entry(conn, {"intent": "B"})
+        save_entry(conn, {"intent": "A2"}, a)
+        conn.execute("DELETE FROM knowledge_entries WHERE id = ?", (b,))
+
+        assert latest_change_seq(conn) == 4
+        changes = read_changes(conn, 0)
+        assert (changes.upserts, changes.deletes, changes.max_seq) == ([a], [b], 4)
+        assert not read_changes(conn, 4)
+
+        assert truncate_changes(conn, 4) == 4
+        # Sequence numbers keep growing after truncation
+        save_entry(conn, {"intent": "C"})
+        assert latest_change_seq(conn) == 5
+
+
+class _CountingEmbedding(MockEmbedding):
+    def _get_text_embeddings(self, texts):
+        _CountingEmbedding.texts.extend(texts)
+        return super()._get_text_embeddings(texts)
+
+
+@pytest.fixture
+def kb(tmp_path):
+    """A named KB under tmp_path, built with mock embeddings."""
+    _CountingEmbedding.texts = []
+    original = Settings._embed_model, Settings._llm
+    name = tmp_path.name
+    with patch.object(RagConfig, "KB_ROOT_DIR", str(tmp_path)), \
+         patch.dict(build_module._MODEL_CACHE, clear=True), \
+         patch.dict(os.environ, {"GOOGLE_API_KEY": "test"}), \
+         patch.object(build_module, "make_embed_model", lambda api_key: _CountingEmbedding(embed_dim=8)):
+        yield name
+    Settings._embed_model, Settings._llm = original
+
+
+def _manifest(kb):
+    with open(os.path.join(RagConfig.kb_storage_dir(kb), RagConfig.MANIFEST_FILE)) as f:
+        return json.load(f)
+
+
+def _indexed_ids(kb):
+    with open(os.path.join(RagConfig.kb_storage_dir(kb), "docstore.json")) as f:
+        return set(json.load(f)["docstore/ref_doc_info"].keys())
+
+
+def test_incremental_build_applies_only_logged_changes(kb):
+    db = get_db_manager(kb)
+    db.init_db()
+    with db.get_connection() as conn:
+        ids = [save_entry(conn, {"intent": f"Entry {i}", "root_cause": "rc"})[0] for i in range(3)]
+
+    build_module.build_index(mode="full", kb=kb)
+    assert _manifest(kb)["change_seq"] == 3
+    assert _indexed_ids(kb) == set(ids)
+    with db.get_connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM kb_changes").fetchone()[0] == 0
+
+    with db.get_connection() as conn:
+        save_entry(conn, {"intent": "Entry 0 (edited)", "root_cause": "rc"}, ids[0])
+        conn.execute("DELETE FROM knowledge_entries WHERE id = ?", (ids[1],))
+        new_id, _ = save_entry(conn, {"intent": "Entry 3", "root_cause": "rc"})
+
+    _CountingEmbedding.texts = []
+    build_module.build_index(mode="incremental", kb=kb)
+    # Only the edited and the new entry were embedded
+    assert len(_CountingEmbedding.texts) == 2
+    assert _indexed_ids(kb) == {ids[0], ids[2], new_id}
+    manifest = _manifest(kb)
+    assert (manifest["change_seq"], manifest["doc_count"]) == (6, 3)
+    stats = manifest["build_stats"]
+    assert stats["counters"]["chunks_embedded"] == 2
+    assert {"db_load", "reconstruct", "index_load", "embedding", "vector_insert", "persist"} <= set(stats["phases"])
+
+    # Nothing logged since: the build exits without touching the index
+    build_module.build_index(mode="incremental", kb=kb)
+    assert _manifest(kb)["build_time"] == manifest["build_time"]
+    assert read_progress(kb)["state"] == "up_to_date"
+
+
+def test_build_leaves_global_settings_alone(kb):
+    served = MockEmbedding(embed_dim=8)
+    Settings.embed_model = served
+    db = get_db_manager(kb)
+    db.init_db()
+    with db.get_connection() as conn:
+        for i in range(3):
+            save_entry(conn, {"intent": f"Entry {i}", "root_cause": "rc"})
+
+    def embed_and_serve_a_query(self, texts):
+        # A query embedded by the retrieval tool while the build runs
+        served.get_text_embedding_batch(["query"])
+        return MockEmbedding._get_text_embeddings(self, texts)
+
+    with patch.object(_CountingEmbedding, "_get_text_embeddings", embed_and_serve_a_query):
+        build_module.build_index(mode="full", kb=kb)
+
+    assert Settings.embed_model is served
+    # Only the build's own embeddings are counted in its progress
+    assert _manifest(kb)["build_stats"]["counters"]["chunks_embedded"] == 3
+
+
+def _fake_index(vectors):
+    from types import SimpleNamespace
+    return SimpleNamespace(vector_store=SimpleNamespace(data=SimpleNamespace(
+        embedding_dict=dict(vectors), text_id_to_ref_doc_id={entry_id: entry_id for entry_id in vectors},
+    )))
+
+
+def _neighbors(db):
+    with db.get_connection() as conn:
+        rows = conn.execute("SELECT entry_id, rank, neighbor_id, score FROM knowledge_neighbors").fetchall()
+    return {(r["entry_id"], r["rank"]): (r["neighbor_id"], r["score"]) for r in rows}
+
+
+def test_incremental_neighbor_update_leaves_unrelated_rows_untouched(tmp_path):
+    db = DBManager(db_path=str(tmp_path / "kb.sqlite"))
+    db.init_db()
+    # Two clusters that never appear in each other's top 2
+    vectors = {
+        "a1": [1.0, 0.1, 0.0], "a2": [1.0, 0.2, 0.0], "a3": [1.0, 0.3, 0.0],
+        "b1": [0.0, 0.1, 1.0], "b2": [0.0, 0.2, 1.0], "b3": [0.0, 0.3, 1.0],
+    }
+    with patch.object(RagConfig, "RELATED_TOP_N", 2):
+        build_module.update_neighbor_table(_fake_index(vectors), db)
+        # A marker a recomputation of b1's row would overwrite (above the real score,
+        # so it cannot make the row look beaten)
+        with db.get_connection() as conn:
+            conn.execute("UPDATE knowledge_neighbors SET score = 0.99 WHERE entry_id = 'b1' AND rank = 1")
+
+        vectors["a1"] = [1.0, 0.25, 0.0]
+        del vectors["a3"]
+        vectors["a4"] = [1.0, 0.22, 0.0]
+        changes = ChangeSet(upserts=["a1", "a4"], deletes=["a3"])
+        build_module.update_neighbor_table(_fake_index(vectors), db, changes)
+        incremental = _neighbors(db)
+
+        build_module.update_neighbor_table(_fake_index(vectors), db)
+        full = _neighbors(db)
+
+    assert incremental[("b1", 1)][1] == pytest.approx(0.99)
+    assert not any(entry_id == "a3" or neighbor_id == "a3"
+                   for (entry_id, _), (neighbor_id, _) in incremental.items())
+    # Apart from the marker, the affected rows match a full recomputation
+    incremental[("b1", 1)] = full[("b1", 1)]
+    assert incremental.keys() == full.keys()
+    assert all(incremental[key][0] == full[key][0] for key in full)
+
+
+def test_build_writes_through_the_single_writer(kb):
+    db = get_db_manager(kb)
+    db.init_db()
+    with db.get_connection() as conn:
+        for i in range(3):
+            save_entry(conn, {"intent": f"Entry {i}", "root_cause": "rc"})
+
+    submit = db.writer.submit
+    with patch.object(db.writer, "submit", side_effect=submit) as queued:
+        build_module.build_index(mode="full", kb=kb)
+    assert [call.args[0] for call in queued.call_args_list] == [build_module._write_neighbors, truncate_changes]
+    with db.get_connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM knowledge_neighbors").fetchone()[0] == 6
+        assert conn.execute("SELECT COUNT(*) FROM kb_changes").fetchone()[0] == 0
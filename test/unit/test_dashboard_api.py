@@ -0,0 +1,123 @@
+import os
+from unittest.mock import patch
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from context_pilot import api_routes
+from context_pilot.scripts.rag_config import RagConfig
+from context_pilot.utils.db_manager import get_db_manager
+from context_pilot.utils.knowledge_store import save_entry
+
+
+@pytest.fixture
+def client(tmp_path):
+    app = FastAPI()
+    app.include_router(api_routes.router)
+    with patch.object(RagConfig, "KB_ROOT_DIR", str(tmp_path)), \
+         patch.object(RagConfig, "STORAGE_DIR", str(tmp_path / "default_storage")):
+        yield TestClient(app), tmp_path.name
+
+
+def _seed(kb, n):
+    db = get_db_manager(kb)
+    db.init_db()
+    with db.get_connection() as conn:
+        for i in range(n):
+            save_entry(conn, {"intent": f"Entry {i}", "tags": "even" if i % 2 == 0 else "odd"},
+                       now=f"2024-01-01T00:00:{i:02d}")
+    return db
+
+
+def test_entries_are_paginated_by_keyset(client):
+    client, kb = client
+    _seed(kb, 7)
+
+    intents, cursor = [], None
+    while True:
+        params = {"kb": kb, "limit": 3, **({"cursor": cursor} if cursor else {})}
+        body = client.get("/admin/api/entries", params=params).json()
+        intents += [e["intent"] for e in body["entries"]]
+        cursor = body["next_cursor"]
+        if cursor is None:
+            break
+    assert intents == [f"Entry {i}" for i in range(6, -1, -1)]
+
+    body = client.get("/admin/api/entries", params={"kb": kb, "tag": "even", "limit": 2}).json()
+    assert [e["intent"] for e in body["entries"]] == ["Entry 6", "Entry 4"]
+    assert client.get("/admin/api/entries", params={"kb": kb, "cursor": "!!"}).json()["status"] == "error"
+    # The page itself is static and loads everything from these endpoints
+    assert "/admin/api/entries" in client.get("/dashboard").text
+
+
+def test_stats_are_cached_and_revalidated_with_etags(client):
+    client, kb = client
+    db = _seed(kb, 2)
+
+    first = client.get("/admin/api/stats", params={"kb": kb})
+    assert first.json()["stats"]["total_count"] == 2
+    etag = first.headers["etag"]
+    assert client.get("/admin/api/stats", params={"kb": kb}, headers={"If-None-Match": etag}).status_code == 304
+
+    # A write changes the version: new ETag and a fresh count
+    with db.get_connection() as conn:
+        save_entry(conn, {"intent": "New"})
+    second = client.get("/admin/api/stats", params={"kb": kb}, headers={"If-None-Match": etag})
+    assert second.status_code == 200 and second.headers["etag"] != etag
+    assert second.json()["stats"]["total_count"] == 3
+
+
+def test_keyset_pages_use_the_created_at_index(client):
+    _, kb = client
+    db = _seed(kb, 1)
+    with db.get_connection() as conn:
+        plan = " ".join(r[3] for r in conn.execute(
+            "EXPLAIN QUERY PLAN SELECT e.id FROM knowledge_entries e WHERE (e.created_at, e.id) < (?, ?) "
+            "ORDER BY e.created_at DESC, e.id DESC LIMIT 50", ("2024", "x")
+        ))
+    assert "idx_knowledge_entries_created_at" in plan and "TEMP B-TREE" not in plan
+
+
+def test_search_returns_highlighted_pages(client):
+    client, kb = client
+    db = _seed(kb, 5)
+    with db.get_connection() as conn:
+        save_entry(conn, {"intent": "<b>Redis</b> timeout", "root_cause": "pool"})
+
+    body = client.get("/admin/api/entries/search", params={"kb": kb, "q": "Entry", "limit": 3}).json()
+    assert len(body["results"]) == 3 and body["has_more"]
+    body = client.get("/admin/api/entries/search", params={"kb": kb, "q": "Entry", "limit": 3, "page": 2}).json()
+    assert len(body["results"]) == 2 and not body["has_more"]
+
+    result = client.get("/admin/api/entries/search", params={"kb": kb, "q": "redis"}).json()["results"][0]
+    assert result["snippet_html"] == "&lt;b&gt;<mark>Redis</mark>&lt;/b&gt; timeout"
+
+
+def test_facets_endpoint(client):
+    client, kb = client
+    _seed(kb, 3)
+    response = client.get("/admin/api/facets", params={"kb": kb})
+    assert response.json()["tags"] == [{"tag": "even", "count": 2}, {"tag": "odd", "count": 1}]
+    assert response.json()["contributors"] == [{"contributor": "", "count": 3}]
+    assert client.get("/admin/api/facets", params={"kb": kb},
+                      headers={"If-None-Match": response.headers["etag"]}).status_code == 304
+
+
+@pytest.mark.parametrize("path, params", [
+    ("/admin/api/stats", {}), ("/admin/api/facets", {}), ("/admin/api/entries", {}),
+    ("/admin/api/build_progress", {}), ("/admin/api/entries/search", {"q": "redis"}),
+    ("/admin/api/search", {"q": "redis"}),
+])
+def test_unknown_or_invalid_kb_is_rejected_without_creating_it(client, path, params):
+    client, kb = client
+    _seed(kb, 1)
+
+    response = client.get(path, params={**params, "kb": "missing"})
+    assert response.status_code == 404 and response.json()["status"] == "error"
+    assert not os.path.exists(os.path.join(RagConfig.KB_ROOT_DIR, "missing"))
+
+    response = client.get(path, params={**params, "kb": "../etc"})
+    assert response.status_code == 400 and "Invalid knowledge base name" in response.json()["message"]
+
+    assert client.get(path, params={**params, "kb": kb}).status_code != 404
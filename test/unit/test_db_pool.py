@@ -0,0 +1,121 @@
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from context_pilot.utils.db_manager import DBManager
+
+
+def test_connection_reused_per_thread_with_pragmas(tmp_path):
+    db = DBManager(db_path=str(tmp_path / "pool.sqlite"))
+    with db.get_connection() as first:
+        assert first.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        assert first.execute("PRAGMA synchronous").fetchone()[0] == 1  # NORMAL
+        assert first.execute("PRAGMA busy_timeout").fetchone()[0] == DBManager.BUSY_TIMEOUT_MS
+    with db.get_connection() as second:
+        assert second is first
+
+    other = []
+    thread = threading.Thread(target=lambda: other.append(db.get_connection().__enter__()))
+    thread.start()
+    thread.join()
+    assert other[0] is not first
+
+
+def test_nested_use_commits_once_at_outermost_block(tmp_path):
+    db = DBManager(db_path=str(tmp_path / "pool.sqlite"))
+    with db.get_connection() as conn:
+        conn.execute("CREATE TABLE t (x INTEGER)")
+    try:
+        with db.get_connection() as outer:
+            outer.execute("INSERT INTO t VALUES (1)")
+            with db.get_connection() as inner:
+                assert inner is outer
+                inner.execute("INSERT INTO t VALUES (2)")
+            raise RuntimeError("boom")
+    except RuntimeError:
+        pass
+    with db.get_connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM t").fetchone()[0] == 0
+
+
+def test_changing_db_path_reopens_connections(tmp_path):
+    db = DBManager(db_path=str(tmp_path / "a.sqlite"))
+    with db.get_connection() as conn_a:
+        conn_a.execute("CREATE TABLE only_in_a (x INTEGER)")
+    db.db_path = str(tmp_path / "b.sqlite")
+    with db.get_connection() as conn_b:
+        assert conn_b is not conn_a
+        assert conn_b.execute("SELECT name FROM sqlite_master WHERE name='only_in_a'").fetchone() is None
+
+
+def test_pool_is_bounded_and_reuses_connections(tmp_path):
+    db = DBManager(db_path=str(tmp_path / "pool.sqlite"), pool_size=2)
+    with db.pooled_connection() as c1:
+        pass
+    with db.pooled_connection() as c2:
+        assert c2 is c1
+
+    active = []
+    peak = []
+    lock = threading.Lock()
+
+    def worker():
+        with db.pooled_connection():
+            with lock:
+                active.append(1)
+                peak.append(len(active))
+            time.sleep(0.05)
+            with lock:
+                active.pop()
+
+    threads = [threading.Thread(target=worker) for _ in range(6)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert max(peak) <= 2
+
+
+def test_idle_connections_are_closed(tmp_path):
+    db = DBManager(db_path=str(tmp_path / "pool.sqlite"), idle_timeout=0)
+    with db.pooled_connection() as pooled:
+        pass
+    with db.get_connection() as conn:
+        pass
+    assert pooled not in [s.conn for s in db._slots]
+    # The thread's connection was reaped too and is transparently replaced
+    with db.get_connection() as fresh:
+        assert fresh is not conn
+        fresh.execute("SELECT 1")
+
+
+async def test_run_executes_on_db_thread_with_migrated_schema(tmp_path):
+    db = DBManager(db_path=str(tmp_path / "pool.sqlite"))
+
+    def work(conn, value):
+        conn.execute("INSERT INTO knowledge_neighbors (entry_id, neighbor_id, rank, score) VALUES (?, 'b', 0, 1.0)", (value,))
+        return threading.current_thread().name
+
+    thread_name = await db.run(work, "a")
+    assert thread_name.startswith("kb-db")
+    assert await db.run(lambda conn: conn.execute("SELECT entry_id FROM knowledge_neighbors").fetchone()[0]) == "a"
+
+
+def test_idle_connections_are_closed_without_further_activity(tmp_path):
+    db = DBManager(db_path=str(tmp_path / "pool.sqlite"), idle_timeout=0.2)
+    with db.pooled_connection() as pooled:
+        pass
+    with db.get_connection() as conn:
+        pass
+    assert len(db._slots) == 2
+
+    # No later acquire or release: the timer closes them
+    deadline = time.monotonic() + 5
+    while db._slots and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert db._slots == []
+    for closed in (pooled, conn):
+        with pytest.raises(sqlite3.ProgrammingError):
+            closed.execute("SELECT 1")
@@ -0,0 +1,100 @@
+import sqlite3
+import threading
+
+import pytest
+
+from context_pilot.utils.db_manager import DBManager
+from context_pilot.utils.db_writer import DBWriter
+
+
+def _insert(conn, entry_id):
+    conn.execute("INSERT INTO knowledge_entries (id, intent) VALUES (?, 'x')", (entry_id,))
+    return entry_id
+
+
+def _count(db):
+    with db.get_connection() as conn:
+        return conn.execute("SELECT COUNT(*) FROM knowledge_entries").fetchone()[0]
+
+
+@pytest.fixture
+def db(tmp_path):
+    return DBManager(db_path=str(tmp_path / "kb.sqlite"))
+
+
+def test_queued_writes_are_grouped_into_batches(db):
+    writer = DBWriter(db, max_batch=100, batch_wait_ms=50)
+    batch_sizes = []
+    run_batch = writer._run_batch
+    writer._run_batch = lambda batch: (batch_sizes.append(len(batch)), run_batch(batch))
+
+    # Hold the writer on a first job so the others queue up behind it
+    release = threading.Event()
+    blocker = writer.submit(lambda conn: release.wait(5))
+    futures = [writer.submit(_insert, f"e{i}") for i in range(20)]
+    release.set()
+
+    assert [f.result(5) for f in futures] == [f"e{i}" for i in range(20)]
+    assert blocker.result(5) is True
+    assert _count(db) == 20
+    assert len(batch_sizes) < 21
+    writer.close()
+
+
+def test_failing_job_is_rolled_back_alone(db):
+    writer = DBWriter(db, batch_wait_ms=50)
+    ok = writer.submit(_insert, "a")
+    duplicate = writer.submit(_insert, "a")
+    other = writer.submit(_insert, "b")
+
+    assert ok.result(5) == "a"
+    assert other.result(5) == "b"
+    with pytest.raises(Exception, match="UNIQUE"):
+        duplicate.result(5)
+    assert _count(db) == 2
+    writer.close()
+
+
+async def test_async_write_is_acknowledged_after_commit(db):
+    assert await db.write(_insert, "async-1") == "async-1"
+    # Visible to a different connection right away
+    assert _count(db) == 1
+
+
+class _FailingRollback:
+    """Connection wrapper whose ROLLBACK TO SAVEPOINT fails (e.g. an I/O error)."""
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def execute(self, sql, *args):
+        if sql.startswith("ROLLBACK TO"):
+            raise sqlite3.OperationalError("disk I/O error")
+        return self._conn.execute(sql, *args)
+
+
+def test_failed_rollback_fails_the_batch_and_keeps_the_writer_alive(db):
+    writer = DBWriter(db, max_batch=100, batch_wait_ms=50)
+    connection = writer._connection
+    failing = {"on": True}
+    writer._connection = lambda: _FailingRollback(connection()) if failing["on"] else connection()
+
+    release = threading.Event()
+    blocker = writer.submit(lambda conn: release.wait(5))
+    ok = writer.submit(_insert, "a")
+    duplicate = writer.submit(_insert, "a")
+    later = writer.submit(_insert, "b")
+    release.set()
+
+    with pytest.raises(sqlite3.IntegrityError):
+        duplicate.result(5)
+    # Nothing of the batch was committed, so nobody is told it was
+    for future in (blocker, ok, later):
+        with pytest.raises(sqlite3.OperationalError, match="disk I/O"):
+            future.result(5)
+    assert _count(db) == 0
+
+    failing["on"] = False
+    assert writer.submit(_insert, "c").result(5) == "c"
+    assert _count(db) == 1
+    writer.close()
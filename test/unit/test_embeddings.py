@@ -0,0 +1,48 @@
+import numpy as np
+from unittest.mock import patch
+
+from llama_index.core.embeddings import MockEmbedding
+from llama_index.embeddings.gemini import GeminiEmbedding
+
+from context_pilot.scripts.rag_config import RagConfig
+from context_pilot.scripts.embeddings import (
+    TruncatedEmbedding, ReducedGeminiEmbedding, _OutputDimensionality, make_embed_model
+)
+
+
+def test_truncated_embedding_is_unit_length():
+    model = TruncatedEmbedding(MockEmbedding(embed_dim=8), dim=3)
+    vector = model.get_query_embedding("hello")
+    assert len(vector) == 3
+    assert np.isclose(np.linalg.norm(vector), 1.0)
+    assert [len(v) for v in model.get_text_embedding_batch(["a", "b"])] == [3, 3]
+
+
+async def test_truncated_embedding_async():
+    model = TruncatedEmbedding(MockEmbedding(embed_dim=8), dim=5)
+    assert len(await model.aget_query_embedding("hello")) == 5
+
+
+def test_output_dimensionality_is_forwarded():
+    class FakeGenai:
+        def embed_content(self, **kwargs):
+            return kwargs
+
+    proxy = _OutputDimensionality(FakeGenai(), 256)
+    assert proxy.embed_content(model="m", content="x")["output_dimensionality"] == 256
+
+
+def test_make_embed_model_modes():
+    with patch.object(RagConfig, "EMBEDDING_DIM", 0):
+        model = make_embed_model("fake-key")
+        assert isinstance(model, GeminiEmbedding) and not isinstance(model, ReducedGeminiEmbedding)
+
+    with patch.multiple(RagConfig, EMBEDDING_DIM=768, EMBEDDING_DIM_MODE="request"):
+        model = make_embed_model("fake-key")
+        assert isinstance(model, TruncatedEmbedding)
+        assert isinstance(model._inner, ReducedGeminiEmbedding)
+
+    with patch.multiple(RagConfig, EMBEDDING_DIM=768, EMBEDDING_DIM_MODE="truncate"):
+        model = make_embed_model("fake-key")
+        assert isinstance(model, TruncatedEmbedding)
+        assert not isinstance(model._inner, ReducedGeminiEmbedding)
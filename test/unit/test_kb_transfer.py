@@ -0,0 +1,202 @@
+import json
+
+import pytest
+from click.testing import CliRunner
+
+from context_pilot.main import main
+from context_pilot.utils.db_manager import DBManager
+from context_pilot.utils.kb_transfer import export_jsonl, import_jsonl
+
+
+def _write_jsonl(path, records):
+    with open(path, "w") as f:
+        for record in records:
+            f.write((record if isinstance(record, str) else json.dumps(record)) + "\n")
+
+
+def test_import_export_round_trip(tmp_path):
+    src, out = tmp_path / "in.jsonl", tmp_path / "out.jsonl"
+    _write_jsonl(src, [
+        {"id": "a", "intent": "Redis timeout", "tags": "Redis, Timeout"},
+        "not json",
+        "",
+        {"intent": "No id given"},
+    ])
+    db = DBManager(db_path=str(tmp_path / "kb.sqlite"))
+
+    stats = import_jsonl(db, str(src), batch_size=2)
+    assert (stats["rows"], stats["skipped"], stats["next_offset"]) == (2, 2, 4)
+    with db.get_connection() as conn:
+        tags = [r[0] for r in conn.execute("SELECT tag FROM entry_tags WHERE entry_id = 'a' ORDER BY tag")]
+    assert tags == ["redis", "timeout"]
+
+    assert export_jsonl(db, str(out))["rows"] == 2
+    exported = [json.loads(line) for line in out.read_text().splitlines()]
+    assert exported[0]["id"] == "a" and exported[0]["created_at"]
+    assert exported[1]["intent"] == "No id given" and exported[1]["id"]
+
+
+def test_import_resumes_from_offset_and_updates_existing(tmp_path):
+    src = tmp_path / "in.jsonl"
+    _write_jsonl(src, [{"id": f"e{i}", "intent": f"v1-{i}"} for i in range(5)])
+    db = DBManager(db_path=str(tmp_path / "kb.sqlite"))
+    import_jsonl(db, str(src))
+
+    _write_jsonl(src, [{"id": f"e{i}", "intent": f"v2-{i}"} for i in range(5)])
+    assert import_jsonl(db, str(src), offset=3)["rows"] == 2
+    with db.get_connection() as conn:
+        intents = [r[0] for r in conn.execute("SELECT intent FROM knowledge_entries ORDER BY id")]
+    assert intents == ["v1-0", "v1-1", "v1-2", "v2-3", "v2-4"]
+
+
+def test_kb_cli_commands(tmp_path, monkeypatch):
+    from context_pilot.scripts.rag_config import RagConfig
+    monkeypatch.setattr(RagConfig, "KB_ROOT_DIR", str(tmp_path / "kbs"))
+    src, out = tmp_path / "in.jsonl", tmp_path / "out.jsonl"
+    _write_jsonl(src, [{"id": f"e{i}", "intent": "x"} for i in range(3)])
+
+    runner = CliRunner()
+    result = runner.invoke(main, ["kb", "import", str(src), "--kb", "cli"])
+    assert result.exit_code == 0, result.output
+    assert "rows/s" in result.output
+
+    result = runner.invoke(main, ["kb", "export", str(out), "--kb", "cli", "--offset", "1"])
+    assert result.exit_code == 0, result.output
+    assert [json.loads(line)["id"] for line in out.read_text().splitlines()] == ["e1", "e2"]
+
+
+def _band_count(db):
+    with db.get_connection() as conn:
+        return conn.execute("SELECT COUNT(*) FROM entry_minhash_bands").fetchone()[0]
+
+
+def test_import_keeps_minhash_bands_consistent(tmp_path):
+    from context_pilot.utils import minhash
+    from context_pilot.utils.knowledge_store import entry_signature, find_near_duplicate, minhash_bands_complete
+
+    src = tmp_path / "in.jsonl"
+    records = [{"id": f"e{i}", "intent": f"Redis timeout number {i}", "root_cause": "pool exhausted"} for i in range(6)]
+    _write_jsonl(src, records)
+    db = DBManager(db_path=str(tmp_path / "kb.sqlite"))
+
+    # Empty KB: bands are derived in one pass after the last batch
+    import_jsonl(db, str(src), batch_size=4)
+    assert _band_count(db) == 6 * minhash.BANDS
+    with db.get_connection() as conn:
+        assert find_near_duplicate(conn, entry_signature(records[2]), 0.99)[0] == "e2"
+
+    # Non-empty KB: changed entries move their bands batch by batch
+    _write_jsonl(src, [{"id": "e2", "intent": "Kafka consumer lag", "root_cause": "slow handler"}])
+    import_jsonl(db, str(src))
+    with db.get_connection() as conn:
+        assert minhash_bands_complete(conn)
+        assert find_near_duplicate(conn, entry_signature(records[2]), 0.99, exclude_id="e1") is None
+
+        # An interrupted bulk load leaves bands missing; the next import repairs them
+        conn.execute("DELETE FROM entry_minhash_bands WHERE entry_id = 'e5'")
+    import_jsonl(db, str(src))
+    assert _band_count(db) == 6 * minhash.BANDS
+
+
+def test_import_writes_through_the_single_writer(tmp_path):
+    from unittest.mock import patch
+
+    src = tmp_path / "in.jsonl"
+    _write_jsonl(src, [{"id": f"e{i}", "intent": f"Entry {i}"} for i in range(5)])
+    db = DBManager(db_path=str(tmp_path / "kb.sqlite"))
+
+    submit = db.writer.submit
+    with patch.object(db.writer, "submit", side_effect=submit) as queued:
+        import_jsonl(db, str(src), batch_size=2)
+    # Three batches, between suspending the triggers of a bulk load and its final rebuild
+    assert queued.call_count == 5
+    with db.get_connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM knowledge_entries").fetchone()[0] == 5
+
+
+def _search_state(db):
+    from context_pilot.utils.knowledge_store import BULK_LOAD_TRIGGERS, contributor_facets, search_entries, tag_facets
+    with db.get_connection() as conn:
+        triggers = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'")}
+        return {
+            "triggers": set(BULK_LOAD_TRIGGERS) <= triggers,
+            "suspended": conn.execute("SELECT COUNT(*) FROM kb_suspended_triggers").fetchone()[0],
+            "hits": sorted(r["id"] for r in search_entries(conn, "timeout")),
+            "tags": {r["tag"]: r["entry_count"] for r in tag_facets(conn)},
+            "contributors": {r["contributor"]: r["entry_count"] for r in contributor_facets(conn)},
+        }
+
+
+def test_bulk_import_derives_search_index_and_facets_once(tmp_path):
+    src = tmp_path / "in.jsonl"
+    _write_jsonl(src, [
+        {"id": f"e{i}", "intent": f"Redis timeout {i}", "tags": "redis", "contributor": "ann"} for i in range(3)
+    ] + [{"id": "k", "intent": "Kafka lag", "tags": "kafka, redis"}])
+    db = DBManager(db_path=str(tmp_path / "kb.sqlite"))
+
+    import_jsonl(db, str(src), batch_size=2)
+    assert _search_state(db) == {
+        "triggers": True, "suspended": 0, "hits": ["e0", "e1", "e2"],
+        "tags": {"redis": 4, "kafka": 1}, "contributors": {"ann": 3, "": 1},
+    }
+
+    # A later (non-bulk) import goes through the restored triggers
+    _write_jsonl(src, [{"id": "k", "intent": "Kafka timeout", "tags": "kafka"}])
+    import_jsonl(db, str(src))
+    state = _search_state(db)
+    assert state["hits"] == ["e0", "e1", "e2", "k"] and state["tags"] == {"redis": 3, "kafka": 1}
+
+
+def test_failed_bulk_import_restores_triggers(tmp_path):
+    from unittest.mock import patch
+    from context_pilot.utils import kb_transfer
+
+    src = tmp_path / "in.jsonl"
+    _write_jsonl(src, [{"id": f"e{i}", "intent": f"Redis timeout {i}"} for i in range(4)])
+    db = DBManager(db_path=str(tmp_path / "kb.sqlite"))
+    write_batch = kb_transfer._write_batch
+    calls = []
+
+    def fail_second_batch(conn, rows, bands):
+        calls.append(rows)
+        if len(calls) == 2:
+            raise RuntimeError("disk full")
+        write_batch(conn, rows, bands)
+
+    with patch.object(kb_transfer, "_write_batch", fail_second_batch), pytest.raises(RuntimeError):
+        import_jsonl(db, str(src), batch_size=2)
+    state = _search_state(db)
+    assert state["triggers"] and state["suspended"] == 0 and state["hits"] == ["e0", "e1"]
+
+
+def test_init_db_restores_triggers_of_a_killed_bulk_import(tmp_path):
+    from context_pilot.utils.knowledge_store import suspend_bulk_load_triggers
+
+    db = DBManager(db_path=str(tmp_path / "kb.sqlite"))
+    db.init_db()
+    with db.get_connection() as conn:
+        suspend_bulk_load_triggers(conn)
+        conn.execute("INSERT INTO knowledge_entries (id, intent, tags) VALUES ('a', 'Redis timeout', 'redis')")
+        conn.execute("INSERT INTO entry_tags (entry_id, tag) VALUES ('a', 'redis')")
+
+    # e.g. the next process to open the KB
+    restarted = DBManager(db_path=str(tmp_path / "kb.sqlite"))
+    restarted.init_db()
+    state = _search_state(restarted)
+    assert state["triggers"] and state["suspended"] == 0
+    assert (state["hits"], state["tags"]) == (["a"], {"redis": 1})
+
+
+def test_reimporting_unchanged_entries_writes_nothing(tmp_path):
+    src = tmp_path / "in.jsonl"
+    _write_jsonl(src, [{"id": f"e{i}", "intent": f"Entry {i}", "tags": "a, b"} for i in range(3)])
+    db = DBManager(db_path=str(tmp_path / "kb.sqlite"))
+    import_jsonl(db, str(src))
+    export_jsonl(db, str(tmp_path / "out.jsonl"))
+    with db.get_connection() as conn:
+        conn.execute("DELETE FROM kb_changes")
+
+    import_jsonl(db, str(tmp_path / "out.jsonl"))
+    with db.get_connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM kb_changes").fetchone()[0] == 0
+    assert _search_state(db)["tags"] == {"a": 3, "b": 3}
@@ -0,0 +1,97 @@
+import os
+import pytest
+from unittest.mock import patch
+
+from context_pilot.scripts.rag_config import RagConfig
+from context_pilot.utils.db_manager import get_db_manager, default_db_manager
+from context_pilot.context_pilot_app.tools.llama_rag_tool import IndexLRUCache
+
+
+def test_kb_paths(tmp_path):
+    with patch.multiple(RagConfig, KB_ROOT_DIR=str(tmp_path), STORAGE_DIR="/default/rag_storage"):
+        assert RagConfig.kb_storage_dir() == "/default/rag_storage"
+        assert RagConfig.kb_storage_dir("default") == "/default/rag_storage"
+        assert RagConfig.kb_storage_dir("billing") == os.path.join(str(tmp_path), "billing", "rag_storage")
+        assert RagConfig.kb_db_path("billing") == os.path.join(str(tmp_path), "billing", RagConfig.DB_FILENAME)
+
+        os.makedirs(tmp_path / "billing")
+        assert RagConfig.list_knowledge_bases() == ["default", "billing"]
+
+
+@pytest.mark.parametrize("name", ["../etc", "a/b", "with space", "."])
+def test_kb_name_rejects_paths(name):
+    with pytest.raises(ValueError):
+        RagConfig.kb_storage_dir(name)
+
+
+def test_get_db_manager_per_kb(tmp_path):
+    with patch.object(RagConfig, "KB_ROOT_DIR", str(tmp_path)):
+        assert get_db_manager() is default_db_manager
+        billing = get_db_manager("billing_test")
+        assert billing is get_db_manager("billing_test")
+        assert billing.db_path == RagConfig.kb_db_path("billing_test")
+
+
+def test_index_lru_evicts_least_recently_used():
+    cache = IndexLRUCache(budget_bytes=100)
+    cache.put("a", "index-a", "t1", 40)
+    cache.put("b", "index-b", "t1", 40)
+    assert cache.get("a")["index"] == "index-a"  # "a" becomes most recent
+
+    cache.put("c", "index-c", "t1", 40)
+    assert cache.keys() == ["a", "c"]
+    assert cache.total_bytes() == 80
+
+
+def test_index_lru_keeps_single_oversized_index():
+    cache = IndexLRUCache(budget_bytes=10)
+    cache.put("a", "index-a", "t1", 50)
+    assert cache.keys() == ["a"]
+    cache.put("b", "index-b", "t1", 50)
+    assert cache.keys() == ["b"]
+
+
+def test_slow_index_load_does_not_block_other_kbs(tmp_path):
+    import json
+    import threading
+    from context_pilot.context_pilot_app.tools import llama_rag_tool
+
+    started, release = threading.Event(), threading.Event()
+
+    def slow_load(kb):
+        started.set()
+        assert release.wait(5)
+        return f"index-{kb}"
+
+    with patch.object(RagConfig, "KB_ROOT_DIR", str(tmp_path)), \
+         patch.object(llama_rag_tool, "_INDEX_CACHE", IndexLRUCache(1 << 30)), \
+         patch.object(llama_rag_tool, "_load_index", side_effect=slow_load):
+        for kb in ("a", "b"):
+            os.makedirs(RagConfig.kb_storage_dir(kb))
+            with open(os.path.join(RagConfig.kb_storage_dir(kb), RagConfig.MANIFEST_FILE), "w") as f:
+                json.dump({"build_time": "t1"}, f)
+        llama_rag_tool._INDEX_CACHE.put("b", "index-b", "t1", 1)
+
+        loading = threading.Thread(target=llama_rag_tool._get_index, args=("a",))
+        loading.start()
+        try:
+            assert started.wait(5)
+            # Served from the cache while "a" is still loading
+            assert llama_rag_tool._get_index("b") == "index-b"
+        finally:
+            release.set()
+            loading.join(5)
+
+
+def test_index_size_counts_vectors_as_python_floats(tmp_path):
+    from types import SimpleNamespace
+    from context_pilot.context_pilot_app.tools import llama_rag_tool
+
+    (tmp_path / "docstore.json").write_text("x" * 1000)
+    # Persisted as JSON the vectors would be far smaller than in memory
+    (tmp_path / "default__vector_store.json").write_text("x" * 10)
+    index = SimpleNamespace(vector_store=SimpleNamespace(data=SimpleNamespace(
+        embedding_dict={f"n{i}": [0.5] * 768 for i in range(10)}
+    )))
+    size = llama_rag_tool._estimate_index_bytes(str(tmp_path), index)
+    assert size == 1000 * llama_rag_tool._DOCSTORE_EXPANSION + 10 * 768 * llama_rag_tool._FLOAT_BYTES
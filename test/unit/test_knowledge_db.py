@@ -55,13 +55,15 @@ def test_db():
     
     yield db
     
-    # Cleanup
-    if os.path.exists(TEST_DB_PATH):
-        try:
-            os.remove(TEST_DB_PATH)
-        except:
-            pass
+    # Cleanup (pooled connections keep the WAL files open until closed)
     default_db_manager.db_path = original_path
+    db.close_all()
+    for path in (TEST_DB_PATH, TEST_DB_PATH + "-wal", TEST_DB_PATH + "-shm"):
+        if os.path.exists(path):
+            try:
+                os.remove(path)
+            except:
+                pass
 
 def test_db_initialization(test_db):
     """Test table creation."""
@@ -111,3 +113,155 @@ def test_load_documents(test_db):
     assert doc.metadata['intent'] == "Read Test"
     assert "Read Test" in doc.text
     assert "# 1. Problem Context\nCtx" in doc.text
+
+async def test_related_experiences_from_neighbor_table(test_db):
+    """Neighbour table built from entry embeddings backs get_related_experiences."""
+    from types import SimpleNamespace
+    from context_pilot.scripts.build_index import update_neighbor_table
+    from context_pilot.context_pilot_app.tools.knowledge_tool import get_related_experiences
+
+    redis_a = _insert_entry(test_db, intent="Redis timeout", root_cause="Pool exhausted")
+    redis_b = _insert_entry(test_db, intent="Redis latency", root_cause="Slow command")
+    boot = _insert_entry(test_db, intent="Boot crash", root_cause="Null pointer")
+
+    # Two chunks for redis_a: its entry vector is the chunk mean
+    fake_index = SimpleNamespace(vector_store=SimpleNamespace(data=SimpleNamespace(
+        embedding_dict={
+            "n1": [1.0, 0.0, 0.0], "n2": [0.9, 0.2, 0.0],
+            "n3": [0.8, 0.3, 0.0],
+            "n4": [0.0, 0.0, 1.0],
+        },
+        text_id_to_ref_doc_id={"n1": redis_a, "n2": redis_a, "n3": redis_b, "n4": boot},
+    )))
+    update_neighbor_table(fake_index)
+
+    with test_db.get_connection() as conn:
+        rows = conn.execute(
+            "SELECT neighbor_id FROM knowledge_neighbors WHERE entry_id = ? ORDER BY rank", (redis_a,)
+        ).fetchall()
+    assert [r['neighbor_id'] for r in rows] == [redis_b, boot]
+
+    result = await get_related_experiences(redis_a, limit=1)
+    assert "Redis latency" in result
+    assert "Boot crash" not in result
+    assert "No related experiences" in await get_related_experiences("unknown-id")
+
+
+async def test_save_experience_runs_off_the_event_loop(test_db):
+    from types import SimpleNamespace
+    from unittest.mock import patch
+    from context_pilot.context_pilot_app.tools import knowledge_tool
+    from context_pilot.shared_libraries.state_keys import StateKeys
+
+    ctx = SimpleNamespace(state={
+        StateKeys.EXP_INTENT: "Async save",
+        StateKeys.EXP_ROOT_CAUSE: "Blocking I/O",
+        StateKeys.EXP_TAGS: "async, sqlite",
+    })
+    with patch.object(knowledge_tool, "publish_change") as publish_change:
+        result = await knowledge_tool.save_experience(ctx)
+    assert result.startswith("✅ Experience created")
+    # The indexer is told about the committed save
+    publish_change.assert_called_once_with("default")
+    assert ctx.state[StateKeys.EXP_INTENT] is None
+
+    with test_db.get_connection() as conn:
+        row = conn.execute("SELECT intent, tags FROM knowledge_entries").fetchone()
+    assert (row['intent'], row['tags']) == ("Async save", "async, sqlite")
+
+
+async def test_save_experience_offers_update_of_similar_entry(test_db):
+    from types import SimpleNamespace
+    from unittest.mock import AsyncMock, patch
+    from context_pilot.context_pilot_app.tools import knowledge_tool
+    from context_pilot.shared_libraries.state_keys import StateKeys
+
+    existing = _insert_entry(test_db, intent="Redis timeout on login", root_cause="Pool exhausted")
+    state = {
+        StateKeys.EXP_INTENT: "Login times out talking to Redis",
+        StateKeys.EXP_ROOT_CAUSE: "Connections leak on errors",
+    }
+    ctx = SimpleNamespace(state=dict(state))
+
+    with patch.object(knowledge_tool, "afind_closest_entry", AsyncMock(return_value=(existing, 0.93))), \
+         patch.object(knowledge_tool, "publish_change"):
+        offer = await knowledge_tool.save_experience(ctx)
+        assert existing in offer and "force_new=True" in offer
+        # Nothing saved, the staged experience is kept for the follow-up call
+        assert ctx.state[StateKeys.EXP_INTENT] == state[StateKeys.EXP_INTENT]
+
+        assert (await knowledge_tool.save_experience(ctx, entry_id=existing)).startswith("✅ Experience updated")
+
+        ctx.state.update(state)
+        assert (await knowledge_tool.save_experience(ctx, force_new=True)).startswith("✅ Experience created")
+
+    # Matches for entries that were deleted after the last index build are ignored
+    ctx.state.update({
+        StateKeys.EXP_INTENT: "Kafka consumer lag after deploy",
+        StateKeys.EXP_ROOT_CAUSE: "Rebalance storm from short session timeouts",
+    })
+    with patch.object(knowledge_tool, "afind_closest_entry", AsyncMock(return_value=("gone", 0.99))), \
+         patch.object(knowledge_tool, "publish_change"):
+        assert (await knowledge_tool.save_experience(ctx)).startswith("✅")
+
+
+async def test_save_experience_asks_before_saving_a_near_duplicate(test_db):
+    from types import SimpleNamespace
+    from unittest.mock import AsyncMock, patch
+    from context_pilot.context_pilot_app.tools import knowledge_tool
+    from context_pilot.shared_libraries.state_keys import StateKeys
+
+    state = {
+        StateKeys.EXP_INTENT: "Login fails with Redis timeout",
+        StateKeys.EXP_ROOT_CAUSE: "The connection pool was exhausted because connections were not released.",
+        StateKeys.EXP_SOLUTION_STEPS: "Wrap calls in try/finally and raise the pool size to 50.",
+    }
+    ctx = SimpleNamespace(state=dict(state))
+    with patch.object(knowledge_tool, "afind_closest_entry", AsyncMock(return_value=None)), \
+         patch.object(knowledge_tool, "publish_change"):
+        assert (await knowledge_tool.save_experience(ctx)).startswith("✅ Experience created")
+
+        ctx.state.update(state)
+        offer = await knowledge_tool.save_experience(ctx)
+        assert offer.startswith("⚠️ A near-duplicate") and "force_new=True" in offer
+        assert ctx.state[StateKeys.EXP_INTENT] == state[StateKeys.EXP_INTENT]
+        with test_db.get_connection() as conn:
+            assert conn.execute("SELECT COUNT(*) FROM knowledge_entries").fetchone()[0] == 1
+
+        assert (await knowledge_tool.save_experience(ctx, force_new=True)).startswith("✅ Experience created")
+
+
+async def test_save_and_related_lookup_in_a_named_kb(test_db, tmp_path):
+    from types import SimpleNamespace
+    from unittest.mock import AsyncMock, patch
+    from context_pilot.context_pilot_app.tools import knowledge_tool
+    from context_pilot.scripts.rag_config import RagConfig
+    from context_pilot.shared_libraries.state_keys import StateKeys
+    from context_pilot.utils.db_manager import get_db_manager
+
+    kb = f"{tmp_path.name}-billing"
+    saved = []
+    with patch.object(RagConfig, "KB_ROOT_DIR", str(tmp_path)), \
+         patch.object(knowledge_tool, "afind_closest_entry", AsyncMock(return_value=None)) as closest, \
+         patch.object(knowledge_tool, "publish_change") as publish_change:
+        for intent, root_cause in [("Invoice totals off by a cent", "Float rounding in tax"),
+                                   ("Refunds stuck in pending", "Webhook retries disabled")]:
+            ctx = SimpleNamespace(state={StateKeys.EXP_INTENT: intent, StateKeys.EXP_ROOT_CAUSE: root_cause})
+            result = await knowledge_tool.save_experience(ctx, knowledge_base=kb)
+            assert result.startswith("✅ Experience created")
+            saved.append(result.rsplit("ID: ", 1)[1].rstrip(")"))
+
+        # The similarity lookup, the write and the change event all target the named KB
+        assert closest.await_args.args[1] == kb
+        publish_change.assert_called_with(kb)
+        named = get_db_manager(kb)
+        with named.get_connection() as conn:
+            assert conn.execute("SELECT COUNT(*) FROM knowledge_entries").fetchone()[0] == 2
+            conn.execute("INSERT INTO knowledge_neighbors (entry_id, rank, neighbor_id, score) VALUES (?, 0, ?, 0.9)",
+                         (saved[0], saved[1]))
+        with test_db.get_connection() as conn:
+            assert conn.execute("SELECT COUNT(*) FROM knowledge_entries").fetchone()[0] == 0
+
+        related = await knowledge_tool.get_related_experiences(saved[0], knowledge_base=kb)
+        assert "Refunds stuck in pending" in related
+        assert (await knowledge_tool.get_related_experiences(saved[0])).startswith("No related experiences")
@@ -0,0 +1,239 @@
+import sqlite3
+
+from context_pilot.utils.db_manager import DBManager
+from context_pilot.utils.knowledge_store import (
+    HIGHLIGHT_START, contributor_facets, entry_signature, find_near_duplicate, list_entries, parse_tags,
+    save_entry, search_entries, tag_facets
+)
+
+
+def _fields(intent, tags=""):
+    return {"intent": intent, "root_cause": "rc", "tags": tags, "contributor": "Tester"}
+
+
+def _tags_of(conn, entry_id):
+    rows = conn.execute("SELECT tag FROM entry_tags WHERE entry_id = ? ORDER BY tag", (entry_id,)).fetchall()
+    return [r[0] for r in rows]
+
+
+def _db(tmp_path):
+    db = DBManager(db_path=str(tmp_path / "kb.sqlite"))
+    db.init_db()
+    return db
+
+
+def test_parse_tags_normalizes_and_dedupes():
+    assert parse_tags(" Redis, timeout,redis ,, Login") == ["redis", "timeout", "login"]
+    assert parse_tags(None) == []
+
+
+def test_save_entry_keeps_tags_in_sync(tmp_path):
+    db = _db(tmp_path)
+    with db.get_connection() as conn:
+        entry_id, action = save_entry(conn, _fields("Login fails", "redis, timeout"))
+        assert action == "created"
+        assert _tags_of(conn, entry_id) == ["redis", "timeout"]
+
+        same_id, action = save_entry(conn, _fields("Login fails", "auth"), entry_id)
+        assert (same_id, action) == (entry_id, "updated")
+        assert _tags_of(conn, entry_id) == ["auth"]
+
+        conn.execute("DELETE FROM knowledge_entries WHERE id = ?", (entry_id,))
+        assert _tags_of(conn, entry_id) == []
+
+
+def test_list_entries_newest_first_and_by_tag(tmp_path):
+    db = _db(tmp_path)
+    with db.get_connection() as conn:
+        old, _ = save_entry(conn, _fields("Old", "redis"), now="2024-01-01T00:00:00")
+        new, _ = save_entry(conn, _fields("New", "redis, db"), now="2024-02-01T00:00:00")
+        save_entry(conn, _fields("Other", "ui"), now="2024-03-01T00:00:00")
+
+        assert [r["intent"] for r in list_entries(conn, limit=2)] == ["Other", "New"]
+        assert [r["id"] for r in list_entries(conn, tag="Redis")] == [new, old]
+
+
+def test_list_entries_uses_indexes(tmp_path):
+    db = _db(tmp_path)
+    with db.get_connection() as conn:
+        plan = " ".join(r[3] for r in conn.execute(
+            "EXPLAIN QUERY PLAN SELECT id FROM knowledge_entries ORDER BY created_at DESC, id DESC LIMIT 50"
+        ))
+        assert "idx_knowledge_entries_created_at" in plan
+        assert "TEMP B-TREE" not in plan
+
+        plan = " ".join(r[3] for r in conn.execute(
+            "EXPLAIN QUERY PLAN SELECT entry_id FROM entry_tags WHERE tag = 'redis'"
+        ))
+        assert "idx_entry_tags_tag_created_at" in plan
+
+
+def test_list_entries_by_tag_reads_the_index_in_order(tmp_path):
+    db = _db(tmp_path)
+    with db.get_connection() as conn:
+        for day in range(1, 6):
+            save_entry(conn, _fields(f"Entry {day}", "redis"), now=f"2024-01-0{day}T00:00:00")
+        statements = []
+        conn.set_trace_callback(statements.append)
+        page = list_entries(conn, limit=2, tag="redis", before=("2024-01-04T00:00:00", ""))
+        conn.set_trace_callback(None)
+        assert [r["intent"] for r in page] == ["Entry 3", "Entry 2"]
+
+        plan = " ".join(r[3] for r in conn.execute("EXPLAIN QUERY PLAN " + statements[-1]))
+        assert "idx_entry_tags_tag_created_at" in plan
+        assert "TEMP B-TREE" not in plan
+
+
+def test_migration_backfills_tags_of_legacy_rows(tmp_path):
+    path = str(tmp_path / "legacy.sqlite")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE knowledge_entries (id TEXT PRIMARY KEY, intent TEXT, problem_context TEXT, "
+                 "root_cause TEXT, solution_steps TEXT, evidence TEXT, tags TEXT, contributor TEXT, "
+                 "created_at TIMESTAMP, updated_at TIMESTAMP)")
+    conn.execute("INSERT INTO knowledge_entries (id, intent, tags, created_at) "
+                 "VALUES ('e1', 'Legacy', 'Redis, Cache', '2023-05-01T00:00:00')")
+    conn.commit()
+    conn.close()
+
+    db = DBManager(db_path=path)
+    db.init_db()
+    with db.get_connection() as conn:
+        assert _tags_of(conn, "e1") == ["cache", "redis"]
+        # The tag rows carry the entry's creation time (for ordered tag listings)
+        assert [r["id"] for r in list_entries(conn, tag="cache")] == ["e1"]
+        assert conn.execute("SELECT DISTINCT created_at FROM entry_tags").fetchall()[0][0] == "2023-05-01T00:00:00"
+
+
+LOGIN = {
+    "intent": "Login fails with Redis timeout",
+    "root_cause": "The connection pool was exhausted because connections were not released after errors.",
+    "solution_steps": "Wrap calls in try/finally, raise pool size to 50, add a timeout of 2s.",
+}
+LOGIN_REWORDED = {
+    "intent": "Login fails due to a Redis timeout",
+    "root_cause": "The connection pool got exhausted since connections were not released after errors.",
+    "solution_steps": "Wrap calls in try/finally, raise the pool size to 50, set the timeout to 2s.",
+}
+BOOT = {
+    "intent": "Service crashes at boot",
+    "root_cause": "Null pointer because the config file is missing the database section.",
+    "solution_steps": "Add a default config and validate it on startup.",
+}
+
+
+LOGIN_TYPO = dict(LOGIN, solution_steps=LOGIN["solution_steps"] + " Also add an alert.")
+# Same service and symptom, different cause: similar text, but a separate experience
+CHECKOUT = dict(
+    LOGIN, intent="Checkout fails with Redis timeout",
+    root_cause="The connection pool was exhausted because the checkout job held connections for minutes."
+)
+
+
+def test_near_duplicate_save_is_suggested_not_merged(tmp_path):
+    db = _db(tmp_path)
+    with db.get_connection() as conn:
+        original, _ = save_entry(conn, LOGIN, duplicate_threshold=0.8)
+        other, action = save_entry(conn, BOOT, duplicate_threshold=0.8)
+        assert action == "created" and other != original
+
+        # Nothing is written: the caller gets the existing entry to confirm
+        assert save_entry(conn, LOGIN_TYPO, duplicate_threshold=0.8) == (original, "duplicate")
+        assert conn.execute("SELECT COUNT(*) FROM knowledge_entries").fetchone()[0] == 2
+        assert conn.execute("SELECT intent, solution_steps FROM knowledge_entries WHERE id = ?",
+                            (original,)).fetchone()[1] == LOGIN["solution_steps"]
+
+        # Without a threshold every save is a new entry
+        assert save_entry(conn, LOGIN_TYPO)[1] == "created"
+
+
+def test_distinct_similar_entries_are_not_flagged(tmp_path):
+    db = _db(tmp_path)
+    with db.get_connection() as conn:
+        login, _ = save_entry(conn, LOGIN, duplicate_threshold=0.8)
+        checkout, action = save_entry(conn, CHECKOUT, duplicate_threshold=0.8)
+        assert action == "created" and checkout != login
+        assert conn.execute("SELECT intent FROM knowledge_entries WHERE id = ?", (login,)).fetchone()[0] == LOGIN["intent"]
+
+
+def test_find_near_duplicate_uses_band_index(tmp_path):
+    db = _db(tmp_path)
+    with db.get_connection() as conn:
+        original, _ = save_entry(conn, LOGIN)
+        match = find_near_duplicate(conn, entry_signature(LOGIN_REWORDED), 0.5)
+        assert match[0] == original and match[1] >= 0.5
+        assert find_near_duplicate(conn, entry_signature(BOOT), 0.5) is None
+        assert find_near_duplicate(conn, entry_signature(LOGIN), 0.5, exclude_id=original) is None
+
+        conn.execute("DELETE FROM knowledge_entries WHERE id = ?", (original,))
+        assert conn.execute("SELECT COUNT(*) FROM entry_minhash_bands").fetchone()[0] == 0
+
+
+def test_batch_signatures_match_single_texts():
+    from context_pilot.utils import minhash
+
+    texts = ["", "ab", "Redis timeout  during LOGIN", "用户登录超时", LOGIN["root_cause"]]
+    batch = minhash.signatures(texts)
+    assert all((batch[i] == minhash.signature(text)).all() for i, text in enumerate(texts))
+    assert (minhash.signature("Redis  timeout") == minhash.signature("redis timeout ")).all()
+    assert minhash.similarity(entry_signature(LOGIN), entry_signature(LOGIN_REWORDED)) > \
+        minhash.similarity(entry_signature(LOGIN), entry_signature(BOOT))
+
+
+def test_search_entries_follows_writes(tmp_path):
+    db = _db(tmp_path)
+    with db.get_connection() as conn:
+        login, _ = save_entry(conn, LOGIN)
+        boot, _ = save_entry(conn, BOOT)
+        chinese, _ = save_entry(conn, {"intent": "用户登录超时", "root_cause": "连接池耗尽", "tags": "登录"})
+
+        assert [r["id"] for r in search_entries(conn, "redis timeout")] == [login]
+        assert search_entries(conn, "redis")[0]["snippet"].count(HIGHLIGHT_START) >= 1
+        # Substring matching works for Chinese; two-character terms fall back to LIKE
+        assert [r["id"] for r in search_entries(conn, "登录超时")] == [chinese]
+        assert [r["id"] for r in search_entries(conn, "登录")] == [chinese]
+        # FTS5 syntax in the input is matched literally
+        assert search_entries(conn, 'redis" OR "boot') == []
+
+        save_entry(conn, {"intent": "Service hangs at boot"}, login)
+        assert {r["id"] for r in search_entries(conn, "boot")} == {login, boot}
+        assert search_entries(conn, "redis") == []
+
+        conn.execute("DELETE FROM knowledge_entries WHERE id = ?", (boot,))
+        assert [r["id"] for r in search_entries(conn, "boot")] == [login]
+        conn.execute("INSERT INTO entries_fts (entries_fts) VALUES ('integrity-check')")
+
+
+def test_facets_follow_saves_and_deletes(tmp_path):
+    db = _db(tmp_path)
+    with db.get_connection() as conn:
+        a, _ = save_entry(conn, {"intent": "A", "tags": "redis, cache", "contributor": "Ann"})
+        b, _ = save_entry(conn, {"intent": "B", "tags": "redis", "contributor": "Bob"})
+        save_entry(conn, {"intent": "C"})
+        assert [tuple(r) for r in tag_facets(conn)] == [("redis", 2), ("cache", 1)]
+        assert [tuple(r) for r in contributor_facets(conn)] == [("", 1), ("Ann", 1), ("Bob", 1)]
+
+        save_entry(conn, {"intent": "A", "tags": "cache, db", "contributor": "Bob"}, a)
+        assert [tuple(r) for r in tag_facets(conn)] == [("cache", 1), ("db", 1), ("redis", 1)]
+        assert [tuple(r) for r in contributor_facets(conn, limit=1)] == [("Bob", 2)]
+
+        conn.execute("DELETE FROM knowledge_entries WHERE id IN (?, ?)", (a, b))
+        assert tag_facets(conn) == []
+        assert [tuple(r) for r in contributor_facets(conn)] == [("", 1)]
+
+
+def test_migration_backfills_facets(tmp_path):
+    path = str(tmp_path / "legacy.sqlite")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE knowledge_entries (id TEXT PRIMARY KEY, intent TEXT, problem_context TEXT, "
+                 "root_cause TEXT, solution_steps TEXT, evidence TEXT, tags TEXT, contributor TEXT, "
+                 "created_at TIMESTAMP, updated_at TIMESTAMP)")
+    conn.executemany("INSERT INTO knowledge_entries (id, intent, tags, contributor) VALUES (?, ?, ?, ?)",
+                     [("e1", "One", "Redis", "Ann"), ("e2", "Two", "redis, ui", "Ann")])
+    conn.commit()
+    conn.close()
+
+    db = DBManager(db_path=path)
+    db.init_db()
+    with db.get_connection() as conn:
+        assert [tuple(r) for r in tag_facets(conn)] == [("redis", 2), ("ui", 1)]
+        assert [tuple(r) for r in contributor_facets(conn)] == [("Ann", 2)]
@@ -0,0 +1,106 @@
+import sqlite3
+import pytest
+from unittest.mock import patch
+
+from context_pilot.utils import migrations
+from context_pilot.utils.db_manager import DBManager
+from context_pilot.utils import minhash
+from context_pilot.utils.migrations import LATEST_VERSION, apply_migrations, get_schema_version
+
+
+def _tables(conn):
+    return {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+
+
+def test_fresh_db_is_migrated_to_latest(tmp_path):
+    db = DBManager(db_path=str(tmp_path / "kb.sqlite"))
+    db.init_db()
+    with db.get_connection() as conn:
+        assert get_schema_version(conn) == LATEST_VERSION
+        assert {"knowledge_entries", "knowledge_neighbors"} <= _tables(conn)
+
+
+def test_legacy_db_keeps_its_data(tmp_path):
+    path = str(tmp_path / "legacy.sqlite")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE knowledge_entries (id TEXT PRIMARY KEY, intent TEXT, problem_context TEXT, "
+                 "root_cause TEXT, solution_steps TEXT, evidence TEXT, tags TEXT, contributor TEXT, "
+                 "created_at TIMESTAMP, updated_at TIMESTAMP)")
+    conn.execute("INSERT INTO knowledge_entries (id, intent) VALUES ('e1', 'Legacy')")
+    conn.commit()
+    conn.close()
+
+    db = DBManager(db_path=path)
+    db.init_db()
+    with db.get_connection() as conn:
+        assert get_schema_version(conn) == LATEST_VERSION
+        assert conn.execute("SELECT intent FROM knowledge_entries").fetchone()[0] == "Legacy"
+        # Fingerprints and their LSH bands are backfilled, without logging a change
+        assert conn.execute("SELECT COUNT(*) FROM entry_minhash_bands").fetchone()[0] == minhash.BANDS
+        assert conn.execute("SELECT COUNT(*) FROM kb_changes").fetchone()[0] == 0
+
+
+def test_init_db_runs_migrations_once_per_path(tmp_path):
+    db = DBManager(db_path=str(tmp_path / "a.sqlite"))
+    with patch("context_pilot.utils.db_manager.apply_migrations", return_value=LATEST_VERSION) as apply, \
+         patch("context_pilot.utils.db_manager.resume_bulk_load_triggers", return_value=False):
+        db.init_db()
+        db.init_db()
+        assert apply.call_count == 1
+
+        db.db_path = str(tmp_path / "b.sqlite")
+        db.init_db()
+        assert apply.call_count == 2
+
+
+def test_failed_migration_rolls_back(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / "kb.sqlite"))
+    broken = migrations.MIGRATIONS + [
+        (LATEST_VERSION + 1, ["CREATE TABLE half_done (x INTEGER)", "THIS IS NOT SQL"]),
+    ]
+    with patch.object(migrations, "MIGRATIONS", broken), patch.object(migrations, "LATEST_VERSION", LATEST_VERSION + 1):
+        with pytest.raises(sqlite3.OperationalError):
+            apply_migrations(conn)
+    assert get_schema_version(conn) == 0
+    assert "half_done" not in _tables(conn)
+
+
+def test_legacy_fingerprints_are_hashed_once_in_batches(tmp_path):
+    from context_pilot.utils.knowledge_store import entry_text
+
+    path = str(tmp_path / "legacy.sqlite")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE knowledge_entries (id TEXT PRIMARY KEY, intent TEXT, problem_context TEXT, "
+                 "root_cause TEXT, solution_steps TEXT, evidence TEXT, tags TEXT, contributor TEXT, "
+                 "created_at TIMESTAMP, updated_at TIMESTAMP)")
+    conn.executemany("INSERT INTO knowledge_entries (id, intent) VALUES (?, ?)", [(f"e{i}", f"Entry {i}") for i in range(3)])
+    conn.commit()
+    conn.close()
+
+    with patch.object(minhash, "signatures", wraps=minhash.signatures) as batched, \
+         patch.object(minhash, "signature", wraps=minhash.signature) as single:
+        DBManager(db_path=path).init_db()
+    assert batched.call_count == 1 and single.call_count == 0
+
+    conn = sqlite3.connect(path)
+    for entry_id, intent, fingerprint in conn.execute("SELECT id, intent, fingerprint FROM knowledge_entries"):
+        assert fingerprint == minhash.to_bytes(minhash.signatures([entry_text({"intent": intent})])[0])
+
+
+def test_recomputing_fingerprints_skips_current_ones(tmp_path):
+    from context_pilot.utils.knowledge_store import save_entry
+
+    db = DBManager(db_path=str(tmp_path / "kb.sqlite"))
+    db.init_db()
+    with db.get_connection() as conn:
+        ids = [save_entry(conn, {"intent": f"Entry {i}"})[0] for i in range(3)]
+        conn.execute("UPDATE knowledge_entries SET fingerprint = NULL WHERE id = ?", (ids[1],))
+
+        statements = []
+        conn.set_trace_callback(statements.append)
+        migrations._recompute_fingerprints(conn)
+        conn.set_trace_callback(None)
+        # (the trace repeats a statement for each trigger it fires)
+        updated = {entry_id for s in statements if s.startswith("UPDATE knowledge_entries") for entry_id in ids if entry_id in s}
+        assert updated == {ids[1]}
+        assert conn.execute("SELECT COUNT(*) FROM knowledge_entries WHERE fingerprint IS NULL").fetchone()[0] == 0
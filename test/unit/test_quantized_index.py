@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+
+from llama_index.core import VectorStoreIndex
+from llama_index.core.embeddings import MockEmbedding
+from llama_index.core.schema import QueryBundle, TextNode
+
+from context_pilot.scripts.quantized_index import (
+    QuantizedIndex, save_quantized_vectors, remove_quantized_vectors, has_quantized_vectors
+)
+from context_pilot.utils.vector_ops import quantize_rows, quantized_scores
+
+
+@pytest.fixture
+def persisted_index(tmp_path):
+    rng = np.random.default_rng(42)
+    vectors = rng.normal(size=(200, 32))
+    nodes = [TextNode(text=f"entry {i}", id_=f"node-{i}", embedding=v.tolist()) for i, v in enumerate(vectors)]
+    index = VectorStoreIndex(nodes=nodes, embed_model=MockEmbedding(embed_dim=32))
+    index.storage_context.persist(persist_dir=str(tmp_path))
+    return index, vectors, str(tmp_path)
+
+
+@pytest.mark.parametrize("mode", ["float16", "int8"])
+def test_quantized_scores_close_to_exact(mode):
+    rng = np.random.default_rng(1)
+    matrix = rng.normal(size=(50, 16)).astype(np.float32)
+    query = rng.normal(size=16).astype(np.float32)
+
+    quantized, scales = quantize_rows(matrix, mode)
+    approx = quantized_scores(quantized, scales, query, block_size=7)
+    assert np.allclose(approx, matrix @ query, atol=0.2)
+
+
+@pytest.mark.parametrize("mode", ["float16", "int8"])
+def test_quantized_retriever_matches_exact_search(persisted_index, mode):
+    index, vectors, storage_dir = persisted_index
+    save_quantized_vectors(storage_dir, index, mode)
+    qindex = QuantizedIndex.load(storage_dir, rescore_candidates=20)
+
+    query = vectors[17] + 0.05
+    nodes = qindex.as_retriever(similarity_top_k=5).retrieve(QueryBundle(query_str="q", embedding=query.tolist()))
+
+    normed = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    exact = normed @ (query / np.linalg.norm(query))
+    expected = [f"node-{i}" for i in np.argsort(-exact)[:5]]
+
+    assert [n.node.node_id for n in nodes] == expected
+    assert nodes[0].node.text == "entry 17"
+    # Rescoring reports exact cosine scores
+    assert nodes[0].score == pytest.approx(float(exact[17]), abs=1e-5)
+
+
+def test_sidecar_removed_when_switching_back(persisted_index):
+    index, _, storage_dir = persisted_index
+    save_quantized_vectors(storage_dir, index, "int8")
+    assert has_quantized_vectors(storage_dir)
+    remove_quantized_vectors(storage_dir)
+    assert not has_quantized_vectors(storage_dir)
@@ -0,0 +1,66 @@
+import pytest
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from llama_index.core import VectorStoreIndex, Settings, Document
+from llama_index.core.embeddings import MockEmbedding
+
+from context_pilot.context_pilot_app.tools import llama_rag_tool
+from context_pilot.shared_libraries.state_keys import StateKeys
+
+
+@pytest.fixture
+def mock_index():
+    """In-memory index built with a mock embedder (no network)."""
+    # Read the private slot: the public getter would resolve a default (OpenAI) model
+    original = Settings._embed_model
+    Settings.embed_model = MockEmbedding(embed_dim=8)
+    index = VectorStoreIndex.from_documents([
+        Document(text="Redis timeout during login", id_="doc-1"),
+        Document(text="Null pointer on boot", id_="doc-2"),
+    ])
+    with patch.object(llama_rag_tool, "_get_index", return_value=index):
+        yield index
+    Settings._embed_model = original
+
+
+async def test_async_retrieval_matches_sync(mock_index):
+    sync_ctx = SimpleNamespace(state={})
+    async_ctx = SimpleNamespace(state={})
+
+    sync_result = llama_rag_tool.retrieve_rag_documentation_tool("login", sync_ctx)
+    async_result = await llama_rag_tool.aretrieve_rag_documentation_tool("login", async_ctx)
+
+    assert async_result == sync_result
+    assert async_ctx.state[StateKeys.LAST_RAG_QUERY] == "login"
+    assert len(async_ctx.state[StateKeys.RAG_CONTEXT_NODES]) == 2
+
+
+async def test_async_retrieval_reports_errors():
+    ctx = SimpleNamespace(state={})
+    with patch.object(llama_rag_tool, "_get_index", side_effect=FileNotFoundError("missing")):
+        result = await llama_rag_tool.aretrieve_rag_documentation_tool("login", ctx)
+    assert result.startswith("Error retrieving documentation")
+
+
+async def test_query_embeddings_are_cached(mock_index):
+    llama_rag_tool._EMBEDDING_CACHE.clear()
+    with patch.object(type(Settings.embed_model), "_aget_query_embedding",
+                      autospec=True, side_effect=lambda self, q: [1.0] * 8) as embed:
+        first = await llama_rag_tool.afind_closest_entry("login")
+        second = await llama_rag_tool.afind_closest_entry("login")
+    assert embed.call_count == 1
+    assert first == second and first[0] in ("doc-1", "doc-2")
+
+
+async def test_search_endpoint_returns_scored_nodes(mock_index):
+    from context_pilot.api_routes import search_knowledge
+
+    body = await search_knowledge("login", k=1)
+    assert body["status"] == "success" and body["knowledge_base"] == "default"
+    assert len(body["nodes"]) == 1
+    assert body["nodes"][0]["entry_id"] in ("doc-1", "doc-2") and "score" in body["nodes"][0]
+
+    assert (await search_knowledge("  "))["status"] == "error"
+    with patch.object(llama_rag_tool, "_get_index", side_effect=FileNotFoundError("missing")):
+        assert (await search_knowledge("login"))["status"] == "error"
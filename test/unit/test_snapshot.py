@@ -0,0 +1,140 @@
+import json
+import os
+import threading
+from unittest.mock import patch
+
+import pytest
+
+from context_pilot.scripts.rag_config import RagConfig
+from context_pilot.utils.db_manager import get_db_manager
+from context_pilot.utils.knowledge_store import count_entries, save_entry
+from context_pilot.utils.snapshot import create_snapshot, read_snapshot_meta, restore_snapshot
+
+
+@pytest.fixture
+def kb_root(tmp_path):
+    with patch.object(RagConfig, "KB_ROOT_DIR", str(tmp_path)):
+        yield tmp_path
+
+
+def _seed(kb, n):
+    db = get_db_manager(kb)
+    db.init_db()
+    with db.get_connection() as conn:
+        for i in range(n):
+            save_entry(conn, {"intent": f"Entry {i}", "root_cause": "rc"})
+    storage = RagConfig.kb_storage_dir(kb)
+    os.makedirs(storage, exist_ok=True)
+    with open(os.path.join(storage, RagConfig.MANIFEST_FILE), "w") as f:
+        json.dump({"build_time": "2024-01-01T00:00:00", "change_seq": n}, f)
+    return db
+
+
+def test_snapshot_roundtrip_into_another_kb(kb_root):
+    source = f"{kb_root.name}-src"
+    db = _seed(source, 20)
+
+    # Writers keep going while the backup copies a page at a time
+    stop = threading.Event()
+
+    def writer():
+        with db.get_connection() as conn:
+            while not stop.is_set():
+                save_entry(conn, {"intent": "Concurrent", "root_cause": "rc"})
+
+    thread = threading.Thread(target=writer)
+    thread.start()
+    try:
+        meta = create_snapshot(source, str(kb_root / "snapshots"), pages=1)
+    finally:
+        stop.set()
+        thread.join()
+
+    assert os.path.exists(meta["path"]) and meta["size_bytes"] > 0
+    assert read_snapshot_meta(meta["path"])["index_manifest"]["change_seq"] == 20
+
+    target = f"{kb_root.name}-dst"
+    restored = restore_snapshot(meta["path"], target)
+    assert restored["knowledge_base"] == target
+    with get_db_manager(target).get_connection() as conn:
+        assert count_entries(conn) >= 20
+        assert conn.execute("PRAGMA integrity_check").fetchone()[0] == "ok"
+    with open(os.path.join(RagConfig.kb_storage_dir(target), RagConfig.MANIFEST_FILE)) as f:
+        assert json.load(f)["change_seq"] == 20
+
+
+def test_restore_refuses_to_overwrite_without_force(kb_root):
+    kb = f"{kb_root.name}-live"
+    db = _seed(kb, 3)
+    meta = create_snapshot(kb, str(kb_root / "snapshots"))
+
+    with db.get_connection() as conn:
+        save_entry(conn, {"intent": "After snapshot"})
+
+    with pytest.raises(FileExistsError):
+        restore_snapshot(meta["path"])
+
+    restore_snapshot(meta["path"], force=True)
+    with db.get_connection() as conn:
+        assert count_entries(conn) == 3
+
+
+def test_restore_refuses_while_the_db_is_open_elsewhere(kb_root):
+    import sqlite3
+    from context_pilot.utils.snapshot import KnowledgeBaseInUseError
+
+    kb = f"{kb_root.name}-busy"
+    db = _seed(kb, 3)
+    meta = create_snapshot(kb, str(kb_root / "snapshots"))
+
+    # Stands in for the server or another process with the DB open
+    other = sqlite3.connect(db.db_path)
+    other.execute("SELECT COUNT(*) FROM knowledge_entries").fetchone()
+    try:
+        with pytest.raises(KnowledgeBaseInUseError):
+            restore_snapshot(meta["path"], force=True)
+    finally:
+        other.close()
+
+    restore_snapshot(meta["path"], force=True)
+    with db.get_connection() as conn:
+        assert count_entries(conn) == 3
+
+
+def test_restore_without_index_drops_the_stale_one(kb_root):
+    source = f"{kb_root.name}-noindex"
+    db = get_db_manager(source)
+    db.init_db()
+    with db.get_connection() as conn:
+        save_entry(conn, {"intent": "No index yet"})
+    meta = create_snapshot(source, str(kb_root / "snapshots"))
+    assert meta["has_index"] is False
+
+    target = f"{kb_root.name}-indexed"
+    _seed(target, 5)
+    restored = restore_snapshot(meta["path"], target, force=True)
+    assert restored["has_index"] is False
+    assert not os.path.exists(RagConfig.kb_storage_dir(target))
+    with get_db_manager(target).get_connection() as conn:
+        assert count_entries(conn) == 1
+
+
+@pytest.mark.parametrize("has_filters", [True, False])
+def test_restore_rejects_paths_outside_the_staging_dir(kb_root, monkeypatch, has_filters):
+    import io
+    import tarfile
+
+    archive = str(kb_root / "evil.tar.gz")
+    with tarfile.open(archive, "w:gz") as tar:
+        for name, data in [("snapshot.json", json.dumps({"knowledge_base": "evil", "db_file": "x"}).encode()),
+                           ("../evil.txt", b"pwned")]:
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+
+    if not has_filters:
+        # Python < 3.11.4
+        monkeypatch.delattr(tarfile, "data_filter", raising=False)
+    with pytest.raises(ValueError, match="Unsafe member"):
+        restore_snapshot(archive, f"{kb_root.name}-evil")
+    assert not (kb_root / "evil.txt").exists()
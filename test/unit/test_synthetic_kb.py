@@ -0,0 +1,38 @@
+import os
+import json
+from unittest.mock import patch
+
+import numpy as np
+from llama_index.core import Settings
+
+from context_pilot.scripts.rag_config import RagConfig
+from context_pilot.testing.hash_embedding import HashEmbedding
+from context_pilot.testing.synthetic_kb import make_dataset, offline_build, seed_kb
+
+
+def test_hash_embedding_is_deterministic_and_lexical():
+    model = HashEmbedding(dim=64)
+    doc = np.array(model.get_text_embedding("Redis timeout during login"))
+    assert np.allclose(doc, HashEmbedding(dim=64).get_text_embedding("redis TIMEOUT during login"))
+    assert np.isclose(np.linalg.norm(doc), 1.0)
+    assert doc @ model.get_query_embedding("login timeout") > doc @ model.get_query_embedding("kafka disk full")
+
+
+def test_dataset_is_reproducible_and_labeled():
+    entries, queries = make_dataset(50, 10, seed=3)
+    assert (entries, queries) == make_dataset(50, 10, seed=3)
+    ids = {entry["id"] for entry in entries}
+    assert len(ids) == 50 and all(set(q["relevant"]) <= ids for q in queries)
+
+
+def test_offline_build_indexes_seeded_entries(tmp_path):
+    entries, _ = make_dataset(20, 0)
+    original = Settings._embed_model, Settings._llm
+    try:
+        with patch.object(RagConfig, "KB_ROOT_DIR", str(tmp_path)), offline_build(dim=32) as build_module:
+            assert seed_kb("bench", entries)["rows"] == 20
+            assert build_module.build_index(mode="full", kb="bench")
+            with open(os.path.join(RagConfig.kb_storage_dir("bench"), RagConfig.MANIFEST_FILE)) as f:
+                assert json.load(f)["doc_count"] == 20
+    finally:
+        Settings._embed_model, Settings._llm = original
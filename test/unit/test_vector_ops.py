@@ -0,0 +1,45 @@
+import numpy as np
+
+from context_pilot.utils.vector_ops import normalize_rows, blocked_top_k_neighbors
+
+
+def test_normalize_rows_handles_zero_rows():
+    normed = normalize_rows(np.array([[3.0, 4.0], [0.0, 0.0]]))
+    assert np.allclose(normed[0], [0.6, 0.8])
+    assert np.allclose(normed[1], [0.0, 0.0])
+
+
+def test_blocked_top_k_matches_brute_force():
+    rng = np.random.default_rng(0)
+    matrix = rng.normal(size=(37, 16))
+
+    # Small block size forces several blocks, including a partial last one
+    indices, scores = blocked_top_k_neighbors(matrix, top_k=4, block_size=8)
+
+    normed = normalize_rows(matrix)
+    sims = normed @ normed.T
+    np.fill_diagonal(sims, -np.inf)
+    expected = np.argsort(-sims, axis=1)[:, :4]
+
+    assert indices.shape == (37, 4)
+    assert np.array_equal(indices, expected)
+    assert np.allclose(scores, np.take_along_axis(sims, expected, axis=1), atol=1e-5)
+
+
+def test_blocked_top_k_caps_k_to_available_rows():
+    indices, scores = blocked_top_k_neighbors(np.eye(3), top_k=10)
+    assert indices.shape == (3, 2)
+    assert all(i not in row for i, row in enumerate(indices))
+
+    indices, _ = blocked_top_k_neighbors(np.ones((1, 4)), top_k=5)
+    assert indices.shape == (1, 0)
+
+
+def test_blocked_top_k_for_selected_rows_matches_all_rows():
+    rng = np.random.default_rng(1)
+    matrix = rng.normal(size=(20, 8))
+    all_indices, all_scores = blocked_top_k_neighbors(matrix, top_k=3)
+
+    indices, scores = blocked_top_k_neighbors(matrix, top_k=3, block_size=2, rows=[4, 11, 19])
+    assert np.array_equal(indices, all_indices[[4, 11, 19]])
+    assert np.allclose(scores, all_scores[[4, 11, 19]])